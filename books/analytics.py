@@ -0,0 +1,159 @@
+# Standard Library imports
+import datetime
+
+#Third-party imports
+import numpy as np
+
+#Django imports
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+#local imports
+from .models import BookStructure, BookCopy, BookHold, LoanHistory
+from .cache import get_circulation_version
+
+#days back from today that utilization is measured over
+STATISTICS_WINDOW_DAYS = 365
+#cached statistics expire on their own after this long even if the version never moves
+STATISTICS_TIMEOUT = 60 * 60
+
+
+# ══════════════════════════ Loading ══════════════════════════════════════════════════════
+def _columns(rows, *dtypes):
+    '''
+    Turns `values_list` rows into one NumPy array per column. Missing dates become NaT.
+    '''
+    rows = list(rows)
+    if not rows:
+        return [np.empty(0, dtype=dtype) for dtype in dtypes]
+    return [np.array(column, dtype=dtype) for column, dtype in zip(zip(*rows), dtypes)]
+
+
+def _positions(sorted_ids, ids):
+    '''
+    Index of every id of `ids` in `sorted_ids`, and a mask of the ids that were found.
+    '''
+    positions = np.searchsorted(sorted_ids, ids)
+    found = positions < len(sorted_ids)
+    found[found] = sorted_ids[positions[found]] == ids[found]
+    return positions, found
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Statistics ══════════════════════════════════════════════════════
+def compute_title_statistics(days=STATISTICS_WINDOW_DAYS, today=None):
+    '''
+    Circulation statistics of every BookStructure, from four queries read in one
+    snapshot (a REPEATABLE READ transaction on PostgreSQL) and a vectorized pass over
+    the loan history (active and archived loans):
+
+    - `total_loans`: every loan of the title's copies.
+    - `utilization`: share of the copy-days of the last `days` days (today included)
+      that the copies spent on loan. A copy counts from the day it was added.
+    - `average_loan_days`: mean days out of the returned loans, None without any.
+    - `queue_depth`: waiting holds.
+    - `rank`: 1 for the most loaned title; titles with as many loans share a rank.
+
+    Returns a list of dicts, by rank then book id.
+    '''
+    today = today or timezone.localdate()
+    window_end = np.datetime64(today + datetime.timedelta(days=1), 'D')
+    window_start = window_end - np.timedelta64(days, 'D')
+
+    #the four reads share one snapshot, so they agree on which books and copies exist;
+    #only a transaction opened here can still pick its isolation level
+    snapshot = not connection.in_atomic_block
+    with transaction.atomic():
+        if snapshot and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        book_ids, titles = _columns(BookStructure.objects.order_by('id').values_list('id', 'title'), np.int64, object)
+        copy_ids, copy_books, added_on = _columns(
+            BookCopy.objects.order_by('id').values_list('id', 'book_instance_id', TruncDate('created_at')),
+            np.int64, np.int64, 'datetime64[D]',
+        )
+        loan_copies, issued_on, returned_on = _columns(
+            LoanHistory.objects.values_list('book_id', 'issue_date', 'returned_on'),
+            np.int64, 'datetime64[D]', 'datetime64[D]',
+        )
+        queued_books, queued = _columns(
+            BookHold.objects.filter(status='Waiting').values('book_id').annotate(waiting=Count('id')).values_list('book_id', 'waiting').order_by(),
+            np.int64, np.int64,
+        )
+    size = len(book_ids)
+
+    #copies -> title index, dropping copies of unknown titles; loans -> copy -> title
+    #index, dropping loans of deleted copies
+    copy_titles, found = _positions(book_ids, copy_books)
+    copy_ids, copy_titles, added_on = copy_ids[found], copy_titles[found], added_on[found]
+    positions, found = _positions(copy_ids, loan_copies)
+    loan_titles = copy_titles[positions[found]]
+    issued_on, returned_on = issued_on[found], returned_on[found]
+
+    total_loans = np.bincount(loan_titles, minlength=size)
+
+    returned = ~np.isnat(returned_on)
+    days_out = (returned_on[returned] - issued_on[returned]).astype(np.int64)
+    returned_loans = np.bincount(loan_titles[returned], minlength=size)
+    returned_days = np.bincount(loan_titles[returned], weights=days_out, minlength=size)
+    average_loan_days = np.divide(
+        returned_days, returned_loans, out=np.full(size, np.nan), where=returned_loans > 0
+    )
+
+    copy_days = np.clip(window_end - np.maximum(added_on, window_start), np.timedelta64(0, 'D'), None).astype(np.int64)
+    loan_end = np.minimum(np.where(returned, returned_on, window_end), window_end)
+    loan_days = np.clip(loan_end - np.maximum(issued_on, window_start), np.timedelta64(0, 'D'), None).astype(np.int64)
+    title_copy_days = np.bincount(copy_titles, weights=copy_days, minlength=size)
+    title_loan_days = np.bincount(loan_titles, weights=loan_days, minlength=size)
+    utilization = np.divide(
+        title_loan_days, title_copy_days, out=np.zeros(size), where=title_copy_days > 0
+    ).clip(0, 1)
+
+    queue_depth = np.zeros(size, dtype=np.int64)
+    positions, found = _positions(book_ids, queued_books)
+    queue_depth[positions[found]] = queued[found]
+
+    #competition ranking: one more than the number of titles with more loans
+    rank = np.searchsorted(np.sort(-total_loans), -total_loans, side='left') + 1
+
+    order = np.lexsort((book_ids, rank))
+    columns = zip(
+        book_ids[order].tolist(),
+        titles[order].tolist(),
+        total_loans[order].tolist(),
+        np.round(utilization[order], 4).tolist(),
+        np.round(average_loan_days[order], 2).tolist(),
+        queue_depth[order].tolist(),
+        rank[order].tolist(),
+    )
+    return [
+        {
+            'book_structure_id': book_id,
+            'title': title,
+            'total_loans': loans,
+            'utilization': used,
+            'average_loan_days': None if np.isnan(average) else average,
+            'queue_depth': depth,
+            'rank': place,
+        }
+        for book_id, title, loans, used, average, depth, place in columns
+    ]
+
+
+def title_statistics(days=STATISTICS_WINDOW_DAYS, today=None):
+    '''
+    `compute_title_statistics`, cached until an issue, return, hold queue change or copy
+    addition or removal moves the circulation version, or the day changes. Edits of book
+    details leave it alone; a title added since shows up with its first copy.
+    '''
+    today = today or timezone.localdate()
+    key = f'books:title_statistics:{get_circulation_version()}:{days}:{today.isoformat()}'
+    statistics = cache.get(key)
+    if statistics is None:
+        statistics = compute_title_statistics(days, today)
+        cache.set(key, statistics, STATISTICS_TIMEOUT)
+    return statistics
+# ════════════════════════════════════════════════════════════════════════════════
@@ -6,4 +6,5 @@ class BooksConfig(AppConfig):
     name = 'books'
 
     def ready(self):
-        import books.signals
\ No newline at end of file
+        import books.signals
+        import books.checks
\ No newline at end of file
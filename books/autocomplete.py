@@ -0,0 +1,195 @@
+# Standard Library imports
+from array import array
+from bisect import bisect_left, insort
+import threading
+
+#local imports
+from .cache import get_catalog_version
+
+AUTOCOMPLETE_FIELDS = ('title', 'author', 'publisher')
+
+#entries pack (value id, word offset) into one integer: value_id << OFFSET_BITS | offset
+OFFSET_BITS = 8
+OFFSET_MASK = (1 << OFFSET_BITS) - 1
+
+
+def normalize(text):
+    return ' '.join((text or '').lower().split())
+
+
+# ══════════════════════════ Prefix Index ══════════════════════════════════════════════════════
+class PrefixIndex:
+    '''
+    Sorted-array prefix index for the distinct values of one field.
+
+    Each distinct value is stored once; the index itself is a flat `array` of packed
+    integers, one per word start of every value, kept sorted by the text that follows
+    that word start. A prefix lookup is a `bisect` into that array followed by a short
+    forward scan, so "gats" finds "The Great Gatsby" without any per-request allocation
+    proportional to the catalog.
+
+    Values are reference counted: several books by the same author share one entry.
+    '''
+    def __init__(self):
+        self._values = []      # value id -> (normalized, display)
+        self._ids = {}         # display -> value id
+        self._refs = []        # value id -> number of books using it
+        self._free = []
+        self._entries = array('q')
+
+    def _suffix(self, entry):
+        return self._values[entry >> OFFSET_BITS][0][entry & OFFSET_MASK:]
+
+    def _entries_for(self, value_id):
+        normalized = self._values[value_id][0]
+        offsets = [0] + [i + 1 for i, char in enumerate(normalized) if char == ' ']
+        return [value_id << OFFSET_BITS | offset for offset in offsets if offset <= OFFSET_MASK]
+
+    def add(self, display):
+        normalized = normalize(display)
+        if not normalized:
+            return
+        value_id = self._ids.get(display)
+        if value_id is not None:
+            self._refs[value_id] += 1
+            return
+        if self._free:
+            value_id = self._free.pop()
+            self._values[value_id] = (normalized, display)
+            self._refs[value_id] = 1
+        else:
+            value_id = len(self._values)
+            self._values.append((normalized, display))
+            self._refs.append(1)
+        self._ids[display] = value_id
+        for entry in self._entries_for(value_id):
+            insort(self._entries, entry, key=self._suffix)
+
+    def discard(self, display):
+        value_id = self._ids.get(display)
+        if value_id is None:
+            return
+        self._refs[value_id] -= 1
+        if self._refs[value_id] > 0:
+            return
+        for entry in self._entries_for(value_id):
+            position = bisect_left(self._entries, self._suffix(entry), key=self._suffix)
+            while position < len(self._entries) and self._entries[position] != entry:
+                position += 1
+            if position < len(self._entries):
+                del self._entries[position]
+        del self._ids[display]
+        self._free.append(value_id)
+
+    def bulk_load(self, displays):
+        '''
+        Builds the index in one pass: collect, then sort once.
+        '''
+        self.__init__()
+        for display in displays:
+            normalized = normalize(display)
+            if not normalized:
+                continue
+            value_id = self._ids.get(display)
+            if value_id is not None:
+                self._refs[value_id] += 1
+                continue
+            value_id = len(self._values)
+            self._values.append((normalized, display))
+            self._refs.append(1)
+            self._ids[display] = value_id
+        entries = [entry for value_id in range(len(self._values)) for entry in self._entries_for(value_id)]
+        entries.sort(key=self._suffix)
+        self._entries = array('q', entries)
+
+    def complete(self, prefix, limit):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        position = bisect_left(self._entries, prefix, key=self._suffix)
+        while position < len(self._entries) and len(results) < limit:
+            entry = self._entries[position]
+            if not self._suffix(entry).startswith(prefix):
+                break
+            value_id = entry >> OFFSET_BITS
+            if value_id not in seen:
+                seen.add(value_id)
+                results.append(self._values[value_id][1])
+            position += 1
+        return results
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Catalog Autocomplete ══════════════════════════════════════════════════════
+class CatalogAutocomplete:
+    '''
+    Title, author and publisher completions held in process memory.
+
+    Loaded from the database lazily, on the first lookup, and then updated
+    incrementally by the BookStructure save/delete hooks once their transaction
+    commits, so lookups never query the database for the completions. Writes committed
+    by other workers move the catalog version, and the next lookup reloads the index.
+    '''
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._indexes = {field: PrefixIndex() for field in AUTOCOMPLETE_FIELDS}
+        self._books = {}
+        self._version = None
+        self._loaded = False
+
+    def load(self):
+        '''
+        (Re)builds the index. The catalog version is read before the rows, so a write
+        committed while they are read still moves the version away from this one.
+        '''
+        from .models import BookStructure
+        with self._lock:
+            version = get_catalog_version()
+            rows = BookStructure.objects.values_list('id', *AUTOCOMPLETE_FIELDS)
+            self._books = {row[0]: row[1:] for row in rows.iterator(chunk_size=5000)}
+            for position, field in enumerate(AUTOCOMPLETE_FIELDS):
+                self._indexes[field].bulk_load(values[position] for values in self._books.values())
+            self._version = version
+            self._loaded = True
+
+    def update(self, book_id, title, author, publisher):
+        with self._lock:
+            if not self._loaded:
+                return
+            values = (title, author, publisher)
+            previous = self._books.get(book_id)
+            if previous == values:
+                return
+            for position, field in enumerate(AUTOCOMPLETE_FIELDS):
+                if previous is not None and previous[position] == values[position]:
+                    continue
+                if previous is not None:
+                    self._indexes[field].discard(previous[position])
+                self._indexes[field].add(values[position])
+            self._books[book_id] = values
+
+    def remove(self, book_id):
+        with self._lock:
+            if not self._loaded:
+                return
+            previous = self._books.pop(book_id, None)
+            if previous is None:
+                return
+            for position, field in enumerate(AUTOCOMPLETE_FIELDS):
+                self._indexes[field].discard(previous[position])
+
+    def complete(self, prefix, fields=AUTOCOMPLETE_FIELDS, limit=10):
+        '''
+        Returns up to `limit` completions per requested field, in alphabetical order
+        of the matched text: `{'title': [...], 'author': [...], ...}`.
+        '''
+        if not self._loaded or self._version != get_catalog_version():
+            self.load()
+        with self._lock:
+            return {field: self._indexes[field].complete(prefix, limit) for field in fields}
+
+
+catalog_autocomplete = CatalogAutocomplete()
+# ════════════════════════════════════════════════════════════════════════════════
@@ -0,0 +1,208 @@
+# Standard Library imports
+import functools
+import hashlib
+import math
+import time
+
+#Django imports
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+#Third-party imports
+from rest_framework.response import Response
+
+CATALOG_VERSION_KEY = 'books:catalog_version'
+COPIES_VERSION_KEY = 'books:copies_version:{}'
+CIRCULATION_VERSION_KEY = 'books:circulation_version'
+#cached responses expire on their own after this long even if the version never moves
+CATALOG_RESPONSE_TIMEOUT = 60 * 60
+
+
+# ══════════════════════════ Version stamps ══════════════════════════════════════════════════════
+def _get_version(key):
+    '''
+    Version stamps are the time of the last change in nanoseconds, so they double as
+    Last-Modified values. A missing stamp (cleared or restarted cache) is seeded with
+    the current time, which never matches a version older responses were stored under.
+    '''
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key):
+    '''
+    Moves the stamp forward to the current time with an atomic `incr`, so concurrent
+    bumps from different workers are never lost and the stamp never goes back, even if
+    the clock steps back. Bumps racing each other can push it a little ahead of the
+    clock; Last-Modified is simply withheld until the clock catches up.
+    '''
+    current = _get_version(key)
+    try:
+        cache.incr(key, max(time.time_ns() - current, 1))
+    except ValueError:
+        #evicted in between: a fresh seed is newer than anything stored under the old stamp
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def get_catalog_version():
+    '''
+    Current catalog version stamp, moved by every book, copy or issue write.
+    '''
+    return _get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    _bump_version(CATALOG_VERSION_KEY)
+
+
+def get_copies_version(book_id):
+    '''
+    Version stamp of the copy state (statuses, additions, removals) of one book.
+    '''
+    return _get_version(COPIES_VERSION_KEY.format(book_id))
+
+
+def bump_copies_version(book_id):
+    _bump_version(COPIES_VERSION_KEY.format(book_id))
+
+
+def get_circulation_version():
+    '''
+    Version stamp of the circulation state (issues, returns, hold queues), which
+    the cached circulation statistics are keyed on.
+    '''
+    return _get_version(CIRCULATION_VERSION_KEY)
+
+
+def bump_circulation_version():
+    _bump_version(CIRCULATION_VERSION_KEY)
+
+
+def catalog_changed():
+    '''
+    Invalidates every cached catalog response once the current transaction commits.
+
+    Bumping after commit (not before) stops a concurrent reader from caching the
+    pre-commit state under the new version.
+    '''
+    transaction.on_commit(bump_catalog_version)
+
+
+def copies_changed(book_id):
+    '''
+    Moves the copy-state version of one book, and the circulation version (utilization
+    is measured against the copies), once the current transaction commits.
+    '''
+    def bump():
+        bump_copies_version(book_id)
+        bump_circulation_version()
+    transaction.on_commit(bump)
+
+
+def circulation_changed():
+    '''
+    Moves the circulation version once the current transaction commits.
+    '''
+    transaction.on_commit(bump_circulation_version)
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Response cache ══════════════════════════════════════════════════════
+def cache_catalog_response(view):
+    '''
+    Caches the `data` of successful (200) DRF responses of a catalog read view.
+
+    Keys combine the catalog version with the host and full path (query string included),
+    so every write that bumps the version makes all previous entries unreachable.
+    Non-DRF responses (e.g. streamed exports) are passed through untouched.
+
+    Apply it below `@permission_classes` so permission checks still run on cache hits.
+    '''
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        path = hashlib.md5(f'{request.get_host()}{request.get_full_path()}'.encode()).hexdigest()
+        key = f'books:response:{view.__name__}:{get_catalog_version()}:{path}'
+        data = cache.get(key)
+        if data is not None:
+            return Response(data, status=200)
+        response = view(request, *args, **kwargs)
+        if isinstance(response, Response) and response.status_code == 200:
+            cache.set(key, response.data, CATALOG_RESPONSE_TIMEOUT)
+        return response
+    return wrapper
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Conditional GET ══════════════════════════════════════════════════════
+def catalog_list_state(request, *args, **kwargs):
+    '''
+    Validator source for catalog listings: the catalog version and the requested page.
+    '''
+    version = get_catalog_version()
+    return f'{version}:{request.get_full_path()}', version / 1e9
+
+
+def book_detail_state(request, book_structure_id, *args, **kwargs):
+    '''
+    Validator source for one book, read from the database so every worker derives the
+    same ETag: its `updated_at` and copy counters, plus the id and status of every copy.
+    Costs a primary key lookup and one indexed read of the copies; returns None when the
+    book does not exist.
+
+    Copy changes leave no timestamp behind, so there is no Last-Modified (only the ETag).
+    '''
+    from .models import BookStructure, BookCopy
+    book = (
+        BookStructure.objects.filter(pk=book_structure_id)
+        .values_list('updated_at', 'available_count', 'issued_count', 'total_copies')
+        .first()
+    )
+    if book is None:
+        return None
+    updated_at, *counters = book
+    copies = BookCopy.objects.filter(book_instance_id=book_structure_id).order_by('pk').values_list('pk', 'status')
+    source = f'{book_structure_id}:{updated_at.isoformat()}:{counters}:{list(copies)}'
+    return source, None
+
+
+def conditional_catalog_response(state_func):
+    '''
+    Adds strong ETag / Last-Modified validators to a read view and answers
+    `If-None-Match` / `If-Modified-Since` with 304 before the view (or the response
+    cache) runs.
+
+    `state_func(request, *args, **kwargs)` returns `(etag source, modified timestamp)`
+    (the timestamp may be None) or None when the resource does not exist. HTTP dates only have one second resolution,
+    so Last-Modified is only used once the second of the last change is over; until then
+    a later change in that same second could not be told apart, and only the ETag applies.
+    '''
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            state = state_func(request, *args, **kwargs)
+            if state is None:
+                return view(request, *args, **kwargs)
+            source, modified = state
+            etag = quote_etag(hashlib.md5(source.encode()).hexdigest())
+            last_modified = math.floor(modified) if modified is not None else None
+            if last_modified is not None and last_modified >= math.floor(time.time()):
+                last_modified = None
+
+            not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if not_modified is not None:
+                return not_modified
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+                if last_modified is not None:
+                    response['Last-Modified'] = http_date(last_modified)
+            return response
+        return wrapper
+    return decorator
+# ════════════════════════════════════════════════════════════════════════════════
@@ -0,0 +1,31 @@
+#Django imports
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+#backends private to one process: every worker would only see its own version bumps
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    '''
+    The catalog response cache, its ETags and the circulation statistics are keyed on
+    version stamps stored in the default cache (books.cache). With a cache private to
+    each process, a write in one worker leaves the others serving stale responses.
+    '''
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if settings.DEBUG or backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        Error(
+            f'The default cache ({backend}) is not shared between worker processes.',
+            hint=(
+                'Set CACHE_BACKEND to django.core.cache.backends.redis.RedisCache or '
+                'django.core.cache.backends.memcached.PyMemcacheCache (and CACHE_LOCATION).'
+            ),
+            id='books.E001',
+        )
+    ]
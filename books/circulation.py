@@ -0,0 +1,561 @@
+# Standard Library imports
+from collections import Counter, defaultdict
+
+#Django imports
+from django.db import transaction, connections, DEFAULT_DB_ALIAS
+from django.db.models import Exists, OuterRef, Subquery, F
+from django.utils import timezone
+
+#local imports
+from .models import BookStructure, BookCopy, IssueBook, BookHold, supports_update_returning
+from .holds import HoldService, ON_HOLD, READY as HOLD_READY
+from .rollups import record_loans, record_returns, age_band
+from .signals import issue_book_signal, return_book_signal, books_returned_signal
+from user_app.models import CustomerCreate
+
+AVAILABLE = 'Available To issue'
+ISSUED = 'Issued'
+
+#conditional UPDATE claims retried before giving up, when SKIP LOCKED is not available
+CLAIM_ATTEMPTS = 5
+#titles a single checkout may contain
+MAX_CHECKOUT_ITEMS = 20
+#copies a single batch return may contain
+MAX_RETURN_ITEMS = 500
+
+
+# ══════════════════════════ Errors ══════════════════════════════════════════════════════
+class IssuanceError(Exception):
+    '''
+    A loan that can not be made; the message is safe to show to the patron.
+    '''
+
+
+class AlreadyIssued(IssuanceError):
+    def __init__(self):
+        super().__init__('This book is already issued')
+
+
+class NoCopyAvailable(IssuanceError):
+    def __init__(self):
+        super().__init__('No available copy to issue')
+
+
+class ReturnError(Exception):
+    '''
+    A return that can not be processed; the message is safe to show to the patron.
+    '''
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Issuance ══════════════════════════════════════════════════════
+class IssuanceService:
+    '''
+    Issues books with a contention-safe copy claim.
+
+    The claim is a single conditional UPDATE that flips the lowest-numbered available
+    copy to 'Issued' and returns its id. On PostgreSQL the copy is picked with
+    `FOR UPDATE SKIP LOCKED`, so parallel requests for a popular title each take a
+    different copy instead of queueing on the same row. SQLite runs one writer at a
+    time, which makes the same statement race-free there. Other backends lock the copy
+    with `select_for_update(skip_locked=True)` when they support it, or retry a
+    conditional `UPDATE ... WHERE status = 'Available To issue'` on the next copy.
+    '''
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    def _available_copies(self, book_structure_id):
+        return BookCopy.objects.using(self.using).filter(
+            book_instance_id=book_structure_id,
+            status=AVAILABLE,
+        ).order_by('copy_number')
+
+    def claim_copy(self, book_structure_id):
+        '''
+        Flips one available copy of the book to 'Issued' and returns its id, or None
+        when every copy is taken. Must run inside a transaction.
+        '''
+        connection = connections[self.using]
+        if supports_update_returning(connection):
+            table = BookCopy._meta.db_table
+            lock = ' FOR UPDATE SKIP LOCKED' if connection.vendor == 'postgresql' else ''
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'''
+                    UPDATE {table} SET status = %s
+                    WHERE status = %s AND id = (
+                        SELECT id FROM {table}
+                        WHERE book_instance_id = %s AND status = %s
+                        ORDER BY copy_number
+                        LIMIT 1{lock}
+                    )
+                    RETURNING id
+                    ''',
+                    [ISSUED, AVAILABLE, book_structure_id, AVAILABLE],
+                )
+                row = cursor.fetchone()
+            return row[0] if row else None
+
+        if connection.features.has_select_for_update_skip_locked:
+            copy_id = (
+                self._available_copies(book_structure_id)
+                .select_for_update(skip_locked=True)
+                .values_list('id', flat=True)
+                .first()
+            )
+            if copy_id is None:
+                return None
+            BookCopy.objects.using(self.using).filter(pk=copy_id).update(status=ISSUED)
+            return copy_id
+
+        for _ in range(CLAIM_ATTEMPTS):
+            copy_id = self._available_copies(book_structure_id).values_list('id', flat=True).first()
+            if copy_id is None:
+                return None
+            if BookCopy.objects.using(self.using).filter(pk=copy_id, status=AVAILABLE).update(status=ISSUED):
+                return copy_id
+        return None
+
+    def claim_copies(self, book_structure_ids):
+        '''
+        Set-based `claim_copy`: flips the lowest-numbered available copy of every book to
+        'Issued' and returns `{book id: copy id}` for the books that had one.
+        Must run inside a transaction.
+        '''
+        connection = connections[self.using]
+        if not supports_update_returning(connection):
+            claimed = {}
+            for book_structure_id in book_structure_ids:
+                copy_id = self.claim_copy(book_structure_id)
+                if copy_id is not None:
+                    claimed[book_structure_id] = copy_id
+            return claimed
+
+        copies = BookCopy._meta.db_table
+        lock = ' FOR UPDATE SKIP LOCKED' if connection.vendor == 'postgresql' else ''
+        placeholders = ', '.join(['%s'] * len(book_structure_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'''
+                UPDATE {copies} SET status = %s
+                WHERE status = %s AND id IN (
+                    SELECT (
+                        SELECT c.id FROM {copies} c
+                        WHERE c.book_instance_id = s.id AND c.status = %s
+                        ORDER BY c.copy_number
+                        LIMIT 1{lock}
+                    )
+                    FROM {BookStructure._meta.db_table} s
+                    WHERE s.id IN ({placeholders})
+                )
+                RETURNING book_instance_id, id
+                ''',
+                [ISSUED, AVAILABLE, AVAILABLE, *book_structure_ids],
+            )
+            return dict(cursor.fetchall())
+
+    def _customer_and_open_loan(self, user, book_structure_id):
+        #the borrower's CustomerCreate id and age, whether they already hold a copy of the
+        #book, the copy set aside for their ready hold (if any) and the book's genre, in one query
+        open_loan = IssueBook.objects.filter(
+            issued_by=OuterRef('pk'),
+            book__book_instance_id=book_structure_id,
+            returned_on__isnull=True,
+        )
+        ready_hold = BookHold.objects.filter(
+            customer=OuterRef('pk'),
+            book_id=book_structure_id,
+            status=HOLD_READY,
+        )
+        row = (
+            CustomerCreate.objects.using(self.using)
+            .filter(user=user)
+            .annotate(
+                has_open_loan=Exists(open_loan),
+                held_copy_id=Subquery(ready_hold.values('copy_id')[:1]),
+                genre=Subquery(BookStructure.objects.filter(pk=book_structure_id).values('genre')),
+            )
+            .values_list('pk', 'has_open_loan', 'held_copy_id', 'age', 'genre')
+            .first()
+        )
+        if row is None:
+            raise CustomerCreate.DoesNotExist('Customer does not exist')
+        return row
+
+    def issue(self, user, book_structure_id, issue_date, return_date):
+        '''
+        Lends one copy of the book to the user in a single transaction of seven
+        statements: the copy claim, one query for the customer, their open loans and the
+        book's genre, the availability counter UPDATE, the IssueBook insert and one upsert
+        into each of the three rollup tables (where the backend has INSERT ... ON
+        CONFLICT; the rollups cost an UPDATE, or an UPDATE and an INSERT, per table
+        otherwise).
+
+        The claim runs first so the transaction starts with its write (SQLite then takes
+        the write lock up front instead of failing to upgrade a read lock); a failed
+        check rolls the claim back. A patron whose hold is ready gets the copy set aside
+        for them and the shelf copy is put back. Facets, cache versions and
+        `issue_book_signal` are handled after the commit.
+
+        Returns the new IssueBook. Raises AlreadyIssued, NoCopyAvailable,
+        BookStructure.DoesNotExist or CustomerCreate.DoesNotExist.
+        '''
+        with transaction.atomic(using=self.using):
+            copy_id = self.claim_copy(book_structure_id)
+            customer_id, has_open_loan, held_copy_id, age, genre = self._customer_and_open_loan(user, book_structure_id)
+            if has_open_loan:
+                raise AlreadyIssued()
+            old_status = AVAILABLE
+            if held_copy_id is not None:
+                if copy_id is not None:
+                    BookCopy.objects.using(self.using).filter(pk=copy_id).update(status=AVAILABLE)
+                HoldService(self.using).collect(customer_id, {book_structure_id: held_copy_id})
+                copy_id, old_status = held_copy_id, ON_HOLD
+            elif copy_id is None:
+                if not BookStructure.objects.using(self.using).filter(pk=book_structure_id).exists():
+                    raise BookStructure.DoesNotExist('Book not found')
+                raise NoCopyAvailable()
+
+            BookStructure.objects.using(self.using).apply_copy_change(book_structure_id, old_status, ISSUED)
+            loan = IssueBook.objects.using(self.using).create(
+                book_id=copy_id,
+                issued_by_id=customer_id,
+                issue_date=issue_date,
+                return_date=return_date,
+                book_structure_id=book_structure_id,
+                genre=genre,
+                age_band=age_band(age),
+            )
+            record_loans([(book_structure_id, customer_id, issue_date, loan.genre, loan.age_band)], using=self.using)
+            transaction.on_commit(
+                lambda: issue_book_signal.send(sender=IssueBook, book_copy_id=copy_id, book_structure_id=book_structure_id),
+                using=self.using,
+                robust=True,
+            )
+        return loan
+
+    def issue_many(self, user, book_structure_ids, issue_date, return_date):
+        '''
+        Checks out several titles for one user in one transaction, with a fixed number of
+        statements however many titles there are: one claim UPDATE for all copies, one
+        query for the customer, one for their open loans, one for their ready holds, one
+        counter UPDATE, one query for the titles' genres, one `bulk_create` of the loans
+        and one upsert into each of the three rollup tables (plus the hold pickup, when
+        the customer has copies set aside). Backends without INSERT ... ON CONFLICT
+        update the rollups row by row instead.
+
+        Titles that can not be issued do not stop the others. Returns one result per
+        distinct id, in request order: `book_structure_id`, `status` ('issued',
+        'already_issued', 'unavailable' or 'not_found') and `book_copy_id` when issued.
+        Raises CustomerCreate.DoesNotExist.
+        '''
+        book_structure_ids = list(dict.fromkeys(book_structure_ids))
+        with transaction.atomic(using=self.using):
+            claimed = self.claim_copies(book_structure_ids)
+            customer = CustomerCreate.objects.using(self.using).filter(user=user).values_list('pk', 'age').first()
+            if customer is None:
+                raise CustomerCreate.DoesNotExist('Customer does not exist')
+            customer_id, band = customer[0], age_band(customer[1])
+            already_issued = set(
+                IssueBook.objects.using(self.using).filter(
+                    issued_by_id=customer_id,
+                    book__book_instance_id__in=book_structure_ids,
+                    returned_on__isnull=True,
+                ).values_list('book__book_instance_id', flat=True)
+            )
+
+            held = {
+                book_id: copy_id
+                for book_id, copy_id in BookHold.objects.using(self.using).filter(
+                    customer_id=customer_id,
+                    book_id__in=book_structure_ids,
+                    status=HOLD_READY,
+                    copy__isnull=False,
+                ).values_list('book_id', 'copy_id')
+                if book_id not in already_issued
+            }
+
+            #copies claimed for titles the customer already has, or has a copy set aside for, go back on the shelf
+            released = [claimed.pop(book_id) for book_id in already_issued | set(held) if book_id in claimed]
+            if released:
+                BookCopy.objects.using(self.using).filter(pk__in=released).update(status=AVAILABLE)
+            if claimed:
+                BookStructure.objects.using(self.using).filter(pk__in=list(claimed)).update(
+                    available_count=F('available_count') - 1,
+                    issued_count=F('issued_count') + 1,
+                )
+            if held:
+                HoldService(self.using).collect(customer_id, held)
+                BookStructure.objects.using(self.using).filter(pk__in=list(held)).update(issued_count=F('issued_count') + 1)
+                claimed.update(held)
+
+            #the genres of the loans, and which of the other ids are books at all
+            unresolved = [book_id for book_id in book_structure_ids if book_id not in already_issued]
+            genres = dict(
+                BookStructure.objects.using(self.using).filter(pk__in=unresolved).values_list('pk', 'genre')
+            ) if unresolved else {}
+            if claimed:
+                IssueBook.objects.using(self.using).bulk_create([
+                    IssueBook(
+                        book_id=copy_id,
+                        issued_by_id=customer_id,
+                        issue_date=issue_date,
+                        return_date=return_date,
+                        book_structure_id=book_id,
+                        genre=genres[book_id],
+                        age_band=band,
+                    )
+                    for book_id, copy_id in claimed.items()
+                ])
+                record_loans([(book_id, customer_id, issue_date, genres[book_id], band) for book_id in claimed], using=self.using)
+
+            def notify():
+                for book_id, copy_id in claimed.items():
+                    issue_book_signal.send(sender=IssueBook, book_copy_id=copy_id, book_structure_id=book_id)
+            transaction.on_commit(notify, using=self.using, robust=True)
+
+        results = []
+        for book_id in book_structure_ids:
+            if book_id in claimed:
+                results.append({'book_structure_id': book_id, 'status': 'issued', 'book_copy_id': claimed[book_id]})
+            elif book_id in already_issued:
+                results.append({'book_structure_id': book_id, 'status': 'already_issued'})
+            elif book_id in genres:
+                results.append({'book_structure_id': book_id, 'status': 'unavailable'})
+            else:
+                results.append({'book_structure_id': book_id, 'status': 'not_found'})
+        return results
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Returns ══════════════════════════════════════════════════════
+class ReturnService:
+    '''
+    Processes returns with conditional UPDATEs instead of load-then-save.
+    '''
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    def _close_loan(self, user, book_copy_id, returned_on):
+        '''
+        Closes the caller's open loan of this copy, matched through their customer in the
+        same statement. Returns `(customer id, issue date, return date, genre, age band)`
+        of the loan, or None when there was none; UPDATE ... RETURNING where supported.
+        '''
+        connection = connections[self.using]
+        if supports_update_returning(connection):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'''
+                    UPDATE {IssueBook._meta.db_table} SET returned_on = %s
+                    WHERE book_id = %s AND returned_on IS NULL AND issued_by_id IN (
+                        SELECT id FROM {CustomerCreate._meta.db_table} WHERE user_id = %s
+                    )
+                    RETURNING issued_by_id, issue_date, return_date, genre, age_band
+                    ''',
+                    [returned_on, book_copy_id, user.pk],
+                )
+                row = cursor.fetchone()
+            if row is None:
+                return None
+            customer_id, issue_date, return_date, genre, band = row
+            #SQLite hands dates back as text from raw statements
+            field = IssueBook._meta.get_field('issue_date')
+            return customer_id, field.to_python(issue_date), field.to_python(return_date), genre, band
+        open_loan = IssueBook.objects.using(self.using).filter(
+            book_id=book_copy_id,
+            returned_on__isnull=True,
+            issued_by__in=CustomerCreate.objects.filter(user=user).values('pk'),
+        )
+        row = open_loan.select_for_update().values_list('issued_by_id', 'issue_date', 'return_date', 'genre', 'age_band').first()
+        if row is not None:
+            open_loan.update(returned_on=returned_on)
+        return row
+
+    def _return_error(self, user, book_copy_id):
+        #only runs when nothing was closed, to tell the caller why
+        if not CustomerCreate.objects.using(self.using).filter(user=user).exists():
+            return ReturnError('Customer does not exist.')
+        if not BookCopy.objects.using(self.using).filter(pk=book_copy_id).exists():
+            return ReturnError('Book copy not found.')
+        return ReturnError('No active issue found for this book copy.')
+
+    def _copy_returned(self, book_copy_id, flipped):
+        '''
+        Moves the counters of the copy's book when the copy went back to 'Available To issue'
+        and returns `(book id, title)`; one UPDATE ... RETURNING where supported.
+        '''
+        connection = connections[self.using]
+        if flipped and supports_update_returning(connection):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'''
+                    UPDATE {BookStructure._meta.db_table}
+                    SET available_count = available_count + 1, issued_count = issued_count - 1
+                    WHERE id = (SELECT book_instance_id FROM {BookCopy._meta.db_table} WHERE id = %s)
+                    RETURNING id, title
+                    ''',
+                    [book_copy_id],
+                )
+                return cursor.fetchone()
+        book_id, title = (
+            BookCopy.objects.using(self.using)
+            .filter(pk=book_copy_id)
+            .values_list('book_instance_id', 'book_instance__title')
+            .get()
+        )
+        if flipped:
+            BookStructure.objects.using(self.using).apply_copy_change(book_id, ISSUED, AVAILABLE)
+        return book_id, title
+
+    def return_copy(self, user, book_copy_id):
+        '''
+        Closes the user's open loan of a copy and puts the copy back on the shelf in one
+        transaction of three statements: close the loan, flip the copy from 'Issued' to
+        'Available To issue', move the book's counters (returning its title). When the
+        title has waiting holds the copy is set aside for the oldest one instead. The
+        monthly rollups are updated in the same transaction.
+
+        Returns a dict with `book_copy_id`, `book_structure_id`, `book_title` and
+        `returned_on`. Raises ReturnError when the user has no open loan of the copy.
+        '''
+        returned_on = timezone.localdate()
+        with transaction.atomic(using=self.using):
+            loan = self._close_loan(user, book_copy_id, returned_on)
+            if loan is None:
+                raise self._return_error(user, book_copy_id)
+            flipped = BookCopy.objects.using(self.using).filter(pk=book_copy_id, status=ISSUED).update(status=AVAILABLE)
+            book_structure_id, title = self._copy_returned(book_copy_id, flipped)
+            customer_id, issue_date, return_date, genre, band = loan
+            record_returns(
+                [(book_structure_id, customer_id, issue_date, return_date, returned_on, genre, band)],
+                using=self.using,
+            )
+            if flipped:
+                HoldService(self.using).assign_copies({book_copy_id: book_structure_id})
+            transaction.on_commit(
+                lambda: return_book_signal.send(sender=IssueBook, book_copy_id=book_copy_id, book_structure_id=book_structure_id),
+                using=self.using,
+                robust=True,
+            )
+        return {
+            'book_copy_id': book_copy_id,
+            'book_structure_id': book_structure_id,
+            'book_title': title,
+            'returned_on': returned_on,
+        }
+
+    def _close_loans(self, book_copy_ids, returned_on):
+        '''
+        Closes the open loans of the copies, whoever holds them. Returns
+        `{copy id: (customer id, issue date, return date, genre, age band)}` of the loans
+        closed.
+        '''
+        connection = connections[self.using]
+        open_loans = IssueBook.objects.using(self.using).filter(book_id__in=book_copy_ids, returned_on__isnull=True)
+        if not supports_update_returning(connection):
+            closed = {
+                book_id: loan
+                for book_id, *loan in open_loans.select_for_update().values_list(
+                    'book_id', 'issued_by_id', 'issue_date', 'return_date', 'genre', 'age_band'
+                )
+            }
+            open_loans.filter(book_id__in=list(closed)).update(returned_on=returned_on)
+            return closed
+        placeholders = ', '.join(['%s'] * len(book_copy_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'''
+                UPDATE {IssueBook._meta.db_table} SET returned_on = %s
+                WHERE returned_on IS NULL AND book_id IN ({placeholders})
+                RETURNING book_id, issued_by_id, issue_date, return_date, genre, age_band
+                ''',
+                [returned_on, *book_copy_ids],
+            )
+            rows = cursor.fetchall()
+        #SQLite hands dates back as text from raw statements
+        field = IssueBook._meta.get_field('issue_date')
+        return {
+            book_id: (customer_id, field.to_python(issue_date), field.to_python(return_date), genre, band)
+            for book_id, customer_id, issue_date, return_date, genre, band in rows
+        }
+
+    def _shelve_copies(self, book_copy_ids):
+        #flips the 'Issued' copies back to 'Available To issue'; returns `{copy id: book id}` of those flipped
+        connection = connections[self.using]
+        issued = BookCopy.objects.using(self.using).filter(pk__in=book_copy_ids, status=ISSUED)
+        if not supports_update_returning(connection):
+            flipped = dict(issued.select_for_update().values_list('pk', 'book_instance_id'))
+            issued.filter(pk__in=list(flipped)).update(status=AVAILABLE)
+            return flipped
+        placeholders = ', '.join(['%s'] * len(book_copy_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'''
+                UPDATE {BookCopy._meta.db_table} SET status = %s
+                WHERE status = %s AND id IN ({placeholders})
+                RETURNING id, book_instance_id
+                ''',
+                [AVAILABLE, ISSUED, *book_copy_ids],
+            )
+            return dict(cursor.fetchall())
+
+    def return_many(self, book_copy_ids):
+        '''
+        Checks in a batch of copies (book-drop, scanner) whoever borrowed them, in one
+        transaction: one UPDATE closes every open loan of the copies, one UPDATE puts the
+        copies back on the shelf, and the book counters move with one UPDATE per distinct
+        number of copies returned per book (usually one). Copies of titles with waiting
+        holds are then set aside for them, and the monthly rollups take the closed loans.
+
+        Returns `returned` (copy ids whose loan was closed, in request order),
+        `no_active_loan` (existing copies without an open loan) and `not_found`.
+        '''
+        book_copy_ids = list(dict.fromkeys(book_copy_ids))
+        returned_on = timezone.localdate()
+        with transaction.atomic(using=self.using):
+            closed = self._close_loans(book_copy_ids, returned_on)
+            flipped = self._shelve_copies(list(closed)) if closed else {}
+
+            by_count = defaultdict(list)
+            for book_id, count in Counter(flipped.values()).items():
+                by_count[count].append(book_id)
+            for count, book_ids in by_count.items():
+                BookStructure.objects.using(self.using).filter(pk__in=book_ids).update(
+                    available_count=F('available_count') + count,
+                    issued_count=F('issued_count') - count,
+                )
+            if flipped:
+                HoldService(self.using).assign_copies(flipped)
+
+            #loans of copies that were no longer 'Issued' (e.g. marked lost) still count as returned
+            books = dict(flipped)
+            others = [book_copy_id for book_copy_id in closed if book_copy_id not in books]
+            if others:
+                books.update(BookCopy.objects.using(self.using).filter(pk__in=others).values_list('pk', 'book_instance_id'))
+            record_returns(
+                [
+                    (books[book_copy_id], customer_id, issue_date, return_date, returned_on, genre, band)
+                    for book_copy_id, (customer_id, issue_date, return_date, genre, band) in closed.items()
+                ],
+                using=self.using,
+            )
+
+            unmatched = [book_copy_id for book_copy_id in book_copy_ids if book_copy_id not in closed]
+            existing = set(
+                BookCopy.objects.using(self.using).filter(pk__in=unmatched).values_list('pk', flat=True)
+            ) if unmatched else set()
+
+            if closed:
+                transaction.on_commit(
+                    lambda: books_returned_signal.send(sender=IssueBook, returned=flipped),
+                    using=self.using,
+                    robust=True,
+                )
+        return {
+            'returned_on': returned_on,
+            'returned': [book_copy_id for book_copy_id in book_copy_ids if book_copy_id in closed],
+            'no_active_loan': [book_copy_id for book_copy_id in unmatched if book_copy_id in existing],
+            'not_found': [book_copy_id for book_copy_id in unmatched if book_copy_id not in existing],
+        }
+# ════════════════════════════════════════════════════════════════════════════════
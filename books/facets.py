@@ -0,0 +1,184 @@
+# Standard Library imports
+from collections import Counter
+
+# Django imports
+from django.db import transaction, IntegrityError
+from django.db.models import F, Count
+
+#local imports
+from .models import BookStructure, BookFacet, FacetCount
+
+FACETS = ('genre', 'author', 'publisher', 'decade', 'price_band', 'availability')
+SNAPSHOT_FIELDS = ('genre', 'author', 'publisher', 'decade', 'price_band', 'is_available')
+
+#(upper bound exclusive, label); the last band has no upper bound
+PRICE_BANDS = (
+    (10, 'under-10'),
+    (25, '10-25'),
+    (50, '25-50'),
+    (100, '50-100'),
+    (None, '100-plus'),
+)
+
+#facet values shown per facet in the browse sidebar
+FACET_VALUES_LIMIT = 20
+
+
+# ══════════════════════════ Facet values ══════════════════════════════════════════════════════
+def price_band(price):
+    for upper, label in PRICE_BANDS:
+        if upper is None or price < upper:
+            return label
+
+
+def decade(publication_date):
+    return publication_date.year // 10 * 10
+
+
+def _facet_values(genre, author, publisher, decade_value, band, is_available):
+    return {
+        'genre': genre,
+        'author': author,
+        'publisher': publisher,
+        'decade': str(decade_value),
+        'price_band': band,
+        'availability': 'available' if is_available else 'unavailable',
+    }
+
+
+def _snapshot_values(snapshot):
+    return _facet_values(
+        snapshot.genre, snapshot.author, snapshot.publisher,
+        snapshot.decade, snapshot.price_band, snapshot.is_available,
+    )
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Incremental maintenance ══════════════════════════════════════════════════════
+def _bump(facet, value, delta):
+    '''
+    Adds `delta` to one FacetCount row with an F-expression, creating the row on first use.
+    '''
+    if FacetCount.objects.filter(facet=facet, value=value).update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            FacetCount.objects.create(facet=facet, value=value, count=delta)
+    except IntegrityError:
+        #created concurrently, fall back to the increment
+        FacetCount.objects.filter(facet=facet, value=value).update(count=F('count') + delta)
+
+
+def _apply(old_values, new_values):
+    for facet in FACETS:
+        old = old_values[facet] if old_values else None
+        new = new_values[facet] if new_values else None
+        if old == new:
+            continue
+        if old is not None:
+            _bump(facet, old, -1)
+        if new is not None:
+            _bump(facet, new, 1)
+
+
+def refresh_book_facets(book_id):
+    '''
+    Recomputes the facet values of one book and applies the difference to the counters.
+
+    Called after a BookStructure is saved and after any of its copies is saved or deleted.
+    Does nothing when the book no longer exists (it is being deleted).
+    '''
+    refresh_books_facets([book_id])
+
+
+def refresh_books_facets(book_ids):
+    '''
+    Set-based `refresh_book_facets` for many books at once (bulk imports): one read of
+    the books, one of their snapshots, one counter update per distinct facet value
+    that moved, and bulk writes of the snapshots.
+    '''
+    with transaction.atomic():
+        books = BookStructure.objects.filter(pk__in=book_ids).only(
+            'genre', 'author', 'publisher', 'publication_date', 'price', 'available_count'
+        )
+        snapshots = {
+            snapshot.pk: snapshot
+            for snapshot in BookFacet.objects.select_for_update().filter(book_id__in=book_ids)
+        }
+        deltas = Counter()
+        created, changed = [], []
+        for book in books:
+            is_available = book.available_count > 0
+            new_values = _facet_values(
+                book.genre, book.author, book.publisher,
+                decade(book.publication_date), price_band(book.price), is_available,
+            )
+            snapshot = snapshots.get(book.pk)
+            old_values = _snapshot_values(snapshot) if snapshot else None
+            if old_values == new_values:
+                continue
+            for facet in FACETS:
+                if old_values:
+                    deltas[facet, old_values[facet]] -= 1
+                deltas[facet, new_values[facet]] += 1
+            row = BookFacet(
+                book_id=book.pk,
+                genre=book.genre,
+                author=book.author,
+                publisher=book.publisher,
+                decade=int(new_values['decade']),
+                price_band=new_values['price_band'],
+                is_available=is_available,
+            )
+            (changed if snapshot else created).append(row)
+
+        for (facet, value), delta in deltas.items():
+            if delta:
+                _bump(facet, value, delta)
+        BookFacet.objects.bulk_create(created)
+        BookFacet.objects.bulk_update(changed, SNAPSHOT_FIELDS)
+
+
+def remove_book_facets(book_id):
+    '''
+    Drops a deleted book from the counters and removes its snapshot.
+    '''
+    with transaction.atomic():
+        snapshot = BookFacet.objects.select_for_update().filter(book_id=book_id).first()
+        if snapshot is None:
+            return
+        _apply(_snapshot_values(snapshot), None)
+        snapshot.delete()
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Reading ══════════════════════════════════════════════════════
+def facet_counts(filters=None):
+    '''
+    Returns `{facet: [{'value': ..., 'count': ...}, ...]}`, most common values first.
+
+    Without filters the precomputed FacetCount table is read. With filters the counts
+    are grouped over the (already narrowed, indexed) BookFacet rows that match them.
+    '''
+    counts = {}
+    if not filters:
+        for facet in FACETS:
+            rows = FacetCount.objects.filter(facet=facet, count__gt=0).order_by('-count', 'value')
+            counts[facet] = [
+                {'value': value, 'count': count}
+                for value, count in rows.values_list('value', 'count')[:FACET_VALUES_LIMIT]
+            ]
+        return counts
+
+    matching = BookFacet.objects.filter(**filters)
+    for facet in FACETS:
+        column = 'is_available' if facet == 'availability' else facet
+        rows = matching.values(column).annotate(count=Count('pk')).order_by('-count', column)
+        counts[facet] = []
+        for row in rows[:FACET_VALUES_LIMIT]:
+            value = row[column]
+            if facet == 'availability':
+                value = 'available' if value else 'unavailable'
+            counts[facet].append({'value': str(value), 'count': row['count']})
+    return counts
+# ════════════════════════════════════════════════════════════════════════════════
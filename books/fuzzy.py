@@ -0,0 +1,229 @@
+# Standard Library imports
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+import math
+import re
+import threading
+
+#Django imports
+from django.db import connection
+
+#local imports
+from .cache import get_catalog_version
+
+#minimum share of the query's trigrams a title/author must contain to be returned
+DEFAULT_THRESHOLD = 0.5
+
+_pg_trgm_installed = None
+
+
+# ══════════════════════════ Trigram helpers ══════════════════════════════════════════════════════
+def trigrams(text):
+    '''
+    Trigram set of a string, built the way pg_trgm does it: lower-cased words,
+    each padded with two leading spaces and one trailing space.
+    '''
+    grams = set()
+    for word in re.findall(r'[^\W_]+', (text or '').lower()):
+        padded = f'  {word} '
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+def _contains(postings, book_id):
+    position = bisect_left(postings, book_id)
+    return position < len(postings) and postings[position] == book_id
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ In-memory Trigram Index ══════════════════════════════════════════════════════
+class TrigramIndex:
+    '''
+    Pure-Python trigram posting-list index over BookStructure title and author.
+
+    Every trigram maps to a sorted `array` of book ids. A query with `q` trigrams and a
+    threshold `t` needs at least `ceil(t * q)` shared trigrams, so candidates only have
+    to come from the `q - ceil(t * q) + 1` rarest query trigrams (prefix filtering);
+    the remaining trigrams are checked with a binary search per surviving candidate,
+    dropping candidates as soon as they can no longer reach the threshold. Common
+    trigrams such as "the" are therefore never scanned in full.
+
+    The index lives in process memory, is loaded lazily on first use and is then
+    kept current by the BookStructure save/delete hooks of this process once their
+    transaction commits. Writes committed by other workers (or by bulk updates that
+    skip the hooks) move the catalog version, and the next search reloads the index.
+    '''
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}
+        self._documents = {}
+        self._version = None
+        self._loaded = False
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def _add(self, book_id, title, author):
+        self._documents[book_id] = (title, author)
+        for gram in trigrams(title) | trigrams(author):
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array('q')
+            if not postings or postings[-1] < book_id:
+                postings.append(book_id)
+            elif not _contains(postings, book_id):
+                insort(postings, book_id)
+
+    def _remove(self, book_id):
+        document = self._documents.pop(book_id, None)
+        if document is None:
+            return
+        for gram in trigrams(document[0]) | trigrams(document[1]):
+            postings = self._postings.get(gram)
+            if postings is None:
+                continue
+            position = bisect_left(postings, book_id)
+            if position < len(postings) and postings[position] == book_id:
+                del postings[position]
+            if not postings:
+                del self._postings[gram]
+
+    def load(self):
+        '''
+        (Re)builds the index from the database in id order, so postings are appended
+        already sorted.
+
+        The catalog version is read before the rows, so a write committed while they
+        are read still moves the version away from the one recorded here.
+        '''
+        from .models import BookStructure
+        with self._lock:
+            version = get_catalog_version()
+            self._postings = {}
+            self._documents = {}
+            rows = BookStructure.objects.order_by('id').values_list('id', 'title', 'author')
+            for book_id, title, author in rows.iterator(chunk_size=5000):
+                self._add(book_id, title, author)
+            self._version = version
+            self._loaded = True
+
+    def ensure_current(self):
+        '''
+        Loads the index on first use and reloads it once the catalog version moved
+        since the last load.
+        '''
+        if not self._loaded or self._version != get_catalog_version():
+            self.load()
+
+    def update(self, book_id, title, author):
+        with self._lock:
+            if not self._loaded:
+                return
+            self._remove(book_id)
+            self._add(book_id, title, author)
+
+    def remove(self, book_id):
+        with self._lock:
+            if self._loaded:
+                self._remove(book_id)
+
+    def search(self, query, limit=20, threshold=DEFAULT_THRESHOLD):
+        '''
+        Returns up to `limit` dicts (`id`, `title`, `author`, `similarity`), best first.
+
+        `similarity` is the share of the query's trigrams found in the title or author
+        (like pg_trgm's word_similarity); ties are broken by whole-string trigram overlap.
+        '''
+        self.ensure_current()
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+
+        with self._lock:
+            required = max(1, math.ceil(threshold * len(query_grams)))
+            ordered = sorted(query_grams, key=lambda gram: len(self._postings.get(gram, ())))
+            probe = ordered[:len(ordered) - required + 1]
+            verify = [self._postings[gram] for gram in ordered[len(probe):] if gram in self._postings]
+
+            shared = Counter()
+            for gram in probe:
+                shared.update(self._postings.get(gram, ()))
+
+            #verify rarest first and drop candidates as soon as they can no longer reach `required`
+            remaining = len(verify)
+            candidates = {book_id: count for book_id, count in shared.items() if count + remaining >= required}
+            for postings in verify:
+                remaining -= 1
+                survivors = {}
+                for book_id, count in candidates.items():
+                    if _contains(postings, book_id):
+                        count += 1
+                    if count + remaining >= required:
+                        survivors[book_id] = count
+                candidates = survivors
+
+            scored = [(count / len(query_grams), book_id) for book_id, count in candidates.items()]
+
+            scored.sort(reverse=True)
+            results = []
+            for score, book_id in scored[:limit * 4]:
+                title, author = self._documents[book_id]
+                document_grams = trigrams(title) | trigrams(author)
+                overlap = len(query_grams & document_grams) / len(query_grams | document_grams)
+                results.append((score, overlap, book_id, title, author))
+
+        results.sort(key=lambda row: (-row[0], -row[1], row[2]))
+        return [
+            {'id': book_id, 'title': title, 'author': author, 'similarity': round(score, 4)}
+            for score, _, book_id, title, author in results[:limit]
+        ]
+
+
+trigram_index = TrigramIndex()
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Public API ══════════════════════════════════════════════════════
+def _has_pg_trgm():
+    '''
+    pg_trgm is a contrib extension; migration 0015 skips it when the server does not ship it.
+    The lookup result is cached for the life of the process.
+    '''
+    global _pg_trgm_installed
+    if _pg_trgm_installed is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _pg_trgm_installed = cursor.fetchone() is not None
+    return _pg_trgm_installed
+
+
+def fuzzy_search(query, limit=20):
+    '''
+    Similarity-ranked title/author candidates for a possibly misspelled query.
+
+    PostgreSQL uses pg_trgm `word_similarity` with the GIN trigram indexes from
+    migration 0015; other backends (and PostgreSQL without pg_trgm) use the in-memory
+    `trigram_index`.
+    '''
+    if connection.vendor == 'postgresql' and _has_pg_trgm():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                '''
+                SELECT id, title, author,
+                    GREATEST(word_similarity(%s, title), word_similarity(%s, author)) AS score
+                FROM books_bookstructure
+                WHERE %s <%% title OR %s <%% author
+                ORDER BY score DESC, id
+                LIMIT %s
+                ''',
+                [query, query, query, query, limit],
+            )
+            return [
+                {'id': book_id, 'title': title, 'author': author, 'similarity': round(float(score), 4)}
+                for book_id, title, author, score in cursor.fetchall()
+            ]
+    return trigram_index.search(query, limit)
+# ════════════════════════════════════════════════════════════════════════════════
@@ -0,0 +1,269 @@
+# Standard Library imports
+import logging
+
+#Django imports
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction, connections, IntegrityError, DEFAULT_DB_ALIAS
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+#local imports
+from .models import BookStructure, BookCopy, BookHold, IssueBook, supports_update_returning
+from .cache import catalog_changed, copies_changed, circulation_changed
+from .facets import refresh_books_facets
+from user_app.models import CustomerCreate
+
+logger = logging.getLogger(__name__)
+
+AVAILABLE = 'Available To issue'
+ON_HOLD = 'On Hold'
+
+WAITING = 'Waiting'
+READY = 'Ready'
+FULFILLED = 'Fulfilled'
+CANCELLED = 'Cancelled'
+
+
+# ══════════════════════════ Errors ══════════════════════════════════════════════════════
+class HoldError(Exception):
+    '''
+    A hold that can not be placed or cancelled; the message is safe to show to the patron.
+    '''
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Notifications ══════════════════════════════════════════════════════
+def notify_ready_holds(hold_ids):
+    '''
+    Emails every patron whose hold turned 'Ready'. Runs after the assigning transaction
+    committed; a failing message is logged and does not stop the others.
+    '''
+    holds = BookHold.objects.filter(pk__in=hold_ids).select_related('book', 'copy', 'customer__user')
+    for hold in holds:
+        email = hold.customer.user.email
+        if not email:
+            continue
+        try:
+            send_mail(
+                subject=f"Your hold is ready: {hold.book.title}",
+                message=(
+                    f"A copy of {hold.book.title} (copy {hold.copy.copy_number if hold.copy else '-'}) "
+                    f"has been set aside for you. Issue the book to collect it."
+                ),
+                from_email=settings.EMAIL_HOST_USER,
+                recipient_list=[email],
+                fail_silently=False,
+            )
+        except Exception:
+            logger.exception(f'could not notify hold {hold.pk}')
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Hold queue ══════════════════════════════════════════════════════
+class HoldService:
+    '''
+    FIFO hold queue per BookStructure.
+
+    Returned (or newly added) copies are handed to the oldest waiting holds inside the
+    transaction that freed them, so a copy never reaches the shelf while someone is
+    queued for it. The next hold is one lookup on `bookhold_queue_idx`.
+    '''
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    def _copies_moved(self, book_ids):
+        #status UPDATEs skip the BookCopy post_save hooks: move the facets and cached responses here
+        refresh_books_facets(book_ids)
+        for book_id in book_ids:
+            copies_changed(book_id)
+        catalog_changed()
+
+    def _set_aside(self, copy_ids):
+        #flips the copies still 'Available To issue' to 'On Hold'; returns the ids of those flipped
+        connection = connections[self.using]
+        available = BookCopy.objects.using(self.using).filter(pk__in=copy_ids, status=AVAILABLE)
+        if not supports_update_returning(connection):
+            flipped = set(available.select_for_update().values_list('pk', flat=True))
+            available.filter(pk__in=flipped).update(status=ON_HOLD)
+            return flipped
+        placeholders = ', '.join(['%s'] * len(copy_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'''
+                UPDATE {BookCopy._meta.db_table} SET status = %s
+                WHERE status = %s AND id IN ({placeholders})
+                RETURNING id
+                ''',
+                [ON_HOLD, AVAILABLE, *copy_ids],
+            )
+            return {copy_id for copy_id, in cursor.fetchall()}
+
+    def _queue(self, book_structure_id):
+        return BookHold.objects.using(self.using).filter(
+            book_id=book_structure_id,
+            status=WAITING,
+        ).order_by('created_at', 'id')
+
+    def position(self, hold):
+        '''
+        1-based place of a waiting hold in its queue.
+        '''
+        return self._queue(hold.book_id).filter(
+            Q(created_at__lt=hold.created_at) | Q(created_at=hold.created_at, id__lte=hold.id)
+        ).count()
+
+    def place(self, user, book_structure_id):
+        '''
+        Queues the user for the book. Holds are only taken while no copy is available
+        to issue and the user does not already have the book. The availability check and
+        the insert share one transaction holding the book row lock, so a copy returned
+        meanwhile can not reach the shelf past the new hold.
+
+        Returns the new BookHold. Raises HoldError, BookStructure.DoesNotExist or
+        CustomerCreate.DoesNotExist.
+        '''
+        open_loan = IssueBook.objects.filter(
+            issued_by=OuterRef('pk'),
+            book__book_instance_id=book_structure_id,
+            returned_on__isnull=True,
+        )
+        row = (
+            CustomerCreate.objects.using(self.using)
+            .filter(user=user)
+            .annotate(has_open_loan=Exists(open_loan))
+            .values_list('pk', 'has_open_loan')
+            .first()
+        )
+        if row is None:
+            raise CustomerCreate.DoesNotExist('Customer does not exist')
+        customer_id, has_open_loan = row
+        if has_open_loan:
+            raise HoldError('This book is already issued')
+        try:
+            with transaction.atomic(using=self.using):
+                #returns move the counters (locking the book row) before they look for waiting
+                #holds, so with the row locked a return either shows in the count or sees the hold
+                available = (
+                    BookStructure.objects.using(self.using)
+                    .select_for_update()
+                    .values_list('available_count', flat=True)
+                    .get(pk=book_structure_id)
+                )
+                if available:
+                    raise HoldError('A copy is available to issue')
+                hold = BookHold.objects.using(self.using).create(book_id=book_structure_id, customer_id=customer_id)
+                circulation_changed()
+                return hold
+        except IntegrityError:
+            raise HoldError('You already have a hold on this book')
+
+    def cancel(self, user, book_structure_id):
+        '''
+        Cancels the user's waiting or ready hold on the book. A copy set aside for it goes
+        to the next hold, or back on the shelf.
+        '''
+        with transaction.atomic(using=self.using):
+            hold = (
+                BookHold.objects.using(self.using)
+                .select_for_update()
+                .filter(book_id=book_structure_id, status__in=[WAITING, READY], customer__user=user)
+                .first()
+            )
+            if hold is None:
+                raise HoldError('No active hold on this book')
+            BookHold.objects.using(self.using).filter(pk=hold.pk).update(status=CANCELLED)
+            circulation_changed()
+            if hold.status == READY and hold.copy_id:
+                flipped = BookCopy.objects.using(self.using).filter(pk=hold.copy_id, status=ON_HOLD).update(status=AVAILABLE)
+                if flipped:
+                    BookStructure.objects.using(self.using).apply_copy_change(book_structure_id, ON_HOLD, AVAILABLE)
+                    self.assign_copies({hold.copy_id: book_structure_id})
+                    self._copies_moved([book_structure_id])
+        return hold
+
+    def assign_copies(self, copies):
+        '''
+        Hands copies that just became 'Available To issue' (`{copy id: book id}`) to the
+        oldest waiting holds of their books: the holds turn 'Ready', the copies are set
+        aside as 'On Hold' and the book counters, facets and cached responses move. Copies
+        of books without waiting holds stay on the shelf. The patrons are emailed once the
+        transaction commits.
+
+        Call it inside the transaction that freed the copies. One indexed queue lookup per
+        book; the writes only happen when there is someone to hand a copy to. A copy that
+        is no longer 'Available To issue' by then is left alone and its hold keeps waiting.
+        Returns `{copy id: hold id}`.
+        '''
+        by_book = {}
+        for copy_id, book_id in copies.items():
+            by_book.setdefault(book_id, []).append(copy_id)
+
+        skip_locked = connections[self.using].features.has_select_for_update_skip_locked
+        pairs = []
+        for book_id, copy_ids in by_book.items():
+            queue = self._queue(book_id).select_for_update(skip_locked=skip_locked)[:len(copy_ids)]
+            pairs += zip(queue, sorted(copy_ids))
+        if not pairs:
+            return {}
+
+        #only the copies the UPDATE actually set aside are handed out, and counted
+        flipped = self._set_aside([copy_id for _, copy_id in pairs])
+        assigned = {}
+        holds = []
+        now = timezone.now()
+        for hold, copy_id in pairs:
+            if copy_id in flipped:
+                hold.status, hold.copy_id, hold.ready_at = READY, copy_id, now
+                holds.append(hold)
+                assigned[copy_id] = hold.pk
+        if not holds:
+            return assigned
+
+        BookHold.objects.using(self.using).bulk_update(holds, ['status', 'copy', 'ready_at'])
+        touched = []
+        for book_id, copy_ids in by_book.items():
+            count = sum(copy_id in assigned for copy_id in copy_ids)
+            if count:
+                BookStructure.objects.using(self.using).apply_copy_change(book_id, AVAILABLE, ON_HOLD, copies=count)
+                touched.append(book_id)
+        self._copies_moved(touched)
+        circulation_changed()
+        hold_ids = list(assigned.values())
+        transaction.on_commit(lambda: notify_ready_holds(hold_ids), using=self.using, robust=True)
+        return assigned
+
+    def release_copies(self, copy_ids):
+        '''
+        Puts the ready holds whose set-aside copies are being deleted back in their queues
+        as 'Waiting'. They keep their place, so the next copy of the book goes to them;
+        a copy already on the shelf is handed over right away.
+
+        Call it inside the deleting transaction, before the copies are deleted.
+        '''
+        holds = BookHold.objects.using(self.using).filter(copy_id__in=copy_ids, status=READY)
+        book_ids = set(holds.values_list('book_id', flat=True))
+        if not book_ids:
+            return
+        holds.update(status=WAITING, copy=None, ready_at=None)
+        shelved = (
+            BookCopy.objects.using(self.using)
+            .filter(book_instance_id__in=book_ids, status=AVAILABLE)
+            .exclude(pk__in=copy_ids)
+            .values_list('pk', 'book_instance_id')
+        )
+        self.assign_copies(dict(shelved))
+        circulation_changed()
+
+    def collect(self, customer_id, held):
+        '''
+        Fulfils the customer's ready holds (`{book id: set-aside copy id}`) and flips the
+        set-aside copies to 'Issued'. The caller moves the counters and records the loans.
+        '''
+        BookHold.objects.using(self.using).filter(
+            customer_id=customer_id,
+            book_id__in=list(held),
+            status=READY,
+        ).update(status=FULFILLED)
+        BookCopy.objects.using(self.using).filter(pk__in=list(held.values()), status=ON_HOLD).update(status='Issued')
+# ════════════════════════════════════════════════════════════════════════════════
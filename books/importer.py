@@ -0,0 +1,202 @@
+# Standard Library imports
+import codecs
+import csv
+import json
+import logging
+from collections import Counter
+from itertools import islice
+
+#Django imports
+from django.db import transaction, DatabaseError
+
+#local imports
+from .models import BookStructure, BookCopy, BookCopySequence
+from .serializer import BookImportRowSerializer, IMPORT_FORMATS
+from .signals import books_imported_signal
+from .inventory import reserve_copy_numbers
+from .holds import HoldService
+
+logger = logging.getLogger(__name__)
+
+#rows validated, deduplicated and inserted together, in one transaction
+IMPORT_CHUNK_SIZE = 500
+#row errors listed in the report; the rest are only counted
+IMPORT_ERRORS_LIMIT = 1000
+
+
+# ══════════════════════════ Row readers ══════════════════════════════════════════════════════
+def _read_csv(stream):
+    reader = csv.DictReader(codecs.iterdecode(stream, 'utf-8-sig'))
+    try:
+        for row in reader:
+            #empty cells are missing values, so optional columns fall back to their defaults
+            yield reader.line_num, {field: value for field, value in row.items() if field and value != ''}, None
+    except (csv.Error, UnicodeDecodeError) as e:
+        #the rest of the file can not be read reliably
+        yield reader.line_num, None, f'unreadable CSV, import stopped here: {e}'
+
+
+def _read_jsonl(stream):
+    for line_number, line in enumerate(stream, start=1):
+        try:
+            line = line.decode('utf-8-sig').strip()
+        except UnicodeDecodeError as e:
+            yield line_number, None, f'invalid UTF-8: {e}'
+            continue
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f'invalid JSON: {e}'
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, 'expected a JSON object'
+            continue
+        yield line_number, row, None
+
+
+def read_rows(stream, fmt):
+    '''
+    Yields `(line number, row dict, error)` from a binary stream of CSV (with a header
+    line) or JSON Lines. Lines are read one at a time, so uploads of any size are
+    never held in memory. `row` is None when the line could not be parsed.
+    '''
+    if fmt == 'csv':
+        return _read_csv(stream)
+    return _read_jsonl(stream)
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Import ══════════════════════════════════════════════════════
+def _add_error(report, line, errors):
+    report['error_count'] += 1
+    if len(report['errors']) < IMPORT_ERRORS_LIMIT:
+        report['errors'].append({'line': line, 'errors': errors})
+
+
+def _book_key(data):
+    return data['title'], data['author'], data['edition']
+
+
+def _import_chunk(rows):
+    '''
+    Inserts one chunk of validated rows.
+
+    Duplicates (same title, author and edition) are resolved with one lookup for the
+    whole chunk; rows matching an existing book, or an earlier row of the import, only
+    add copies. Books and copies are written with `bulk_create`, and the counters of
+    restocked books move with one UPDATE per book. Waiting holds on restocked books are
+    served from their new copies.
+
+    Returns the `created_books`, `added_copies` and `duplicates` counts of the chunk.
+    '''
+    keys = {_book_key(data) for _, data in rows}
+    existing = {}
+    candidates = BookStructure.objects.filter(
+        title__in={title for title, _, _ in keys},
+        author__in={author for _, author, _ in keys},
+    ).only('id', 'title', 'author', 'edition')
+    for book in candidates:
+        key = (book.title, book.author, book.edition)
+        if key in keys:
+            existing.setdefault(key, book.pk)
+
+    new_books = {}
+    duplicates = 0
+    copies = Counter()
+    for _, data in rows:
+        key = _book_key(data)
+        if key in existing or key in new_books:
+            duplicates += 1
+        else:
+            new_books[key] = BookStructure(**{field: value for field, value in data.items() if field != 'copies'})
+        copies[key] += data['copies']
+
+    for key, book in new_books.items():
+        book.available_count = book.total_copies = copies[key]
+    created = BookStructure.objects.bulk_create(new_books.values())
+    if any(book.pk is None for book in created):
+        #backends that can not return ids from a bulk insert
+        for book in BookStructure.objects.filter(title__in={key[0] for key in new_books}).order_by('id'):
+            key = (book.title, book.author, book.edition)
+            if key in new_books and key not in existing:
+                new_books[key].pk = book.pk
+
+    #books created by this chunk are not visible to anyone else yet: their sequences start
+    #right after the new copies; existing books reserve a block from their sequence row
+    BookCopySequence.objects.bulk_create([
+        BookCopySequence(book_id=book.pk, last_number=copies[key]) for key, book in new_books.items()
+    ])
+    first_numbers = {book.pk: 1 for book in new_books.values()}
+    first_numbers.update(reserve_copy_numbers({book_id: copies[key] for key, book_id in existing.items() if copies[key]}))
+    book_ids = {**existing, **{key: book.pk for key, book in new_books.items()}}
+    new_copies = []
+    for key, count in copies.items():
+        if not count:
+            continue
+        book_id = book_ids[key]
+        first = first_numbers[book_id]
+        new_copies.extend(
+            BookCopy(book_instance_id=book_id, copy_number=number, status='Available To issue')
+            for number in range(first, first + count)
+        )
+    BookCopy.objects.bulk_create(new_copies, batch_size=IMPORT_CHUNK_SIZE)
+
+    restocked = []
+    for key, book_id in existing.items():
+        if copies[key]:
+            BookStructure.objects.apply_copy_change(book_id, None, 'Available To issue', copies=copies[key])
+            restocked.append(book_id)
+    if restocked:
+        #patrons queued for a restocked title get its new copies first
+        restocked_ids = set(restocked)
+        HoldService().assign_copies({
+            copy.pk: copy.book_instance_id for copy in new_copies if copy.book_instance_id in restocked_ids
+        })
+
+    books_imported_signal.send(sender=BookStructure, created=list(new_books.values()), restocked=restocked)
+    return {'created_books': len(new_books), 'added_copies': len(new_copies), 'duplicates': duplicates}
+
+
+def import_catalog(rows, chunk_size=IMPORT_CHUNK_SIZE):
+    '''
+    Imports `(line number, row, error)` tuples from `read_rows` in chunks.
+
+    Every row is validated with `BookImportRowSerializer`; invalid rows are reported
+    with their line number and skipped, the rest of the batch is still imported. Each
+    chunk is committed on its own, so a failing chunk does not roll back earlier ones.
+
+    Returns a report: `rows`, `created_books`, `added_copies`, `duplicates`,
+    `error_count` and `errors` (the first IMPORT_ERRORS_LIMIT row errors).
+    '''
+    report = {'rows': 0, 'created_books': 0, 'added_copies': 0, 'duplicates': 0, 'error_count': 0, 'errors': []}
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return report
+        valid = []
+        for line, data, error in chunk:
+            report['rows'] += 1
+            if error:
+                _add_error(report, line, [error])
+                continue
+            serializer = BookImportRowSerializer(data=data)
+            if not serializer.is_valid():
+                _add_error(report, line, serializer.errors)
+                continue
+            valid.append((line, serializer.validated_data))
+        if not valid:
+            continue
+        try:
+            with transaction.atomic():
+                counts = _import_chunk(valid)
+        except DatabaseError:
+            logger.exception('bulk import chunk failed')
+            for line, _ in valid:
+                _add_error(report, line, ['could not be saved, the rows of this chunk were not imported'])
+            continue
+        for field, count in counts.items():
+            report[field] += count
+# ════════════════════════════════════════════════════════════════════════════════
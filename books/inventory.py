@@ -0,0 +1,50 @@
+#Django imports
+from django.db import transaction
+
+#local imports
+from .models import BookStructure, BookCopy, BookCopySequence
+from .facets import refresh_book_facets
+from .cache import catalog_changed, copies_changed
+from .holds import HoldService
+
+#upper bound for copies added by a single request
+MAX_COPIES_PER_REQUEST = 1000
+
+
+# ══════════════════════════ Copy numbers ══════════════════════════════════════════════════════
+def reserve_copy_numbers(counts):
+    '''
+    Reserves a block of consecutive copy numbers for each book in `counts`
+    (`{book_id: number of copies}`) and returns `{book_id: first number}`.
+
+    One counter row update per book (BookCopySequence), however many copies are added.
+    '''
+    return BookCopySequence.objects.reserve(counts)
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Adding copies ══════════════════════════════════════════════════════
+def add_copies(book_id, quantity, status='Available To issue'):
+    '''
+    Adds `quantity` copies of one book with a fixed number of queries: one copy number
+    reservation, one `bulk_create`, one counter UPDATE and the facet refresh.
+
+    `bulk_create` skips the BookCopy save hooks, so the counters, facets and cache
+    versions are moved here. Waiting holds on the book are served from the new copies.
+    Returns the created copies.
+    '''
+    with transaction.atomic():
+        first = reserve_copy_numbers({book_id: quantity})[book_id]
+        copies = BookCopy.objects.bulk_create([
+            BookCopy(book_instance_id=book_id, copy_number=number, status=status)
+            for number in range(first, first + quantity)
+        ])
+        BookStructure.objects.apply_copy_change(book_id, None, status, copies=quantity)
+        if status == 'Available To issue':
+            #patrons queued for the title get the new copies first
+            HoldService().assign_copies({copy.pk: book_id for copy in copies})
+        refresh_book_facets(book_id)
+        copies_changed(book_id)
+        catalog_changed()
+    return copies
+# ════════════════════════════════════════════════════════════════════════════════
@@ -0,0 +1,35 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from books.models import IssueBookArchive
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves returned loans from IssueBook into the append-only IssueBookArchive, in '
+        'batches, so the active loan table only holds open and recently closed loans.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-days',
+            type=int,
+            default=7,
+            help='Leave loans returned within this many days in the active table (default 7).',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Loans moved per transaction (default 5000).',
+        )
+
+    def handle(self, *args, **options):
+        if options['keep_days'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--keep-days must be 0 or more and --batch-size at least 1')
+
+        returned_before = timezone.localdate() - datetime.timedelta(days=options['keep_days'])
+        moved = IssueBookArchive.objects.archive_closed(returned_before, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} loan(s) returned before {returned_before}.'))
@@ -0,0 +1,63 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from books.importer import read_rows, import_catalog, IMPORT_CHUNK_SIZE
+from books.serializer import IMPORT_FORMATS
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk imports books from a CSV (with a header line) or JSON Lines file. '
+        'Rows matching an existing book (title, author, edition) add copies to it; '
+        'invalid rows are reported and skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, or - to read standard input.')
+        parser.add_argument(
+            '--format',
+            dest='import_format',
+            choices=IMPORT_FORMATS,
+            help='Input format; guessed from the file extension when omitted.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=IMPORT_CHUNK_SIZE,
+            help='Rows validated and inserted per transaction.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['import_format']
+        if fmt is None:
+            if path.lower().endswith('.csv'):
+                fmt = 'csv'
+            elif path.lower().endswith(('.jsonl', '.ndjson')):
+                fmt = 'jsonl'
+            else:
+                raise CommandError('Can not guess the format, pass --format.')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive.')
+
+        if path == '-':
+            report = import_catalog(read_rows(sys.stdin.buffer, fmt), options['chunk_size'])
+        else:
+            try:
+                stream = open(path, 'rb')
+            except OSError as e:
+                raise CommandError(f'Can not open {path}: {e}')
+            with stream:
+                report = import_catalog(read_rows(stream, fmt), options['chunk_size'])
+
+        for error in report['errors']:
+            self.stderr.write(f"line {error['line']}: {json.dumps(error['errors'])}")
+        if report['error_count'] > len(report['errors']):
+            self.stderr.write(f"... and {report['error_count'] - len(report['errors'])} more error(s)")
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['rows']} row(s): {report['created_books']} book(s) created, "
+            f"{report['added_copies']} copies added, {report['duplicates']} duplicate row(s), "
+            f"{report['error_count']} error(s)."
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from books.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes the monthly circulation rollups (per book and per customer) and the '
+        'circulation cube (genre, month, patron age band) from every '
+        'loan, active and archived. Use it after restoring data or when the rollups drifted.'
+    )
+
+    def handle(self, *args, **options):
+        book_rows, customer_rows, cube_rows = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {book_rows} book-month and {customer_rows} customer-month rollup row(s) '
+            f'and {cube_rows} circulation cube cell(s).'
+        ))
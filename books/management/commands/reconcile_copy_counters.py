@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from books.models import BookStructure
+from books.cache import catalog_changed
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes available_count, issued_count and total_copies of every book from its '
+        'BookCopy rows and corrects the books whose stored counters drifted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report the drifted books, do not change them.',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            book_ids = list(BookStructure.objects.drifted_copy_counters().values_list('pk', flat=True))
+            self.stdout.write(f'{len(book_ids)} book(s) with drifted copy counters: {book_ids}')
+            return
+
+        #chunks commit one by one, so issues and returns only wait for the chunk they touch
+        fixed = BookStructure.objects.reconcile_copy_counters()
+        if fixed:
+            catalog_changed()
+        self.stdout.write(self.style.SUCCESS(f'Reconciled copy counters of {len(fixed)} book(s).'))
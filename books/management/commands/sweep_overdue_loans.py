@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from books.models import OverdueLoan
+
+
+class Command(BaseCommand):
+    help = (
+        'Flags open loans past their return_date into the overdue set read by the overdue '
+        'endpoint, and clears flagged loans that have been returned. Schedule it nightly.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Sweep as of this date (YYYY-MM-DD) instead of today.',
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        if options['date']:
+            today = parse_date(options['date'])
+            if today is None:
+                raise CommandError(f"Invalid date: {options['date']}")
+
+        flagged, cleared = OverdueLoan.objects.sweep(today)
+        self.stdout.write(self.style.SUCCESS(
+            f'Flagged {flagged} overdue loan(s), cleared {cleared} returned loan(s) as of {today}.'
+        ))
@@ -0,0 +1,60 @@
+from django.db import migrations, OperationalError
+
+
+def create_search_index(apps, schema_editor):
+    '''
+    PostgreSQL: tsvector document table with a GIN index.
+    SQLite: FTS5 virtual table (skipped when the SQLite build lacks FTS5).
+    Both are backfilled from the existing catalog.
+    '''
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('''
+            CREATE TABLE books_bookstructure_search (
+                book_id bigint PRIMARY KEY REFERENCES books_bookstructure (id) ON DELETE CASCADE,
+                document tsvector NOT NULL
+            )
+        ''')
+        schema_editor.execute(
+            'CREATE INDEX books_bookstructure_search_document_gin '
+            'ON books_bookstructure_search USING gin (document)'
+        )
+        schema_editor.execute('''
+            INSERT INTO books_bookstructure_search (book_id, document)
+            SELECT id,
+                setweight(to_tsvector('english', title), 'A') ||
+                setweight(to_tsvector('english', author), 'B') ||
+                setweight(to_tsvector('english', genre), 'C') ||
+                setweight(to_tsvector('english', subject), 'D')
+            FROM books_bookstructure
+        ''')
+    elif vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                'CREATE VIRTUAL TABLE books_bookstructure_fts USING fts5(title, author, subject, genre)'
+            )
+        except OperationalError:
+            return
+        schema_editor.execute('''
+            INSERT INTO books_bookstructure_fts (rowid, title, author, subject, genre)
+            SELECT id, title, author, subject, genre FROM books_bookstructure
+        ''')
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP TABLE IF EXISTS books_bookstructure_search')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS books_bookstructure_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0013_rename_issue_date_issuebook_issue_date_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+def create_trigram_indexes(apps, schema_editor):
+    '''
+    pg_trgm GIN indexes for fuzzy title/author lookups. Other backends, and PostgreSQL
+    servers without the pg_trgm contrib extension, use the in-memory trigram index in
+    books.fuzzy, so there is nothing to create.
+    '''
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX books_bookstructure_title_trgm '
+        'ON books_bookstructure USING gin (title gin_trgm_ops)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX books_bookstructure_author_trgm '
+        'ON books_bookstructure USING gin (author gin_trgm_ops)'
+    )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS books_bookstructure_title_trgm')
+    schema_editor.execute('DROP INDEX IF EXISTS books_bookstructure_author_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0014_bookstructure_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:32
+
+import django.db.models.deletion
+from collections import Counter
+from django.db import migrations, models
+
+
+PRICE_BANDS = ((10, 'under-10'), (25, '10-25'), (50, '25-50'), (100, '50-100'), (None, '100-plus'))
+
+
+def backfill_facets(apps, schema_editor):
+    '''
+    Builds the facet snapshots and counters for the existing catalog.
+    '''
+    BookStructure = apps.get_model('books', 'BookStructure')
+    BookCopy = apps.get_model('books', 'BookCopy')
+    BookFacet = apps.get_model('books', 'BookFacet')
+    FacetCount = apps.get_model('books', 'FacetCount')
+
+    available = set(
+        BookCopy.objects.filter(status='Available To issue').values_list('book_instance_id', flat=True).distinct()
+    )
+    counts = Counter()
+    snapshots = []
+    for book in BookStructure.objects.iterator(chunk_size=2000):
+        band = next(label for upper, label in PRICE_BANDS if upper is None or book.price < upper)
+        decade = book.publication_date.year // 10 * 10
+        is_available = book.id in available
+        snapshots.append(BookFacet(
+            book_id=book.id, genre=book.genre, author=book.author, publisher=book.publisher,
+            decade=decade, price_band=band, is_available=is_available,
+        ))
+        counts.update([
+            ('genre', book.genre), ('author', book.author), ('publisher', book.publisher),
+            ('decade', str(decade)), ('price_band', band),
+            ('availability', 'available' if is_available else 'unavailable'),
+        ])
+    BookFacet.objects.bulk_create(snapshots, batch_size=2000)
+    FacetCount.objects.bulk_create(
+        [FacetCount(facet=facet, value=value, count=count) for (facet, value), count in counts.items()],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0015_bookstructure_trigram_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookFacet',
+            fields=[
+                ('book', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='facet', serialize=False, to='books.bookstructure')),
+                ('genre', models.CharField(db_index=True, max_length=120)),
+                ('author', models.CharField(db_index=True, max_length=50)),
+                ('publisher', models.CharField(db_index=True, max_length=120)),
+                ('decade', models.PositiveIntegerField(db_index=True)),
+                ('price_band', models.CharField(db_index=True, max_length=20)),
+                ('is_available', models.BooleanField(db_index=True, default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(max_length=20)),
+                ('value', models.CharField(max_length=120)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['facet', '-count'], name='facetcount_facet_count_idx')],
+                'constraints': [models.UniqueConstraint(fields=('facet', 'value'), name='unique_facet_value')],
+            },
+        ),
+        migrations.RunPython(backfill_facets, migrations.RunPython.noop),
+    ]
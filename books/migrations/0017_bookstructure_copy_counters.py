@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:35
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_copy_counters(apps, schema_editor):
+    BookStructure = apps.get_model('books', 'BookStructure')
+    BookCopy = apps.get_model('books', 'BookCopy')
+
+    def copy_count(**filters):
+        copies = BookCopy.objects.filter(book_instance=OuterRef('pk'), **filters).order_by()
+        return Coalesce(Subquery(copies.values('book_instance').annotate(c=Count('pk')).values('c')), 0)
+
+    BookStructure.objects.update(
+        available_count=copy_count(status='Available To issue'),
+        issued_count=copy_count(status='Issued'),
+        total_copies=copy_count(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0016_bookfacet_facetcount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookstructure',
+            name='available_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='bookstructure',
+            name='issued_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='bookstructure',
+            name='total_copies',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_copy_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0017_bookstructure_copy_counters'),
+        ('user_app', '0012_alter_customercreate_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookcopy',
+            index=models.Index(fields=['book_instance', 'status', 'copy_number'], name='bookcopy_book_status_copy_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issuebook',
+            index=models.Index(condition=models.Q(('returned_on__isnull', True)), fields=['issued_by', 'book'], name='issuebook_open_by_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issuebook',
+            index=models.Index(fields=['book', 'returned_on'], name='issuebook_book_returned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issuebook',
+            index=models.Index(fields=['issue_date', 'id'], name='issuebook_issue_date_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed_copy_sequences(apps, schema_editor):
+    '''
+    Starts every book's sequence after its highest existing copy number.
+    '''
+    BookCopy = apps.get_model('books', 'BookCopy')
+    BookCopySequence = apps.get_model('books', 'BookCopySequence')
+    last_numbers = (
+        BookCopy.objects.values('book_instance_id')
+        .annotate(last=Max('copy_number'))
+        .values_list('book_instance_id', 'last')
+    )
+    BookCopySequence.objects.bulk_create(
+        (BookCopySequence(book_id=book_id, last_number=last) for book_id, last in last_numbers.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0018_circulation_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookCopySequence',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='copy_sequence', serialize=False, to='books.bookstructure')),
+                ('last_number', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_copy_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0019_bookcopysequence'),
+        ('user_app', '0012_alter_customercreate_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bookcopy',
+            name='status',
+            field=models.CharField(choices=[('Issued', 'Issued'), ('Returned', 'Returned'), ('Available To issue', 'Available To Issue'), ('Unavailable', 'Unavailable'), ('Lost', 'Lost'), ('Damaged', 'Damaged'), ('On Hold', 'On Hold')], max_length=100),
+        ),
+        migrations.CreateModel(
+            name='BookHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('Waiting', 'Waiting'), ('Ready', 'Ready'), ('Fulfilled', 'Fulfilled'), ('Cancelled', 'Cancelled')], default='Waiting', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('ready_at', models.DateTimeField(blank=True, null=True)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='books.bookstructure')),
+                ('copy', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='books.bookcopy')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='book_holds', to='user_app.customercreate')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['book', 'status', 'created_at', 'id'], name='bookhold_queue_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['Waiting', 'Ready'])), fields=('book', 'customer'), name='bookhold_one_active_per_customer')],
+            },
+        ),
+    ]
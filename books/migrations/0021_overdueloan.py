@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0020_bookhold'),
+        ('user_app', '0012_alter_customercreate_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OverdueLoan',
+            fields=[
+                ('loan', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='overdue', serialize=False, to='books.issuebook')),
+                ('return_date', models.DateField()),
+                ('flagged_on', models.DateField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='issuebook',
+            index=models.Index(condition=models.Q(('returned_on__isnull', True)), fields=['return_date'], name='issuebook_open_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='overdueloan',
+            index=models.Index(fields=['return_date', 'loan'], name='overdueloan_due_idx'),
+        ),
+    ]
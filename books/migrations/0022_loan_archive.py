@@ -0,0 +1,55 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0021_overdueloan'),
+        ('user_app', '0012_alter_customercreate_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssueBookArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('issue_date', models.DateField()),
+                ('return_date', models.DateField()),
+                ('returned_on', models.DateField()),
+                ('archived_on', models.DateField()),
+                ('book', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='books.bookcopy')),
+                ('issued_by', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='user_app.customercreate')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['issue_date', 'id'], name='issuearchive_issue_date_idx'), models.Index(fields=['book', 'issue_date'], name='issuearchive_book_idx'), models.Index(fields=['issued_by', 'issue_date'], name='issuearchive_customer_idx')],
+            },
+        ),
+        migrations.RunSQL(
+            '''
+            CREATE VIEW books_loanhistory AS
+            SELECT id, book_id, issue_date, return_date, returned_on, issued_by_id, FALSE AS is_archived
+            FROM books_issuebook
+            UNION ALL
+            SELECT id, book_id, issue_date, return_date, returned_on, issued_by_id, TRUE AS is_archived
+            FROM books_issuebookarchive
+            ''',
+            'DROP VIEW IF EXISTS books_loanhistory',
+        ),
+        migrations.CreateModel(
+            name='LoanHistory',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('issue_date', models.DateField()),
+                ('return_date', models.DateField()),
+                ('returned_on', models.DateField(null=True)),
+                ('is_archived', models.BooleanField()),
+            ],
+            options={
+                'db_table': 'books_loanhistory',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0022_loan_archive'),
+        ('user_app', '0012_alter_customercreate_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyBookCirculation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('loans', models.IntegerField(default=0)),
+                ('days_out', models.IntegerField(default=0)),
+                ('overdue', models.IntegerField(default=0)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_circulation', to='books.bookstructure')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['book', 'month'], name='monthlybook_book_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('month', 'book'), name='unique_month_book_circulation')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyCustomerCirculation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('loans', models.IntegerField(default=0)),
+                ('days_out', models.IntegerField(default=0)),
+                ('overdue', models.IntegerField(default=0)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_circulation', to='user_app.customercreate')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['customer', 'month'], name='monthlycust_customer_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('month', 'customer'), name='unique_month_customer_circulation')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0023_monthly_circulation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CirculationCube',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('genre', models.CharField(max_length=120)),
+                ('age_band', models.CharField(max_length=10)),
+                ('loans', models.IntegerField(default=0)),
+                ('days_out', models.IntegerField(default=0)),
+                ('overdue', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['genre', 'month'], name='circcube_genre_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('month', 'genre', 'age_band'), name='unique_circulation_cube_cell')],
+            },
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+from books.rollups import AGE_BANDS, UNKNOWN_AGE_BAND
+
+LOAN_HISTORY_VIEW = '''
+    CREATE VIEW books_loanhistory AS
+    SELECT {columns}, FALSE AS is_archived
+    FROM books_issuebook
+    UNION ALL
+    SELECT {columns}, TRUE AS is_archived
+    FROM books_issuebookarchive
+'''
+LOAN_COLUMNS = 'id, book_id, issue_date, return_date, returned_on, issued_by_id'
+
+
+def backfill_circulation_keys(apps, schema_editor):
+    #existing loans take the current title, genre and age band, as the rollups did so far
+    BookStructure = apps.get_model('books', 'BookStructure')
+    BookCopy = apps.get_model('books', 'BookCopy')
+    for name in ('IssueBook', 'IssueBookArchive'):
+        Loan = apps.get_model('books', name)
+        Loan.objects.update(
+            book_structure_id=Subquery(BookCopy.objects.filter(pk=OuterRef('book_id')).values('book_instance_id')[:1])
+        )
+        Loan.objects.update(
+            genre=Subquery(BookStructure.objects.filter(pk=OuterRef('book_structure_id')).values('genre')[:1])
+        )
+        loans = Loan.objects.filter(age_band__isnull=True)
+        loans.filter(issued_by__age__isnull=True).update(age_band=UNKNOWN_AGE_BAND)
+        for oldest, band in AGE_BANDS:
+            banded = loans.filter(issued_by__age__isnull=False)
+            if oldest is not None:
+                banded = banded.filter(issued_by__age__lte=oldest)
+            banded.update(age_band=band)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0024_circulation_cube'),
+    ]
+
+    operations = [
+        #SQLite can not rebuild tables a view depends on
+        migrations.RunSQL(
+            'DROP VIEW IF EXISTS books_loanhistory',
+            LOAN_HISTORY_VIEW.format(columns=LOAN_COLUMNS),
+        ),
+        migrations.AddField(
+            model_name='issuebook',
+            name='age_band',
+            field=models.CharField(max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='issuebook',
+            name='book_structure',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='books.bookstructure'),
+        ),
+        migrations.AddField(
+            model_name='issuebook',
+            name='genre',
+            field=models.CharField(max_length=120, null=True),
+        ),
+        migrations.AddField(
+            model_name='issuebookarchive',
+            name='age_band',
+            field=models.CharField(max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='issuebookarchive',
+            name='book_structure',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='books.bookstructure'),
+        ),
+        migrations.AddField(
+            model_name='issuebookarchive',
+            name='genre',
+            field=models.CharField(max_length=120, null=True),
+        ),
+        migrations.RunPython(backfill_circulation_keys, migrations.RunPython.noop),
+        migrations.RunSQL(
+            LOAN_HISTORY_VIEW.format(columns=f'{LOAN_COLUMNS}, book_structure_id, genre, age_band'),
+            'DROP VIEW IF EXISTS books_loanhistory',
+        ),
+    ]
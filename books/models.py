@@ -1,11 +1,128 @@
 #Model imports
-from django.db import models
+from django.db import models, transaction, connections
 from user_app.models import CustomerCreate
-from django.db.models import Max
+from django.db.models import Max, Count, Q, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
 from django.utils.timezone import now
 
+#copy statuses with a denormalized counter on BookStructure
+COUNTED_STATUSES = {
+    'Available To issue': 'available_count',
+    'Issued': 'issued_count',
+}
+#BookStructure columns only written by the counter UPDATEs, never by save()
+COPY_COUNTER_FIELDS = ('available_count', 'issued_count', 'total_copies')
+
+
+def supports_update_returning(connection):
+    '''
+    Whether `UPDATE ... RETURNING` can be used on this connection.
+    '''
+    return connection.vendor == 'postgresql' or (
+        connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 35)
+    )
+
 # Create your models here.
+#◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
+class BookStructureQuerySet(models.QuerySet):
+    '''
+    Catalog read helpers for BookStructure.
+    '''
+    def with_copy_counts(self):
+        '''
+        Annotates every book with its per-status copy counts in the same query.
+
+        `available_copies` and `issued_copies` read the denormalized counters kept by
+        BookCopy writes; `lost_copies` and `damaged_copies` are counted with a LEFT JOIN
+        + GROUP BY over BookCopy. Listing N books costs one query instead of one COUNT
+        per book.
+        '''
+        return self.annotate(
+            available_copies=F('available_count'),
+            issued_copies=F('issued_count'),
+            lost_copies=Count('bookcopy', filter=Q(bookcopy__status='Lost')),
+            damaged_copies=Count('bookcopy', filter=Q(bookcopy__status='Damaged')),
+        )
+
+    def apply_copy_change(self, book_id, old_status, new_status, copies=1):
+        '''
+        Moves the denormalized copy counters of one book with a single F-expression UPDATE.
+
+        `old_status` is None for newly created copies and `new_status` is None for deleted
+        ones; `copies` lets batched writes move the counters by more than one at a time.
+        Call it inside the transaction that changes the copies.
+        '''
+        deltas = {}
+        if old_status is None:
+            deltas['total_copies'] = copies
+        if new_status is None:
+            deltas['total_copies'] = deltas.get('total_copies', 0) - copies
+        for status, field in COUNTED_STATUSES.items():
+            delta = (new_status == status) - (old_status == status)
+            if delta:
+                deltas[field] = delta * copies
+        deltas = {field: F(field) + delta for field, delta in deltas.items() if delta}
+        if deltas:
+            self.filter(pk=book_id).update(**deltas)
+
+    @staticmethod
+    def _actual_copy_counts():
+        '''
+        Correlated BookCopy count subqueries for every counter column.
+        '''
+        def copy_count(**filters):
+            copies = BookCopy.objects.filter(book_instance=OuterRef('pk'), **filters).order_by()
+            return Coalesce(Subquery(copies.values('book_instance').annotate(c=Count('pk')).values('c')), 0)
+        return {
+            'available_count': copy_count(status='Available To issue'),
+            'issued_count': copy_count(status='Issued'),
+            'total_copies': copy_count(),
+        }
+
+    def with_actual_copy_counts(self):
+        '''
+        Annotates the copy counts recomputed from BookCopy (`actual_available`,
+        `actual_issued`, `actual_total`) for reconciling the stored counters.
+        '''
+        counts = self._actual_copy_counts()
+        return self.annotate(
+            actual_available=counts['available_count'],
+            actual_issued=counts['issued_count'],
+            actual_total=counts['total_copies'],
+        )
+
+    def drifted_copy_counters(self):
+        '''
+        Books whose stored counters no longer match their BookCopy rows.
+        '''
+        return self.with_actual_copy_counts().filter(
+            ~Q(available_count=F('actual_available')) |
+            ~Q(issued_count=F('actual_issued')) |
+            ~Q(total_copies=F('actual_total'))
+        )
+
+    def reconcile_copy_counters(self, chunk_size=2000):
+        '''
+        Rewrites the counters of every book whose stored values drifted from BookCopy.
+
+        Safe against a live database: each chunk of drifted books is locked with
+        `select_for_update`, checked again and recounted by the UPDATE itself, so an
+        issue or return committed after the drift scan is counted, not overwritten.
+        Returns the ids of the books that were corrected.
+        '''
+        candidates = list(self.drifted_copy_counters().values_list('pk', flat=True))
+        fixed = []
+        for start in range(0, len(candidates), chunk_size):
+            with transaction.atomic():
+                locked = list(self.filter(pk__in=candidates[start:start + chunk_size]).select_for_update().values_list('pk', flat=True))
+                drifted = list(self.filter(pk__in=locked).drifted_copy_counters().values_list('pk', flat=True))
+                self.filter(pk__in=drifted).update(**self._actual_copy_counts())
+            fixed += drifted
+        return fixed
+#◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
+
+
 #◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
 class BookStructure(models.Model):
     '''
@@ -24,9 +141,27 @@ class BookStructure(models.Model):
     genre = models.CharField(max_length=120 , help_text='genre of the book')#store the genre of the book
     edition = models.DecimalField(decimal_places=5, max_digits=15)#store the edition of the book
     publisher = models.CharField(max_length=120)#store the punlisher of the book
+    available_count = models.IntegerField(default=0, editable=False) #copies with status 'Available To issue', kept by BookCopy writes
+    issued_count = models.IntegerField(default=0, editable=False) #copies with status 'Issued', kept by BookCopy writes
+    total_copies = models.IntegerField(default=0, editable=False) #all copies of the book, kept by BookCopy writes
     created_at = models.DateTimeField(auto_now_add=True) #store the date this book was created at
     updated_at = models.DateTimeField(auto_now=True)#store date this book was update at
 
+    objects = BookStructureQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        '''
+        The copy counters are only written when the row is inserted. After that they move
+        with F-expression UPDATEs (apply_copy_change, reconcile_copy_counters), so saving
+        an instance loaded before a copy changed must not write its stale counters back.
+        '''
+        if not self._state.adding and not kwargs.get('force_insert'):
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+            kwargs['update_fields'] = [field for field in update_fields if field not in COPY_COUNTER_FIELDS]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         '''
         Returns the string representation of the book, used in django admin and debugging.
@@ -53,18 +188,53 @@ class BookCopy(models.Model):
         ('Unavailable', 'Unavailable'),
         ('Lost' , 'Lost'),
         ('Damaged' , 'Damaged'),
+        ('On Hold' , 'On Hold'), #set aside for the next patron in the hold queue
     )
     status = models.CharField(max_length=100 ,choices=status_choices) #we assign the choices
     created_at = models.DateTimeField(auto_now_add=True) #store the date this book was created at
 
+    class Meta:
+        indexes = [
+            #available copy lookups: filter by book and status, take the lowest copy number
+            models.Index(fields=['book_instance', 'status', 'copy_number'], name='bookcopy_book_status_copy_idx'),
+        ]
+
+    _loaded_status = None #status as last read from / written to the database
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
     def save(self, *args, **kwargs):
         '''
         automatically assigns a new unique copy_number when the instance is saved
+        and moves the availability counters of the book in the same transaction
         '''
-        if not self.copy_number:
-            max_copies = BookCopy.objects.filter(book_instance=self.book_instance).aggregate(Max('copy_number'))['copy_number__max']
-            self.copy_number = (max_copies or 0) + 1
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            if not self.copy_number:
+                self.copy_number = BookCopySequence.objects.reserve({self.book_instance_id: 1})[self.book_instance_id]
+            update_fields = kwargs.get('update_fields')
+            if self._state.adding:
+                BookStructure.objects.apply_copy_change(self.book_instance_id, None, self.status)
+            elif update_fields is None or 'status' in update_fields:
+                old_status = self._stored_status()
+                if old_status != self.status:
+                    BookStructure.objects.apply_copy_change(self.book_instance_id, old_status, self.status)
+            super().save(*args, **kwargs)
+        self._loaded_status = self.status
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            BookStructure.objects.apply_copy_change(self.book_instance_id, self._stored_status(), None)
+            return super().delete(*args, **kwargs)
+
+    def _stored_status(self):
+        #status was deferred when the row was loaded: read it back
+        if self._loaded_status is None:
+            return BookCopy.objects.filter(pk=self.pk).values_list('status', flat=True).first()
+        return self._loaded_status
 
     def __str__(self):
         """
@@ -74,6 +244,69 @@ class BookCopy(models.Model):
         return f'{str(self.book_instance)} - copy {self.copy_number}'
 #◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
 
+#◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
+class BookCopySequenceQuerySet(models.QuerySet):
+    '''
+    Copy number allocation on top of the per-book counter rows.
+    '''
+    def _advance(self, book_id, count):
+        #moves one counter row and returns its new value, or None when the row does not exist
+        connection = connections[self.db]
+        if supports_update_returning(connection):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {self.model._meta.db_table} SET last_number = last_number + %s '
+                    f'WHERE book_id = %s RETURNING last_number',
+                    [count, book_id],
+                )
+                row = cursor.fetchone()
+            return row[0] if row else None
+        if not self.filter(book_id=book_id).update(last_number=F('last_number') + count):
+            return None
+        return self.filter(book_id=book_id).values_list('last_number', flat=True).get()
+
+    def reserve(self, counts):
+        '''
+        Reserves `count` consecutive copy numbers for every `{book_id: count}` and
+        returns `{book_id: first number}`.
+
+        Each reservation is a single UPDATE of the book's counter row (RETURNING the new
+        value where supported). The UPDATE holds the row lock until the transaction ends,
+        so concurrent reservations for one title queue on that row and never overlap,
+        while different titles do not contend at all. A missing row (copies added to a
+        book for the first time) is seeded from the copies that already exist.
+        Call it inside the transaction that inserts the copies.
+        '''
+        first_numbers = {}
+        with transaction.atomic(using=self.db):
+            for book_id in sorted(counts):
+                count = counts[book_id]
+                last_number = self._advance(book_id, count)
+                if last_number is None:
+                    existing = BookCopy.objects.using(self.db).filter(book_instance_id=book_id).aggregate(Max('copy_number'))['copy_number__max']
+                    self.bulk_create([self.model(book_id=book_id, last_number=existing or 0)], ignore_conflicts=True)
+                    last_number = self._advance(book_id, count)
+                first_numbers[book_id] = last_number - count + 1
+        return first_numbers
+
+
+class BookCopySequence(models.Model):
+    '''
+    Last copy number handed out for one book.
+
+    Copy numbers come from this counter instead of `max(copy_number) + 1`, so allocating
+    them is one row update regardless of how many copies exist, and concurrent inserts
+    can not pick the same number. Numbers of deleted copies are not reused.
+    '''
+    book = models.OneToOneField(BookStructure, on_delete=models.CASCADE, primary_key=True, related_name='copy_sequence')
+    last_number = models.PositiveIntegerField(default=0)
+
+    objects = BookCopySequenceQuerySet.as_manager()
+
+    def __str__(self):
+        return f'{self.book_id}: last copy {self.last_number}'
+#◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
+
 #◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
 class IssueBook(models.Model):
     '''
@@ -85,6 +318,30 @@ class IssueBook(models.Model):
     return_date = models.DateField(auto_now=False, auto_now_add=False) #the date the book is to be returned (can not be more than 7 days)
     returned_on = models.DateField(blank=True, null=True) #the date the book was returned
     issued_by = models.ForeignKey(CustomerCreate, on_delete=models.CASCADE) #which user issued the book
+    #where the loan is counted in the circulation rollups, taken when it is issued
+    book_structure = models.ForeignKey(BookStructure, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+')
+    genre = models.CharField(max_length=120, null=True) #genre of the title when issued
+    age_band = models.CharField(max_length=10, null=True) #age band of the borrower when issued
+
+    class Meta:
+        indexes = [
+            #open loans of a user (already-issued checks, returns)
+            models.Index(
+                fields=['issued_by', 'book'],
+                condition=Q(returned_on__isnull=True),
+                name='issuebook_open_by_user_idx',
+            ),
+            #loan state of a copy
+            models.Index(fields=['book', 'returned_on'], name='issuebook_book_returned_idx'),
+            #history by date, newest first
+            models.Index(fields=['issue_date', 'id'], name='issuebook_issue_date_idx'),
+            #open loans by due date (overdue sweep)
+            models.Index(
+                fields=['return_date'],
+                condition=Q(returned_on__isnull=True),
+                name='issuebook_open_due_idx',
+            ),
+        ]
 
     def __str__(self):
         '''
@@ -92,4 +349,337 @@ class IssueBook(models.Model):
         Example: Harry Potter - copy 2 issued by Aryan
         '''
         return f'{self.book} issued by {self.issued_by}'
-#◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
\ No newline at end of file
+#◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
+
+#◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
+class IssueBookArchiveQuerySet(models.QuerySet):
+    '''
+    Moving closed loans out of the active IssueBook table.
+    '''
+    def archive_closed(self, returned_before, batch_size=5000):
+        '''
+        Moves loans returned before `returned_before` from IssueBook into the archive, one
+        batch per transaction: an INSERT ... SELECT of the batch, then a DELETE of the same
+        ids (plus their stale OverdueLoan rows). Loan ids are kept, so LoanHistory and
+        anything keyed on them see the same rows before and after.
+
+        Returns the number of loans archived.
+        '''
+        table = self.model._meta.db_table
+        loans = IssueBook._meta.db_table
+        archived_on = now().date()
+        moved = 0
+        while True:
+            with transaction.atomic(using=self.db):
+                ids = list(
+                    IssueBook.objects.using(self.db)
+                    .filter(returned_on__lt=returned_before)
+                    .order_by('id')
+                    .values_list('id', flat=True)[:batch_size]
+                )
+                if not ids:
+                    return moved
+                placeholders = ', '.join(['%s'] * len(ids))
+                OverdueLoan.objects.using(self.db).filter(loan_id__in=ids).delete()
+                with connections[self.db].cursor() as cursor:
+                    cursor.execute(
+                        f'''
+                        INSERT INTO {table} (
+                            id, book_id, issue_date, return_date, returned_on, issued_by_id,
+                            book_structure_id, genre, age_band, archived_on
+                        )
+                        SELECT
+                            id, book_id, issue_date, return_date, returned_on, issued_by_id,
+                            book_structure_id, genre, age_band, %s
+                        FROM {loans} WHERE id IN ({placeholders})
+                        ''',
+                        [archived_on, *ids],
+                    )
+                    #raw DELETE: the IssueBook delete hooks would run once per row
+                    cursor.execute(f'DELETE FROM {loans} WHERE id IN ({placeholders})', ids)
+            moved += len(ids)
+
+
+class IssueBookArchive(models.Model):
+    '''
+    Append-only history of closed loans, moved out of IssueBook by the
+    `archive_closed_loans` command so the active table only holds open and recent loans.
+
+    Rows keep their IssueBook id. The references are not database constraints: history
+    outlives the copies and customers it mentions.
+    '''
+    id = models.BigIntegerField(primary_key=True) #the IssueBook id of the loan
+    book = models.ForeignKey(BookCopy, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    issue_date = models.DateField()
+    return_date = models.DateField()
+    returned_on = models.DateField()
+    issued_by = models.ForeignKey(CustomerCreate, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    book_structure = models.ForeignKey(BookStructure, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+')
+    genre = models.CharField(max_length=120, null=True)
+    age_band = models.CharField(max_length=10, null=True)
+    archived_on = models.DateField() #when the loan left the active table
+
+    objects = IssueBookArchiveQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            #same access paths as the history endpoints use on IssueBook
+            models.Index(fields=['issue_date', 'id'], name='issuearchive_issue_date_idx'),
+            models.Index(fields=['book', 'issue_date'], name='issuearchive_book_idx'),
+            models.Index(fields=['issued_by', 'issue_date'], name='issuearchive_customer_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.book_id} issued by {self.issued_by_id} (archived)'
+#◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
+
+#◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
+class MonthlyBookCirculation(models.Model):
+    '''
+    Circulation of one title in one month, by month of issue: loans made, days out and
+    late returns of those loans. Kept by books.rollups on every issue and return and
+    rebuilt from LoanHistory by the `rebuild_circulation_rollups` command.
+    '''
+    month = models.DateField() #first day of the month the loans were issued in
+    book = models.ForeignKey(BookStructure, on_delete=models.CASCADE, related_name='monthly_circulation')
+    loans = models.IntegerField(default=0) #loans issued in the month
+    days_out = models.IntegerField(default=0) #days on loan of the loans returned so far
+    overdue = models.IntegerField(default=0) #loans returned after their return_date
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'book'], name='unique_month_book_circulation'),
+        ]
+        indexes = [
+            models.Index(fields=['book', 'month'], name='monthlybook_book_month_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.book_id} in {self.month:%Y-%m}: {self.loans} loans'
+
+
+class MonthlyCustomerCirculation(models.Model):
+    '''
+    Circulation of one customer in one month, with the same measures as
+    MonthlyBookCirculation.
+    '''
+    month = models.DateField() #first day of the month the loans were issued in
+    customer = models.ForeignKey(CustomerCreate, on_delete=models.CASCADE, related_name='monthly_circulation')
+    loans = models.IntegerField(default=0)
+    days_out = models.IntegerField(default=0)
+    overdue = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'customer'], name='unique_month_customer_circulation'),
+        ]
+        indexes = [
+            models.Index(fields=['customer', 'month'], name='monthlycust_customer_month_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.customer_id} in {self.month:%Y-%m}: {self.loans} loans'
+
+
+class CirculationCube(models.Model):
+    '''
+    Circulation cube cell: loans of one genre, issued in one month to patrons of one age
+    band (see books.rollups.AGE_BANDS), with the same measures as MonthlyBookCirculation.
+    Genre and age band are those of the loan (IssueBook.genre and age_band, taken when
+    it is issued), so the issue and the return of a loan land in the same cell.
+    '''
+    month = models.DateField() #first day of the month the loans were issued in
+    genre = models.CharField(max_length=120) #BookStructure.genre of the loaned title
+    age_band = models.CharField(max_length=10) #age band of the patron, 'unknown' without an age
+    loans = models.IntegerField(default=0)
+    days_out = models.IntegerField(default=0)
+    overdue = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'genre', 'age_band'], name='unique_circulation_cube_cell'),
+        ]
+        indexes = [
+            models.Index(fields=['genre', 'month'], name='circcube_genre_month_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.genre} / {self.age_band} in {self.month:%Y-%m}: {self.loans} loans'
+#◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
+
+#◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
+class LoanHistory(models.Model):
+    '''
+    Every loan, active or archived: a read-only SQL view (`UNION ALL` of IssueBook and
+    IssueBookArchive, migration 0022) for the endpoints that need the whole history.
+    Queries on the active loans keep using IssueBook.
+
+    Archived loans can outlive their copy and customer, so `book` and `issued_by` may
+    point at deleted rows. They are declared nullable to make joins through them LEFT
+    JOINs that keep such loans (with None) instead of dropping them.
+    '''
+    id = models.BigIntegerField(primary_key=True)
+    book = models.ForeignKey(BookCopy, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+')
+    issue_date = models.DateField()
+    return_date = models.DateField()
+    returned_on = models.DateField(null=True)
+    issued_by = models.ForeignKey(CustomerCreate, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+')
+    book_structure = models.ForeignKey(BookStructure, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+')
+    genre = models.CharField(max_length=120, null=True)
+    age_band = models.CharField(max_length=10, null=True)
+    is_archived = models.BooleanField()
+
+    class Meta:
+        managed = False
+        db_table = 'books_loanhistory'
+
+    def __str__(self):
+        return f'{self.book_id} issued by {self.issued_by_id}'
+#◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
+
+#◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
+class BookHold(models.Model):
+    '''
+    A patron's place in the FIFO hold queue of a title with no copy available.
+
+    When a copy of the title comes back, the oldest 'Waiting' hold gets it in the same
+    transaction: the hold turns 'Ready', the copy is set aside as 'On Hold' and the
+    patron is notified once, instead of polling the book details. Issuing the title to
+    the patron then hands over the set-aside copy and fulfils the hold.
+    '''
+    status_choices = (
+        ('Waiting', 'Waiting'), #in the queue
+        ('Ready', 'Ready'), #a copy is set aside for pickup
+        ('Fulfilled', 'Fulfilled'), #the set-aside copy was issued
+        ('Cancelled', 'Cancelled'),
+    )
+    book = models.ForeignKey(BookStructure, on_delete=models.CASCADE, related_name='holds') #the title on hold
+    customer = models.ForeignKey(CustomerCreate, on_delete=models.CASCADE, related_name='book_holds') #who placed the hold
+    status = models.CharField(max_length=20, choices=status_choices, default='Waiting')
+    copy = models.ForeignKey(BookCopy, on_delete=models.SET_NULL, null=True, blank=True) #the copy set aside once ready
+    created_at = models.DateTimeField(auto_now_add=True) #queue order
+    ready_at = models.DateTimeField(null=True, blank=True) #when a copy was set aside
+
+    class Meta:
+        constraints = [
+            #one place in the queue per patron and title
+            models.UniqueConstraint(
+                fields=['book', 'customer'],
+                condition=Q(status__in=['Waiting', 'Ready']),
+                name='bookhold_one_active_per_customer',
+            ),
+        ]
+        indexes = [
+            #next hold of a title: filter by book and status, oldest first
+            models.Index(fields=['book', 'status', 'created_at', 'id'], name='bookhold_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.book} held by {self.customer} ({self.status})'
+#◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
+
+#◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
+class OverdueLoanQuerySet(models.QuerySet):
+    '''
+    Maintenance of the overdue set.
+    '''
+    def sweep(self, today):
+        '''
+        Flags every open loan whose `return_date` is before `today` and drops the flagged
+        loans that have been returned since the last sweep, in one transaction of two
+        set-based statements (the open loans are found through `issuebook_open_due_idx`).
+
+        Returns `(flagged, cleared)`.
+        '''
+        table = self.model._meta.db_table
+        loans = IssueBook._meta.db_table
+        with transaction.atomic(using=self.db):
+            cleared, _ = self.filter(loan__returned_on__isnull=False).delete()
+            with connections[self.db].cursor() as cursor:
+                cursor.execute(
+                    f'''
+                    INSERT INTO {table} (loan_id, return_date, flagged_on)
+                    SELECT l.id, l.return_date, %s FROM {loans} l
+                    WHERE l.returned_on IS NULL AND l.return_date < %s
+                    AND NOT EXISTS (SELECT 1 FROM {table} o WHERE o.loan_id = l.id)
+                    ''',
+                    [today, today],
+                )
+                flagged = cursor.rowcount
+        return flagged, cleared
+
+
+class OverdueLoan(models.Model):
+    '''
+    An open loan past its `return_date`, flagged by the `sweep_overdue_loans` command.
+
+    The overdue endpoint reads this small hot set instead of scanning all of IssueBook.
+    Loans returned after being flagged drop out of the endpoint at once (it joins the
+    open loans only) and out of the table at the next sweep.
+    '''
+    loan = models.OneToOneField(IssueBook, on_delete=models.CASCADE, primary_key=True, related_name='overdue')
+    return_date = models.DateField() #copied from the loan, the overdue list is ordered by it
+    flagged_on = models.DateField() #date of the sweep that flagged the loan
+
+    objects = OverdueLoanQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            #most overdue first
+            models.Index(fields=['return_date', 'loan'], name='overdueloan_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.loan} overdue since {self.return_date}'
+#◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
+
+#◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
+class BookFacet(models.Model):
+    '''
+    Facet values of one book (genre, author, publisher, decade, price band, availability),
+    kept in step with BookStructure and BookCopy writes by books.facets.
+
+    Acts as the snapshot the facet counters are diffed against. It is deliberately not a
+    cascading FK: the BookStructure delete hook removes the row itself so it can decrement
+    the counters first.
+    '''
+    book = models.OneToOneField(
+        BookStructure,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        primary_key=True,
+        related_name='facet',
+    )
+    genre = models.CharField(max_length=120, db_index=True)
+    author = models.CharField(max_length=50, db_index=True)
+    publisher = models.CharField(max_length=120, db_index=True)
+    decade = models.PositiveIntegerField(db_index=True) #e.g. 1990 for anything published 1990-1999
+    price_band = models.CharField(max_length=20, db_index=True)
+    is_available = models.BooleanField(default=False, db_index=True) #at least one copy 'Available To issue'
+
+    def __str__(self):
+        return f'facets of {self.book_id}'
+#◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
+
+
+#◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
+class FacetCount(models.Model):
+    '''
+    Number of books per facet value (e.g. genre=Fiction -> 1200), maintained incrementally
+    so the browse sidebar never runs a GROUP BY over the whole catalog.
+    '''
+    facet = models.CharField(max_length=20)
+    value = models.CharField(max_length=120)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['facet', 'value'], name='unique_facet_value'),
+        ]
+        indexes = [
+            models.Index(fields=['facet', '-count'], name='facetcount_facet_count_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.facet}={self.value} ({self.count})'
+#◥ ▬▬▬▬▬▬▬▬▬▬▬▬ ◆ ▬▬▬▬▬▬▬▬▬▬▬▬ ◤
@@ -0,0 +1,192 @@
+# Standard Library imports
+import base64
+import binascii
+import json
+from functools import reduce
+import operator
+
+#Django imports
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+
+#Third-party imports
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class InvalidCursor(Exception):
+    '''
+    Raised when the `cursor` query parameter cannot be decoded.
+    '''
+
+
+# ══════════════════════════ Count estimation ══════════════════════════════════════════════════════
+def estimate_count(queryset):
+    '''
+    Returns a cheap row count estimate for the queryset.
+
+    On PostgreSQL the planner's row estimate (`EXPLAIN (FORMAT JSON)`) is used, which
+    costs a planning pass instead of a full COUNT(*) scan. Other backends (SQLite for
+    local runs) fall back to an exact count.
+    '''
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Keyset Pagination ══════════════════════════════════════════════════════
+class KeysetPagination:
+    '''
+    Opaque-cursor keyset pagination.
+
+    Pages are fetched with `WHERE (key) > (last key of previous page) ORDER BY key LIMIT n`
+    instead of `OFFSET`, so every page costs the same no matter how deep the client goes,
+    and no COUNT(*) runs unless the client asks for `with_count=true` (answered by
+    `estimate_count`). The ordering must end in a unique field (normally `id`).
+
+    Only forward navigation is supported: the response carries a `next` link and no
+    `previous` link.
+    '''
+    ordering = ('id',)
+    page_size = 10
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'with_count'
+    results_key = 'results'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request, model):
+        '''
+        Returns the position in the cursor, each value converted with its ordering field
+        of `model`, or None without a cursor. Raises InvalidCursor for anything that is
+        not a position this paginator could have written.
+        '''
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+        except (binascii.Error, UnicodeError, ValueError):
+            raise InvalidCursor('Invalid cursor')
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise InvalidCursor('Invalid cursor')
+        values = []
+        for field, value in zip(self.ordering, position):
+            try:
+                value = model._meta.get_field(field.lstrip('-')).to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise InvalidCursor('Invalid cursor')
+            if value is None:
+                raise InvalidCursor('Invalid cursor')
+            values.append(value)
+        return values
+
+    def encode_cursor(self, position):
+        raw = json.dumps(position, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+
+    def _position_filter(self, position):
+        '''
+        Builds the row-value comparison `(a, b) > (x, y)` as
+        `a > x OR (a = x AND b > y)`, honouring the direction of each field.
+        '''
+        clauses = []
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal_prefix = {
+                previous.lstrip('-'): position[i]
+                for i, previous in enumerate(self.ordering[:index])
+            }
+            clauses.append(Q(**equal_prefix, **{f'{name}__{lookup}': position[index]}))
+        return reduce(operator.or_, clauses)
+
+    def _row_position(self, row):
+        position = []
+        for field in self.ordering:
+            value = getattr(row, field.lstrip('-'))
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            position.append(value)
+        return position
+
+    def paginate_queryset(self, queryset, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request, queryset.model)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true', 'True'):
+            self.count = estimate_count(queryset)
+
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self._position_filter(position))
+
+        #fetch one extra row to know whether a next page exists
+        rows = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_position = self._row_position(rows[-1])
+        return rows
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        payload = {'next': self.get_next_link()}
+        if self.count is not None:
+            payload['estimated_count'] = self.count
+        payload[self.results_key] = data
+        return Response(payload)
+
+
+class CatalogPagination(KeysetPagination):
+    '''
+    Catalog listing, ordered by primary key.
+    '''
+    ordering = ('id',)
+    page_size = 50
+    max_page_size = 500
+    results_key = 'all_books'
+
+
+class IssueHistoryPagination(KeysetPagination):
+    '''
+    Issue history, newest first, keyed on (`issue_date`, `id`).
+    '''
+    ordering = ('-issue_date', '-id')
+    page_size = 10
+
+
+class OverduePagination(KeysetPagination):
+    '''
+    Overdue loans, most overdue first, keyed on (`return_date`, `loan_id`).
+    '''
+    ordering = ('return_date', 'loan_id')
+    page_size = 50
+    max_page_size = 500
+    results_key = 'overdue_loans'
+# ════════════════════════════════════════════════════════════════════════════════
@@ -0,0 +1,274 @@
+#Django imports
+from django.db import transaction, connections, IntegrityError, DEFAULT_DB_ALIAS
+from django.db.models import Count, Sum, Q, F, Case, When, Value
+from django.db.models.functions import TruncMonth, ExtractYear, Coalesce
+
+#local imports
+from .models import (
+    BookStructure,
+    MonthlyBookCirculation,
+    MonthlyCustomerCirculation,
+    CirculationCube,
+    LoanHistory,
+)
+from user_app.models import CustomerCreate
+
+#rows written per INSERT while rebuilding
+REBUILD_BATCH_SIZE = 2000
+
+#patron age bands of the circulation cube: (oldest age in the band, band), youngest first
+AGE_BANDS = (
+    (12, '0-12'),
+    (17, '13-17'),
+    (24, '18-24'),
+    (34, '25-34'),
+    (49, '35-49'),
+    (64, '50-64'),
+    (None, '65+'),
+)
+UNKNOWN_AGE_BAND = 'unknown'
+AGE_BAND_CHOICES = [band for _, band in AGE_BANDS] + [UNKNOWN_AGE_BAND]
+#what the cube can be grouped by; 'year' rolls the months up
+CUBE_DIMENSIONS = ('genre', 'age_band', 'year', 'month')
+
+
+# ══════════════════════════ Incremental maintenance ══════════════════════════════════════════════════════
+def month_of(date):
+    return date.replace(day=1)
+
+
+def age_band(age):
+    if age is None:
+        return UNKNOWN_AGE_BAND
+    for oldest, band in AGE_BANDS:
+        if oldest is None or age <= oldest:
+            return band
+
+
+def _age_band_expression(field):
+    #age_band() as SQL, for the rebuild
+    return Case(
+        When(**{f'{field}__isnull': True}, then=Value(UNKNOWN_AGE_BAND)),
+        *[When(**{f'{field}__lte': oldest}, then=Value(band)) for oldest, band in AGE_BANDS if oldest is not None],
+        default=Value(AGE_BANDS[-1][1]),
+    )
+
+
+def _upsert(model, key_fields, deltas, using):
+    '''
+    Adds `deltas` (`{(month, *keys): (loans, days_out, overdue)}`) to the rollup rows,
+    creating missing rows. One multi-row INSERT ... ON CONFLICT DO UPDATE for all of them
+    (split only past the backend's parameter limit) where the backend supports it, an
+    F-expression update per row otherwise.
+    '''
+    connection = connections[using]
+    rows = [(*key, *values) for key, values in deltas.items() if any(values)]
+    if not rows:
+        return
+    if connection.features.supports_update_conflicts_with_target:
+        table = model._meta.db_table
+        columns = ', '.join(model._meta.get_field(field).column for field in key_fields)
+        row_placeholders = '(%s)' % ', '.join(['%s'] * (len(key_fields) + 4))
+        batch_size = connection.ops.bulk_batch_size(['month', *key_fields, 'loans', 'days_out', 'overdue'], rows)
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                cursor.execute(
+                    f'''
+                    INSERT INTO {table} (month, {columns}, loans, days_out, overdue)
+                    VALUES {', '.join([row_placeholders] * len(batch))}
+                    ON CONFLICT (month, {columns}) DO UPDATE SET
+                        loans = {table}.loans + EXCLUDED.loans,
+                        days_out = {table}.days_out + EXCLUDED.days_out,
+                        overdue = {table}.overdue + EXCLUDED.overdue
+                    ''',
+                    [value for row in batch for value in row],
+                )
+        return
+    for month, *keys, loans, days_out, overdue in rows:
+        keys = dict(zip(key_fields, keys))
+        changes = dict(loans=F('loans') + loans, days_out=F('days_out') + days_out, overdue=F('overdue') + overdue)
+        rollup = model.objects.using(using).filter(month=month, **keys)
+        if rollup.update(**changes):
+            continue
+        try:
+            with transaction.atomic(using=using):
+                model.objects.using(using).create(
+                    month=month, loans=loans, days_out=days_out, overdue=overdue, **keys
+                )
+        except IntegrityError:
+            #created concurrently, fall back to the increment
+            rollup.update(**changes)
+
+
+def _record(entries, using):
+    #entries: (book id, customer id, issue date, genre, age band, loans, days out, overdue)
+    if not entries:
+        return
+    #loans created outside IssuanceService carry no genre or age band; take the current ones
+    unkeyed = [entry for entry in entries if entry[3] is None or entry[4] is None]
+    genres, ages = {}, {}
+    if unkeyed:
+        genres = dict(
+            BookStructure.objects.using(using)
+            .filter(pk__in={entry[0] for entry in unkeyed})
+            .values_list('pk', 'genre')
+        )
+        ages = dict(
+            CustomerCreate.objects.using(using)
+            .filter(pk__in={entry[1] for entry in unkeyed})
+            .values_list('pk', 'age')
+        )
+    book_deltas, customer_deltas, cube_deltas = {}, {}, {}
+    for book_id, customer_id, issue_date, genre, band, *values in entries:
+        month = month_of(issue_date)
+        if genre is None:
+            genre = genres.get(book_id, '')
+        if band is None:
+            band = age_band(ages.get(customer_id))
+        for deltas, key in (
+            (book_deltas, (month, book_id)),
+            (customer_deltas, (month, customer_id)),
+            (cube_deltas, (month, genre, band)),
+        ):
+            current = deltas.get(key, (0, 0, 0))
+            deltas[key] = tuple(a + b for a, b in zip(current, values))
+    _upsert(MonthlyBookCirculation, ['book'], book_deltas, using)
+    _upsert(MonthlyCustomerCirculation, ['customer'], customer_deltas, using)
+    _upsert(CirculationCube, ['genre', 'age_band'], cube_deltas, using)
+
+
+def record_loans(loans, using=DEFAULT_DB_ALIAS):
+    '''
+    Counts new loans, given as `(book id, customer id, issue date, genre, age band)`
+    with the genre and age band stored on the loan. Call it inside the transaction that
+    creates them.
+    '''
+    _record([(*loan, 1, 0, 0) for loan in loans], using)
+
+
+def record_returns(returns, using=DEFAULT_DB_ALIAS):
+    '''
+    Adds the days out and late returns of closed loans, given as `(book id, customer id,
+    issue date, return date, returned on, genre, age band)`, to the month and cube cell
+    they were issued in. Call it inside the transaction that closes them.
+    '''
+    _record(
+        [
+            (book_id, customer_id, issue_date, genre, band, 0, (returned_on - issue_date).days, int(returned_on > return_date))
+            for book_id, customer_id, issue_date, return_date, returned_on, genre, band in returns
+        ],
+        using,
+    )
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Rebuild ══════════════════════════════════════════════════════
+def _rollup_rows(group_fields, annotations, filters):
+    #one GROUP BY over every loan, active and archived
+    return (
+        LoanHistory.objects
+        .annotate(month=TruncMonth('issue_date'), **annotations)
+        .filter(**filters)
+        .values('month', *group_fields)
+        .annotate(
+            loans=Count('id'),
+            days_out=Sum(F('returned_on') - F('issue_date'), filter=Q(returned_on__isnull=False)),
+            overdue=Count('id', filter=Q(returned_on__gt=F('return_date'))),
+        )
+        .order_by()
+    )
+
+
+def rebuild_rollups():
+    '''
+    Recomputes the rollup tables and the circulation cube from LoanHistory (active and
+    archived loans) in one transaction. Returns `(book rows, customer rows, cube rows)`.
+
+    Loans are counted against the title, genre and age band stored on them, like the
+    incremental path does, so archived loans of deleted copies still count. Loans of
+    deleted titles and customers only drop out of those tables, whose rows go with them.
+    '''
+    #loans created outside IssuanceService carry no keys; fall back to the current values
+    annotations = {
+        'title': Coalesce('book_structure_id', 'book__book_instance_id'),
+        'loan_genre': Coalesce('genre', 'book__book_instance__genre'),
+        'loan_age_band': Coalesce('age_band', _age_band_expression('issued_by__age')),
+    }
+    counts = []
+    with transaction.atomic():
+        for model, keys, filters in (
+            (MonthlyBookCirculation, {'book_id': 'title'}, {'title__in': BookStructure.objects.values('pk')}),
+            (MonthlyCustomerCirculation, {'customer_id': 'issued_by_id'}, {'issued_by_id__in': CustomerCreate.objects.values('pk')}),
+            (CirculationCube, {'genre': 'loan_genre', 'age_band': 'loan_age_band'}, {}),
+        ):
+            model.objects.all().delete()
+            rows = [
+                model(
+                    month=row['month'],
+                    loans=row['loans'],
+                    days_out=row['days_out'].days if row['days_out'] else 0,
+                    overdue=row['overdue'],
+                    **{field: row[group_field] for field, group_field in keys.items()},
+                )
+                for row in _rollup_rows(keys.values(), annotations, filters).iterator()
+                #loans of copies deleted before their genre was stored have no cell to count in
+                if all(row[group_field] is not None for group_field in keys.values())
+            ]
+            model.objects.bulk_create(rows, batch_size=REBUILD_BATCH_SIZE)
+            counts.append(len(rows))
+    return tuple(counts)
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Reading ══════════════════════════════════════════════════════
+def monthly_report(start=None, end=None, book_id=None, customer_id=None):
+    '''
+    Returns `[{'month', 'loans', 'days_out', 'overdue'}, ...]`, oldest month first, read
+    from the rollup tables: the totals of the whole library, or of one book or customer.
+    `start` and `end` are dates; the months containing them are included.
+    '''
+    if customer_id is not None:
+        rows = MonthlyCustomerCirculation.objects.filter(customer_id=customer_id)
+    else:
+        rows = MonthlyBookCirculation.objects.all()
+        if book_id is not None:
+            rows = rows.filter(book_id=book_id)
+    if start:
+        rows = rows.filter(month__gte=month_of(start))
+    if end:
+        rows = rows.filter(month__lte=month_of(end))
+    rows = rows.values('month').annotate(
+        loans=Sum('loans'),
+        days_out=Sum('days_out'),
+        overdue=Sum('overdue'),
+    ).order_by('month')
+    return list(rows)
+
+
+def cube_report(group_by=(), start=None, end=None, genre=None, age_band=None):
+    '''
+    Slices the circulation cube. `group_by` lists the dimensions to keep, out of
+    CUBE_DIMENSIONS ('year' rolls the months up to years); every other dimension is
+    summed over, so `()` gives the library total and adding dimensions drills down.
+    `genre` and `age_band` fix a dimension; `start` and `end` bound the months.
+
+    Returns `[{<dimension>: ..., 'loans', 'days_out', 'overdue'}, ...]`, ordered by the
+    dimensions.
+    '''
+    cells = CirculationCube.objects.all()
+    if genre is not None:
+        cells = cells.filter(genre=genre)
+    if age_band is not None:
+        cells = cells.filter(age_band=age_band)
+    if start:
+        cells = cells.filter(month__gte=month_of(start))
+    if end:
+        cells = cells.filter(month__lte=month_of(end))
+    totals = dict(loans=Sum('loans'), days_out=Sum('days_out'), overdue=Sum('overdue'))
+    if not group_by:
+        return [{field: value or 0 for field, value in cells.aggregate(**totals).items()}]
+    if 'year' in group_by:
+        cells = cells.annotate(year=ExtractYear('month'))
+    return list(cells.values(*group_by).annotate(**totals).order_by(*group_by))
+# ════════════════════════════════════════════════════════════════════════════════
@@ -0,0 +1,149 @@
+# Standard Library imports
+import logging
+import re
+
+#Django imports
+from django.db import connection, DatabaseError
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+#tables created by migration 0014_bookstructure_search_index
+POSTGRES_SEARCH_TABLE = 'books_bookstructure_search'
+SQLITE_SEARCH_TABLE = 'books_bookstructure_fts'
+
+#bm25 column weights for the FTS5 table, in column order (title, author, subject, genre)
+SQLITE_COLUMN_WEIGHTS = (10.0, 5.0, 1.0, 2.0)
+
+_sqlite_fts_available = None
+
+
+# ══════════════════════════ Backend selection ══════════════════════════════════════════════════════
+def _has_sqlite_fts():
+    '''
+    FTS5 is optional in SQLite builds; migration 0014 skips the table when it is missing.
+    The lookup result is cached for the life of the process.
+    '''
+    global _sqlite_fts_available
+    if _sqlite_fts_available is None:
+        _sqlite_fts_available = SQLITE_SEARCH_TABLE in connection.introspection.table_names()
+    return _sqlite_fts_available
+
+
+def _backend():
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor == 'sqlite' and _has_sqlite_fts():
+        return 'sqlite'
+    return None
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Index maintenance ══════════════════════════════════════════════════════
+def index_book(book):
+    '''
+    Inserts or refreshes the search document of a single BookStructure.
+    Called from the BookStructure post_save hook.
+    '''
+    backend = _backend()
+    with connection.cursor() as cursor:
+        if backend == 'postgresql':
+            cursor.execute(
+                f'''
+                INSERT INTO {POSTGRES_SEARCH_TABLE} (book_id, document)
+                VALUES (
+                    %s,
+                    setweight(to_tsvector('english', %s), 'A') ||
+                    setweight(to_tsvector('english', %s), 'B') ||
+                    setweight(to_tsvector('english', %s), 'C') ||
+                    setweight(to_tsvector('english', %s), 'D')
+                )
+                ON CONFLICT (book_id) DO UPDATE SET document = EXCLUDED.document
+                ''',
+                [book.pk, book.title, book.author, book.genre, book.subject],
+            )
+        elif backend == 'sqlite':
+            cursor.execute(f'DELETE FROM {SQLITE_SEARCH_TABLE} WHERE rowid = %s', [book.pk])
+            cursor.execute(
+                f'INSERT INTO {SQLITE_SEARCH_TABLE} (rowid, title, author, subject, genre) VALUES (%s, %s, %s, %s, %s)',
+                [book.pk, book.title, book.author, book.subject, book.genre],
+            )
+
+
+def remove_book(book_id):
+    '''
+    Drops a BookStructure from the search index. Called from the post_delete hook.
+    '''
+    backend = _backend()
+    with connection.cursor() as cursor:
+        if backend == 'postgresql':
+            cursor.execute(f'DELETE FROM {POSTGRES_SEARCH_TABLE} WHERE book_id = %s', [book_id])
+        elif backend == 'sqlite':
+            cursor.execute(f'DELETE FROM {SQLITE_SEARCH_TABLE} WHERE rowid = %s', [book_id])
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Querying ══════════════════════════════════════════════════════
+def _fts5_match_expression(query):
+    '''
+    Turns free text into a safe FTS5 expression: every word becomes a quoted
+    prefix term and the terms are ANDed together.
+    '''
+    terms = re.findall(r'\w+', query.lower())
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_books(query, limit=20):
+    '''
+    Returns `[(book_id, rank), ...]` for the best matching books, best first.
+
+    Title matches weigh the most, then author, genre and subject.
+    - PostgreSQL: `tsvector` documents with a GIN index, ranked by `ts_rank`.
+    - SQLite: FTS5 table ranked by weighted `bm25`.
+    - Other backends: unranked `icontains` fallback.
+    '''
+    backend = _backend()
+    if backend == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'''
+                SELECT book_id, ts_rank(document, query) AS rank
+                FROM {POSTGRES_SEARCH_TABLE}, websearch_to_tsquery('english', %s) query
+                WHERE document @@ query
+                ORDER BY rank DESC, book_id
+                LIMIT %s
+                ''',
+                [query, limit],
+            )
+            return [(book_id, float(rank)) for book_id, rank in cursor.fetchall()]
+
+    if backend == 'sqlite':
+        expression = _fts5_match_expression(query)
+        if not expression:
+            return []
+        weights = ', '.join(str(weight) for weight in SQLITE_COLUMN_WEIGHTS)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'''
+                    SELECT rowid, bm25({SQLITE_SEARCH_TABLE}, {weights}) AS score
+                    FROM {SQLITE_SEARCH_TABLE}
+                    WHERE {SQLITE_SEARCH_TABLE} MATCH %s
+                    ORDER BY score, rowid
+                    LIMIT %s
+                    ''',
+                    [expression, limit],
+                )
+                #bm25 is "lower is better", flip it so every backend ranks descending
+                return [(book_id, -float(score)) for book_id, score in cursor.fetchall()]
+        except DatabaseError:
+            logger.exception('fts5 query failed for %r', query)
+            return []
+
+    from .models import BookStructure
+    matches = BookStructure.objects.filter(
+        Q(title__icontains=query) | Q(author__icontains=query) |
+        Q(genre__icontains=query) | Q(subject__icontains=query)
+    ).order_by('title').values_list('id', flat=True)[:limit]
+    return [(book_id, 0.0) for book_id in matches]
+# ════════════════════════════════════════════════════════════════════════════════
@@ -1,18 +1,23 @@
 # Standard Library Importd
 import datetime
 
-#Django imports
-from django.utils import timezone
-
 #Third-party imports
 from rest_framework import serializers, status
 from rest_framework.response import Response
 from drf_yasg.openapi import Response as SwaggerResponse
 
 #local impoers
-from .models import BookStructure, BookCopy, IssueBook
+from .models import BookStructure, BookCopy, IssueBook, OverdueLoan, LoanHistory
+from .autocomplete import AUTOCOMPLETE_FIELDS
+from .facets import PRICE_BANDS
+from .inventory import MAX_COPIES_PER_REQUEST
+from .circulation import ReturnService, ReturnError, MAX_CHECKOUT_ITEMS, MAX_RETURN_ITEMS
+from .rollups import AGE_BAND_CHOICES, CUBE_DIMENSIONS
 from user_app.models import CustomerCreate
 
+#formats accepted by the bulk catalog import (books.importer)
+IMPORT_FORMATS = ('csv', 'jsonl')
+
 #seralizers defined below
 # ══════════════════════════ Book Structure Serializer ══════════════════════════════════════════════════════
 class BookStructureSerializer(serializers.ModelSerializer):
@@ -21,11 +26,46 @@ class BookStructureSerializer(serializers.ModelSerializer):
     class Meta:
         model = BookStructure
         fields = '__all__'
-    #get us the available copies for displaying
+    #get us the available copies for displaying (denormalized counter, no query)
     def get_available_copies(self , obj):
-        return BookCopy.objects.filter(
-         book_instance = obj,
-    ).count()
+        return obj.available_count
+# ════════════════════════════════════════════════════════════════════════════════
+
+# ══════════════════════════ Copy Quantity Serializer ══════════════════════════════════════════════════
+class CopyQuantitySerializer(serializers.Serializer):
+    quantity = serializers.IntegerField(required=False, min_value=1, max_value=MAX_COPIES_PER_REQUEST)
+# ════════════════════════════════════════════════════════════════════════════════
+
+# ══════════════════════════ Book Import Row Serializer ══════════════════════════════════════════════════
+class BookImportRowSerializer(serializers.ModelSerializer):
+    '''
+    One row of a bulk catalog import: the BookStructure fields plus how many
+    physical copies of the book the row brings in.
+    '''
+    copies = serializers.IntegerField(required=False, default=1, min_value=0, max_value=MAX_COPIES_PER_REQUEST)
+    class Meta:
+        model = BookStructure
+        fields = ['title', 'author', 'price', 'publication_date', 'subject', 'genre', 'edition', 'publisher', 'copies']
+
+class BookImportQuerySerializer(serializers.Serializer):
+    import_format = serializers.ChoiceField(required=False, choices=IMPORT_FORMATS)
+# ════════════════════════════════════════════════════════════════════════════════
+
+# ══════════════════════════ Book Structure List Serializer ══════════════════════════════════════════════════
+class BookStructureListSerializer(serializers.ModelSerializer):
+    '''
+    Read-only serializer for catalog listings.
+
+    Expects a queryset built with `BookStructure.objects.with_copy_counts()` so the
+    copy counts are read from the annotations instead of being queried per book.
+    '''
+    available_copies = serializers.IntegerField(read_only=True)
+    issued_copies = serializers.IntegerField(read_only=True)
+    lost_copies = serializers.IntegerField(read_only=True)
+    damaged_copies = serializers.IntegerField(read_only=True)
+    class Meta:
+        model = BookStructure
+        fields = '__all__'
 # ════════════════════════════════════════════════════════════════════════════════
 
 # ════════════════════════════ Book Copy Serializer ════════════════════════════════════════════════════
@@ -42,66 +82,62 @@ class IssueBookSerializer(serializers.ModelSerializer):
         fields = ['issue_date' , 'return_date']
 # ════════════════════════════════════════════════════════════════════════════════
 
+# ══════════════════════════════ Checkout Serializer ══════════════════════════════════════════════════
+class CheckoutSerializer(serializers.Serializer):
+    '''
+    A desk checkout: several titles issued to the authenticated user at once.
+    '''
+    book_structure_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=MAX_CHECKOUT_ITEMS,
+    )
+    issue_date = serializers.DateField()
+    return_date = serializers.DateField()
+# ════════════════════════════════════════════════════════════════════════════════
+
+# ══════════════════════════════ Batch Return Serializer ══════════════════════════════════════════════════
+class BatchReturnSerializer(serializers.Serializer):
+    '''
+    Scanned copies checked in together at the desk or the book-drop.
+    '''
+    book_copy_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=MAX_RETURN_ITEMS,
+    )
+# ════════════════════════════════════════════════════════════════════════════════
+
 # ══════════════════════════════ Retuen Book Serializer ══════════════════════════════════════════════════
 class ReturnBookSerializer(serializers.Serializer):
     book_copy_id = serializers.IntegerField()
 
     def validate(self, data):
         user = self.context['request'].user
-        book_copy_id = data.get('book_copy_id')
 
         if not user or not user.is_authenticated:
             raise serializers.ValidationError('Authentication required.')
 
-        # Get the customer
-        try:
-            customer = CustomerCreate.objects.get(user=user)
-        except CustomerCreate.DoesNotExist:
-            raise serializers.ValidationError('Customer does not exist.')
-
-        # Get the BookCopy
-        try:
-            book_copy = BookCopy.objects.get(id=book_copy_id)
-        except BookCopy.DoesNotExist:
-            raise serializers.ValidationError('Book copy not found.')
-
-        # Get the active IssueBook entry
-        try:
-            issue_book = IssueBook.objects.select_related('book__book_instance').get(
-                issued_by=customer,
-                book=book_copy,
-                returned_on__isnull=True
-            )
-        except IssueBook.DoesNotExist:
-            raise serializers.ValidationError('No active issue found for this book copy.')
-
-        # Save references in validated_data
-        data['issue_book'] = issue_book
-        data['book_copy'] = book_copy
-        data['customer'] = customer
         return data
 
     def save(self, **kwargs):
         """
         Marks the book as returned and updates the status.
-        """
-        issue = self.validated_data['issue_book']
-        book_copy = self.validated_data['book_copy']
-        today = timezone.now()
 
-        # Update issue record
-        issue.returned_on = today
-        issue.save()
-
-        # Update book copy status
-        book_copy.status = 'Available To issue'
-        book_copy.save()
+        Runs the ReturnService fast path: conditional UPDATEs for the loan, the copy and
+        the book counters in one transaction. The customer, copy and loan are only looked
+        up when the return fails, to explain why.
+        """
+        try:
+            returned = ReturnService().return_copy(self.context['request'].user, self.validated_data['book_copy_id'])
+        except ReturnError as e:
+            raise serializers.ValidationError({'non_field_errors': [str(e)]})
 
         return {
             'message': 'Book returned successfully',
-            'returned_on': today,
-            'book_id': book_copy.id,
-            'book_title': getattr(book_copy.book_instance, 'title', 'Unknown')
+            'returned_on': returned['returned_on'],
+            'book_id': returned['book_copy_id'],
+            'book_title': returned['book_title'] or 'Unknown',
         }
 
     def to_representation(self, instance):
@@ -133,6 +169,28 @@ class ViewIssueBookSerializer(serializers.ModelSerializer):
         fields = ['title','issue_date','return_date' , 'issued_by']
 # ════════════════════════════════════════════════════════════════════════════════
 
+# ════════════════════════════════ Overdue Loan Serializer ════════════════════════════════════════════════
+class OverdueLoanSerializer(serializers.ModelSerializer):
+    '''
+    Read-only serializer for the overdue set; expects `today` in the context.
+    '''
+    loan_id = serializers.IntegerField(read_only=True)
+    title = serializers.CharField(source='loan.book.book_instance.title', read_only=True)
+    book_structure_id = serializers.IntegerField(source='loan.book.book_instance_id', read_only=True)
+    book_copy_id = serializers.IntegerField(source='loan.book_id', read_only=True)
+    issued_copy = serializers.IntegerField(source='loan.book.copy_number', read_only=True)
+    issue_date = serializers.DateField(source='loan.issue_date', read_only=True)
+    issued_by = serializers.IntegerField(source='loan.issued_by_id', read_only=True)
+    days_overdue = serializers.SerializerMethodField()
+
+    class Meta:
+        model = OverdueLoan
+        fields = ['loan_id', 'title', 'book_structure_id', 'book_copy_id', 'issued_copy', 'issue_date', 'return_date', 'days_overdue', 'issued_by']
+
+    def get_days_overdue(self, obj):
+        return (self.context['today'] - obj.return_date).days
+# ════════════════════════════════════════════════════════════════════════════════
+
 # ════════════════════════════════ Admin Search Serializer ════════════════════════════════════════════════
 class AdminSearchSerializer(serializers.Serializer):
     title = serializers.CharField()
@@ -152,6 +210,52 @@ class AdminSearchSerializer(serializers.Serializer):
         return value
 # ════════════════════════════════════════════════════════════════════════════════
 
+# ════════════════════════════════ Book Search Serializer ════════════════════════════════════════════════
+class BookSearchInputSerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+    limit = serializers.IntegerField(required=False, default=20, min_value=1, max_value=100)
+
+    def validate_q(self, value):
+        if not value.strip():
+            raise serializers.ValidationError('Search text is required')
+        return value.strip()
+# ════════════════════════════════════════════════════════════════════════════════
+
+# ════════════════════════════════ Autocomplete Serializer ════════════════════════════════════════════════
+class AutocompleteInputSerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=120, trim_whitespace=False)
+    field = serializers.ChoiceField(choices=('all',) + AUTOCOMPLETE_FIELDS, required=False, default='all')
+    limit = serializers.IntegerField(required=False, default=10, min_value=1, max_value=25)
+# ════════════════════════════════════════════════════════════════════════════════
+
+# ════════════════════════════════ Browse Filter Serializer ════════════════════════════════════════════════
+class BrowseFilterSerializer(serializers.Serializer):
+    genre = serializers.CharField(required=False, max_length=120)
+    author = serializers.CharField(required=False, max_length=50)
+    publisher = serializers.CharField(required=False, max_length=120)
+    decade = serializers.IntegerField(required=False, min_value=0, help_text='e.g. 1990')
+    price_band = serializers.ChoiceField(required=False, choices=[label for _, label in PRICE_BANDS])
+    available = serializers.BooleanField(required=False, allow_null=True, default=None)
+
+    def validate_decade(self, value):
+        if value % 10:
+            raise serializers.ValidationError('decade must be a multiple of 10')
+        return value
+
+    def facet_filters(self):
+        '''
+        Validated filters as BookFacet lookups.
+        '''
+        filters = {
+            field: self.validated_data[field]
+            for field in ('genre', 'author', 'publisher', 'decade', 'price_band')
+            if self.validated_data.get(field) is not None
+        }
+        if self.validated_data.get('available') is not None:
+            filters['is_available'] = self.validated_data['available']
+        return filters
+# ════════════════════════════════════════════════════════════════════════════════
+
 # ════════════════════════════════ Serializers for tracking  ════════════════════════════════════════════════
 class BookHistoryFilterSerializer(serializers.Serializer):
     book_structure_id = serializers.IntegerField(
@@ -164,20 +268,71 @@ class HistoryUsingDateInputSerializer(serializers.Serializer):
     )
 
 class BookHistorySerializer(serializers.ModelSerializer):
+    #null when an archived loan's copy was deleted since
     title = serializers.CharField(
         source='book.book_instance.title',
-        read_only=True
+        read_only=True,
+        allow_null=True
     )
     book_structure_id = serializers.IntegerField(
         source='book.book_instance.id',
-        read_only=True
+        read_only=True,
+        allow_null=True
     )
     issued_copy = serializers.IntegerField(
         source='book.copy_number',
-        read_only=True
+        read_only=True,
+        allow_null=True
     )
     class Meta:
-        model = IssueBook
+        model = LoanHistory
         fields = ['title', 'issue_date','return_date' , 'returned_on', 'issued_by' , 'issued_copy' , 'book_structure_id']
 # ════════════════════════════════════════════════════════════════════════════════
 
+
+# ════════════════════════════════ Monthly Report Serializer ════════════════════════════════════════════════
+class MonthlyReportInputSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    book_structure_id = serializers.IntegerField(required=False, min_value=1)
+    customer_id = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, data):
+        if data.get('book_structure_id') and data.get('customer_id'):
+            raise serializers.ValidationError('Filter by book_structure_id or customer_id, not both')
+        if data.get('start') and data.get('end') and data['start'] > data['end']:
+            raise serializers.ValidationError('start must not be after end')
+        return data
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ════════════════════════════════ Title Statistics Serializer ════════════════════════════════════════════════
+class TitleStatisticsInputSerializer(serializers.Serializer):
+    days = serializers.IntegerField(required=False, min_value=1, max_value=3650, default=365)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=1000)
+    book_structure_id = serializers.IntegerField(required=False, min_value=1)
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ════════════════════════════════ Circulation Cube Serializer ════════════════════════════════════════════════
+class CirculationCubeInputSerializer(serializers.Serializer):
+    group_by = serializers.CharField(required=False, allow_blank=True, default='')
+    genre = serializers.CharField(required=False, max_length=120)
+    age_band = serializers.ChoiceField(required=False, choices=AGE_BAND_CHOICES)
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate_group_by(self, value):
+        dimensions = list(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+        unknown = [field for field in dimensions if field not in CUBE_DIMENSIONS]
+        if unknown:
+            raise serializers.ValidationError(f"Unknown dimension(s): {', '.join(unknown)}. Use {', '.join(CUBE_DIMENSIONS)}")
+        if 'year' in dimensions and 'month' in dimensions:
+            raise serializers.ValidationError('Group by year or month, not both')
+        return dimensions
+
+    def validate(self, data):
+        if data.get('start') and data.get('end') and data['start'] > data['end']:
+            raise serializers.ValidationError('start must not be after end')
+        return data
+# ════════════════════════════════════════════════════════════════════════════════
@@ -1,9 +1,17 @@
 from django.dispatch import receiver , Signal
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.contrib.auth.models import User
 from django.contrib import messages
 import logging
 from .models import BookStructure , BookCopy , IssueBook
+from . import search
+from .fuzzy import trigram_index
+from .autocomplete import catalog_autocomplete
+from .facets import refresh_book_facets, refresh_books_facets, remove_book_facets
+from .cache import catalog_changed, copies_changed, circulation_changed
+from .inventory import add_copies
+from .holds import HoldService
 
 logger = logging.getLogger(__name__)
 
@@ -11,51 +19,128 @@ logger = logging.getLogger(__name__)
 duplicate_book_signal = Signal()
 issue_book_signal = Signal()
 return_book_signal = Signal()
+books_imported_signal = Signal()
+books_returned_signal = Signal()
+
+@receiver(post_save, sender=BookStructure)
+def index_book_structure(sender, instance, **kwargs):
+    #keep the full-text, trigram and autocomplete indexes in sync with the catalog;
+    #the in-memory indexes only take the change once it commits
+    search.index_book(instance)
+    book_id, title, author, publisher = instance.pk, instance.title, instance.author, instance.publisher
+
+    def update_memory_indexes():
+        trigram_index.update(book_id, title, author)
+        catalog_autocomplete.update(book_id, title, author, publisher)
+    transaction.on_commit(update_memory_indexes)
+    refresh_book_facets(instance.pk)
+
+
+@receiver(post_delete, sender=BookStructure)
+def unindex_book_structure(sender, instance, **kwargs):
+    search.remove_book(instance.pk)
+    book_id = instance.pk
+
+    def remove_from_memory_indexes():
+        trigram_index.remove(book_id)
+        catalog_autocomplete.remove(book_id)
+    transaction.on_commit(remove_from_memory_indexes)
+    remove_book_facets(instance.pk)
+
+
+@receiver(post_save, sender=BookCopy)
+@receiver(post_delete, sender=BookCopy)
+def refresh_copy_facets(sender, instance, **kwargs):
+    #copy changes can flip the availability facet of their book
+    refresh_book_facets(instance.book_instance_id)
+    copies_changed(instance.book_instance_id)
+
+
+@receiver(pre_delete, sender=BookCopy)
+def release_held_copy(sender, instance, **kwargs):
+    #a ready hold must not be left pointing at a deleted copy (copy set to NULL)
+    HoldService().release_copies([instance.pk])
+
+
+@receiver(post_save, sender=BookStructure)
+@receiver(post_delete, sender=BookStructure)
+@receiver(post_save, sender=BookCopy)
+@receiver(post_delete, sender=BookCopy)
+@receiver(post_save, sender=IssueBook)
+@receiver(post_delete, sender=IssueBook)
+def invalidate_catalog_cache(sender, **kwargs):
+    #any catalog or circulation write moves the catalog version stamp
+    catalog_changed()
+
+
+@receiver(post_save, sender=IssueBook)
+@receiver(post_delete, sender=IssueBook)
+def invalidate_circulation_statistics(sender, **kwargs):
+    #loan writes outside the circulation services (admin edits) still move the statistics version
+    circulation_changed()
+
+
+@receiver(books_imported_signal)
+def index_imported_books(sender, created=(), restocked=(), **kwargs):
+    #bulk_create skips post_save: index the new books and refresh the restocked ones here
+    documents = [(book.pk, book.title, book.author, book.publisher) for book in created]
+
+    def update_memory_indexes():
+        for book_id, title, author, publisher in documents:
+            trigram_index.update(book_id, title, author)
+            catalog_autocomplete.update(book_id, title, author, publisher)
+    transaction.on_commit(update_memory_indexes)
+    for book in created:
+        search.index_book(book)
+    book_ids = [book.pk for book in created] + list(restocked)
+    refresh_books_facets(book_ids)
+    for book_id in book_ids:
+        copies_changed(book_id)
+    catalog_changed()
+
+
+@receiver(books_returned_signal)
+def refresh_returned_books(sender, returned=None, **kwargs):
+    #sent after a batch return committed with `{copy id: book id}` of the copies put back on the shelf
+    book_ids = set((returned or {}).values())
+    refresh_books_facets(book_ids)
+    for book_id in book_ids:
+        copies_changed(book_id)
+    catalog_changed()
+    circulation_changed()
+    logger.info(f"{len(returned or {})} book copies have been returned")
+
 
 @receiver(duplicate_book_signal)
 def duplicate_book_copy(sender , *args , **kwargs):
     book = kwargs.get("book")
-    BookCopy.objects.create(
-        book_instance=book,
-        status = 'Available To issue',
-    )
+    add_copies(book.pk, kwargs.get("quantity") or 1)
 
 
 @receiver(issue_book_signal)
 def issue_book(sender, *args, **kwargs):
-    book_id = kwargs.get("book_copy_id")
-    if not book_id:
-        logger.error("No copy book id given")
-        return
-    try:
-        book_copy = BookCopy.objects.get(id=book_id)
-    except BookCopy.DoesNotExist:
-        logger.error("no id avaliable")
+    #sent after the loan committed: the copy is already 'Issued', only derived state is left
+    book_copy_id = kwargs.get("book_copy_id")
+    book_structure_id = kwargs.get("book_structure_id")
+    if not book_structure_id:
+        logger.error("No book structure id given")
         return
-
-    book_copy.status = 'Issued'
-    book_copy.save()
-    logger.info(f"book id : {book_id} has been issued")
+    refresh_book_facets(book_structure_id)
+    copies_changed(book_structure_id)
+    catalog_changed()
+    circulation_changed()
+    logger.info(f"book copy id : {book_copy_id} has been issued")
 
 @receiver(return_book_signal)
 def return_book(sender, *args, **kwargs):
+    #sent after the return committed: the loan is closed and the copy is back, only derived state is left
     book_copy_id = kwargs.get("book_copy_id")
-    if not book_copy_id:
-        logger.error("No copy book id given")
+    book_structure_id = kwargs.get("book_structure_id")
+    if not book_structure_id:
+        logger.error("No book structure id given")
         return
-    try:
-        book_copy = BookCopy.objects.get(id=book_copy_id)
-    except BookCopy.DoesNotExist:
-        logger.error("no id avaliable")
-        return
-
-    if book_copy.status == 'Issued':
-        print('the status also works')
-        book_copy.status = 'Available To issue'
-        book_copy.save()
-        IssueBook.objects.filter(book=book_copy).delete()
-        logger.info(f"{book_copy} has been returnrd")
-    else:
-        print('if this is print you fucked up ')
-        logger.error(f"{book_copy} could not be returned")
-
+    refresh_book_facets(book_structure_id)
+    copies_changed(book_structure_id)
+    catalog_changed()
+    circulation_changed()
+    logger.info(f"book copy id : {book_copy_id} has been returned")
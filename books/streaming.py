@@ -0,0 +1,102 @@
+# Standard Library imports
+import json
+import logging
+
+#Django imports
+from django.http import StreamingHttpResponse
+
+#Third-party imports
+from rest_framework.utils.encoders import JSONEncoder
+
+#local imports
+from .serializer import BookStructureListSerializer
+
+logger = logging.getLogger(__name__)
+
+#rows fetched from the database per round trip while streaming
+CATALOG_STREAM_CHUNK_SIZE = 2000
+#rows encoded together before being handed to the WSGI server
+CATALOG_STREAM_BATCH_SIZE = 500
+
+CATALOG_STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+
+# ══════════════════════════ Catalog row encoder ══════════════════════════════════════════════════════
+def _iter_encoded_books(queryset):
+    '''
+    Yields every book of the queryset as an encoded JSON object, one at a time.
+
+    `QuerySet.iterator()` fetches rows in chunks and skips the queryset result cache,
+    so only one chunk of model instances is alive at any point.
+    '''
+    serializer = BookStructureListSerializer()
+    for book in queryset.iterator(chunk_size=CATALOG_STREAM_CHUNK_SIZE):
+        yield json.dumps(serializer.to_representation(book), cls=JSONEncoder)
+
+
+def _batched(encoded_rows, separator):
+    '''
+    Groups encoded rows so the response is written in a few large chunks
+    instead of one tiny chunk per book.
+    '''
+    batch = []
+    for row in encoded_rows:
+        batch.append(row)
+        if len(batch) >= CATALOG_STREAM_BATCH_SIZE:
+            yield separator.join(batch)
+            batch = []
+    if batch:
+        yield separator.join(batch)
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Stream generators ══════════════════════════════════════════════════════
+def iter_catalog_ndjson(queryset):
+    '''
+    Newline delimited JSON: one book object per line.
+    '''
+    try:
+        for batch in _batched(_iter_encoded_books(queryset), '\n'):
+            yield batch + '\n'
+    except Exception:
+        #headers are already sent, the client sees a truncated body
+        logger.exception('catalog ndjson stream aborted')
+        raise
+
+
+def iter_catalog_json_array(queryset):
+    '''
+    A single JSON document (`{"all_books": [...]}`) encoded incrementally,
+    matching the shape of the non-streamed listing.
+    '''
+    try:
+        yield '{"all_books":['
+        first = True
+        for batch in _batched(_iter_encoded_books(queryset), ','):
+            yield batch if first else ',' + batch
+            first = False
+        yield ']}'
+    except Exception:
+        logger.exception('catalog json stream aborted')
+        raise
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+def stream_catalog(queryset, stream_format):
+    '''
+    Builds a StreamingHttpResponse for the catalog in the requested format
+    ('ndjson' or 'json'). Peak memory stays bound by the chunk size, not by
+    the number of books.
+    '''
+    if stream_format == 'ndjson':
+        content = iter_catalog_ndjson(queryset)
+    else:
+        content = iter_catalog_json_array(queryset)
+    return StreamingHttpResponse(
+        content,
+        content_type=CATALOG_STREAM_FORMATS[stream_format],
+        status=200,
+    )
@@ -0,0 +1,1140 @@
+# Standard Library imports
+import base64
+import datetime
+import io
+import json
+import random
+import re
+import threading
+import time
+
+#Django imports
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection, connections, transaction, DatabaseError, OperationalError
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+#Third-party imports
+from rest_framework.test import APIClient
+
+#local imports
+from .models import BookStructure, BookCopy, IssueBook, BookHold, OverdueLoan, IssueBookArchive, LoanHistory, BookFacet, FacetCount, BookCopySequence
+from .circulation import IssuanceService, ReturnService, NoCopyAvailable
+from .rollups import rebuild_rollups, monthly_report, cube_report, age_band
+from .analytics import compute_title_statistics, title_statistics
+from .inventory import add_copies, reserve_copy_numbers
+from .holds import HoldService
+from .importer import read_rows, import_catalog
+from . import search
+from .fuzzy import TrigramIndex, trigram_index, trigrams
+from .autocomplete import catalog_autocomplete
+from .facets import facet_counts
+from .cache import get_copies_version, get_catalog_version, bump_catalog_version, CATALOG_VERSION_KEY
+from .checks import check_shared_cache
+
+#tables every circulation query must reach through an index
+CIRCULATION_TABLES = ('books_bookcopy', 'books_issuebook', 'books_bookhold', 'books_issuebookarchive')
+
+
+# ══════════════════════════ EXPLAIN helpers ══════════════════════════════════════════════════════
+class QueryRecorder:
+    '''
+    `connection.execute_wrapper` that keeps the SQL and parameters of every SELECT,
+    UPDATE and DELETE (the statements whose plans can scan a table).
+    '''
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def explain(sql, params):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute(f'EXPLAIN {sql}', params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def sequential_scans(plan):
+    '''
+    Circulation tables the plan reads in full.
+
+    SQLite reports a full scan as `SCAN <table>` without `USING ... INDEX`;
+    PostgreSQL as `Seq Scan on <table>`.
+    '''
+    scanned = []
+    for line in plan:
+        if connection.vendor == 'sqlite':
+            match = re.match(r'SCAN (\w+)', line.strip())
+            if match and 'USING' not in line:
+                scanned.append(match.group(1))
+        else:
+            match = re.search(r'Seq Scan on (\w+)', line)
+            if match:
+                scanned.append(match.group(1))
+    return [table for table in scanned if table in CIRCULATION_TABLES]
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Query plan regression tests ══════════════════════════════════════════════════════
+class CirculationQueryPlanTests(TestCase):
+    '''
+    Runs the circulation views against a seeded database, EXPLAINs every statement they
+    issue and fails when BookCopy or IssueBook is read with a sequential scan.
+
+    On PostgreSQL sequential scans are disabled for the session first, so the planner
+    only falls back to one when no index can serve the query (tiny test tables would
+    otherwise always be scanned).
+    '''
+    BOOKS = 40
+    COPIES_PER_BOOK = 5
+    READERS = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('plan-admin', 'plan-admin@example.com')
+        cls.readers = [User.objects.create_user(f'plan-reader-{i}') for i in range(cls.READERS)]
+        cls.books = [
+            BookStructure.objects.create(
+                title=f'Plan Book {i}',
+                author=f'Author {i % 7}',
+                price=10 + i,
+                publication_date=datetime.date(1950 + i, 1, 1),
+                subject='seeded for query plan tests',
+                genre=f'Genre {i % 5}',
+                edition=1,
+                publisher=f'Publisher {i % 3}',
+            )
+            for i in range(cls.BOOKS)
+        ]
+        copies = [
+            BookCopy.objects.create(book_instance=book, status='Available To issue')
+            for book in cls.books
+            for _ in range(cls.COPIES_PER_BOOK)
+        ]
+        today = datetime.date.today()
+        for i, copy in enumerate(copies[::2]):
+            reader = cls.readers[i % cls.READERS]
+            returned = i % 3 != 0
+            IssueBook.objects.create(
+                book=copy,
+                issue_date=today - datetime.timedelta(days=i % 30),
+                return_date=today - datetime.timedelta(days=i % 30 - 7),
+                returned_on=today if returned else None,
+                issued_by=reader.profile,
+            )
+            if not returned:
+                copy.status = 'Issued'
+                copy.save()
+
+    def setUp(self):
+        self.client = APIClient()
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+        elif connection.vendor != 'sqlite':
+            self.skipTest('query plans are only checked on SQLite and PostgreSQL')
+
+    def tearDown(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('RESET enable_seqscan')
+
+    def assertIndexedQueries(self, user, method, url, data=None):
+        self.client.force_authenticate(user=user)
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 500, response.content)
+
+        touched = [query for query in recorder.queries if any(table in query[0] for table in CIRCULATION_TABLES)]
+        self.assertTrue(touched, f'{url} did not query the circulation tables')
+        for sql, params in touched:
+            plan = explain(sql, params)
+            self.assertFalse(
+                sequential_scans(plan),
+                f'sequential scan in {method.upper()} {url}\n{sql}\n' + '\n'.join(plan),
+            )
+        return response
+
+    def test_book_details(self):
+        self.assertIndexedQueries(self.admin, 'get', reverse('books:book_details', args=[self.books[3].id]))
+
+    def test_display_all_books(self):
+        self.assertIndexedQueries(self.admin, 'get', reverse('books:display_all_books'))
+
+    def test_issue_book(self):
+        response = self.assertIndexedQueries(
+            self.readers[0], 'post', reverse('books:issue_book', args=[self.books[-1].id]),
+            {'issue_date': str(datetime.date.today()), 'return_date': str(datetime.date.today() + datetime.timedelta(days=7))},
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_checkout(self):
+        missing_id = self.books[-1].id + 1000
+        ids = [book.id for book in self.books[-4:]] + [self.books[-4].id, missing_id]
+        response = self.assertIndexedQueries(
+            self.readers[1], 'post', reverse('books:checkout_books'),
+            {
+                'book_structure_ids': ids,
+                'issue_date': str(datetime.date.today()),
+                'return_date': str(datetime.date.today() + datetime.timedelta(days=7)),
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        statuses = [result['status'] for result in response.json()['results']]
+        self.assertEqual(statuses, ['issued'] * 4 + ['not_found'])
+        self.assertFalse(BookStructure.objects.drifted_copy_counters().exists())
+
+    def test_return_book(self):
+        loan = IssueBook.objects.filter(returned_on__isnull=True).select_related('issued_by__user').first()
+        response = self.assertIndexedQueries(
+            loan.issued_by.user, 'post', reverse('books:return_book'), {'book_copy_id': loan.book_id},
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_batch_return(self):
+        open_copies = list(IssueBook.objects.filter(returned_on__isnull=True).values_list('book_id', flat=True)[:6])
+        shelved = BookCopy.objects.filter(status='Available To issue').values_list('pk', flat=True).first()
+        missing_id = BookCopy.objects.order_by('-pk').values_list('pk', flat=True).first() + 1000
+        response = self.assertIndexedQueries(
+            self.admin, 'post', reverse('books:return_books_batch'),
+            {'book_copy_ids': open_copies + [shelved, missing_id]},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['returned'], open_copies)
+        self.assertEqual(response.json()['no_active_loan'], [shelved])
+        self.assertEqual(response.json()['not_found'], [missing_id])
+        self.assertFalse(IssueBook.objects.filter(book_id__in=open_copies, returned_on__isnull=True).exists())
+        self.assertFalse(BookStructure.objects.drifted_copy_counters().exists())
+
+    def test_hold_queue(self):
+        book = self.books[9]
+        today = datetime.date.today()
+        for reader in self.readers[:self.COPIES_PER_BOOK]:
+            if not IssueBook.objects.filter(book__book_instance=book, returned_on__isnull=True, issued_by=reader.profile).exists():
+                IssuanceService().issue(reader, book.id, today, today + datetime.timedelta(days=7))
+        book.refresh_from_db()
+        self.assertEqual(book.available_count, 0)
+
+        waiting = [User.objects.create_user(f'plan-waiting-{i}', f'plan-waiting-{i}@example.com') for i in range(2)]
+        for position, reader in enumerate(waiting, start=1):
+            response = self.assertIndexedQueries(reader, 'post', reverse('books:place_hold', args=[book.id]))
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.json()['position'], position)
+
+        loan = IssueBook.objects.filter(book__book_instance=book, returned_on__isnull=True).select_related('issued_by__user').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertIndexedQueries(
+                loan.issued_by.user, 'post', reverse('books:return_book'), {'book_copy_id': loan.book_id},
+            )
+        hold = BookHold.objects.get(customer=waiting[0].profile, book=book)
+        self.assertEqual((hold.status, hold.copy_id), ('Ready', loan.book_id))
+        self.assertEqual(BookCopy.objects.get(pk=loan.book_id).status, 'On Hold')
+        self.assertEqual([message.to for message in mail.outbox], [[waiting[0].email]])
+        self.assertEqual(BookHold.objects.get(customer=waiting[1].profile, book=book).status, 'Waiting')
+
+        response = self.assertIndexedQueries(
+            waiting[0], 'post', reverse('books:issue_book', args=[book.id]),
+            {'issue_date': str(today), 'return_date': str(today + datetime.timedelta(days=7))},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(IssueBook.objects.filter(book_id=loan.book_id, issued_by=waiting[0].profile, returned_on__isnull=True).exists())
+        self.assertEqual(BookHold.objects.get(pk=hold.pk).status, 'Fulfilled')
+        self.assertFalse(BookStructure.objects.drifted_copy_counters().exists())
+
+    def test_delete_book_copy(self):
+        self.assertIndexedQueries(self.admin, 'delete', reverse('books:delete_book', args=[self.books[5].id]))
+
+    def test_user_issued_books(self):
+        self.assertIndexedQueries(self.admin, 'get', reverse('books:user_issued_books'))
+
+    def test_book_history(self):
+        url = reverse('books:book_history')
+        self.assertIndexedQueries(self.admin, 'get', url)
+        self.assertIndexedQueries(self.admin, 'get', url, {'book_structure_id': self.books[2].id})
+
+    def test_track_using_date(self):
+        url = reverse('books:track_date')
+        self.assertIndexedQueries(self.admin, 'get', url)
+        self.assertIndexedQueries(self.admin, 'get', url, {'date': str(datetime.date.today())})
+
+    def test_overdue_filters_match_overdue_set(self):
+        today = datetime.date.today()
+        OverdueLoan.objects.sweep(today)
+        returned = OverdueLoan.objects.select_related('loan').first().loan
+        IssueBook.objects.filter(pk=returned.pk).update(returned_on=today)
+        overdue = list(
+            IssueBook.objects.filter(overdue__isnull=False, returned_on__isnull=True).select_related('book__book_instance')
+        )
+        self.assertTrue(overdue)
+
+        response = self.assertIndexedQueries(self.admin, 'get', reverse('books:track_date'), {'page_size': 100})
+        tracked = {(loan['issued_copy'], loan['book_structure_id']) for loan in response.json()['results']['data']}
+        self.assertEqual(tracked, {(loan.book.copy_number, loan.book.book_instance_id) for loan in overdue})
+
+        issued_on = overdue[0].issue_date
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.post(
+            reverse('books:admin_search'),
+            {'title': 'Plan Book', 'number_of_days_issued': (today - issued_on).days, 'filter_over_8_days': True},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        matched = sorted((book['title'], book['issued_by']) for book in response.json()['matched_books'])
+        expected = sorted((loan.book.book_instance.title, loan.issued_by_id) for loan in overdue if loan.issue_date == issued_on)
+        self.assertEqual(matched, expected)
+
+    def test_archived_history(self):
+        today = datetime.date.today()
+        closed = IssueBook.objects.filter(returned_on__isnull=False).count()
+        open_loans = IssueBook.objects.filter(returned_on__isnull=True).count()
+        self.assertEqual(IssueBookArchive.objects.archive_closed(today + datetime.timedelta(days=1), batch_size=7), closed)
+        self.assertEqual(IssueBook.objects.count(), open_loans)
+        self.assertEqual(LoanHistory.objects.filter(is_archived=True).count(), closed)
+
+        url = reverse('books:book_history')
+        response = self.assertIndexedQueries(self.admin, 'get', url, {'page_size': 100})
+        self.assertEqual(len(response.json()['results']), closed + open_loans)
+        book = IssueBookArchive.objects.select_related('book').first().book.book_instance_id
+        response = self.assertIndexedQueries(self.admin, 'get', url, {'book_structure_id': book})
+        self.assertTrue(response.json()['results'])
+        self.assertIndexedQueries(self.admin, 'get', reverse('books:track_date'), {'date': str(today)})
+
+    def test_monthly_rollups(self):
+        rebuild_rollups()
+        today = datetime.date.today()
+        reader = self.readers[5]
+        IssuanceService().issue_many(reader, [book.id for book in self.books[20:23]], today, today + datetime.timedelta(days=7))
+        IssuanceService().issue(reader, self.books[24].id, today, today + datetime.timedelta(days=7))
+        loan = IssueBook.objects.filter(issued_by=reader.profile, returned_on__isnull=True).first()
+        ReturnService().return_copy(reader, loan.book_id)
+        ReturnService().return_many(IssueBook.objects.filter(returned_on__isnull=True).values_list('book_id', flat=True)[:3])
+
+        incremental = monthly_report()
+        incremental_reader = monthly_report(customer_id=reader.profile.pk)
+        self.assertEqual(sum(month['loans'] for month in incremental), IssueBook.objects.count())
+        rebuild_rollups()
+        self.assertEqual(monthly_report(), incremental)
+        self.assertEqual(monthly_report(customer_id=reader.profile.pk), incremental_reader)
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse('books:monthly_circulation_report'), {'book_structure_id': self.books[20].id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['months'][-1]['loans'], IssueBook.objects.filter(book__book_instance=self.books[20], issue_date__gte=today.replace(day=1)).count())
+
+    def test_circulation_cube(self):
+        for i, reader in enumerate(self.readers):
+            reader.profile.age = None if i == 0 else 10 + i * 6
+            reader.profile.save()
+        rebuild_rollups()
+        today = datetime.date.today()
+        reader = self.readers[7]
+        IssuanceService().issue_many(reader, [book.id for book in self.books[30:33]], today, today + datetime.timedelta(days=7))
+        ReturnService().return_many(IssueBook.objects.filter(returned_on__isnull=True).values_list('book_id', flat=True)[:4])
+
+        incremental = cube_report(group_by=['genre', 'age_band', 'month'])
+        rebuild_rollups()
+        self.assertEqual(cube_report(group_by=['genre', 'age_band', 'month']), incremental)
+        total = cube_report()[0]
+        self.assertEqual(total['loans'], IssueBook.objects.count())
+        self.assertEqual(total, {field: sum(cell[field] for cell in incremental) for field in total})
+        self.assertEqual(
+            {cell['age_band'] for cell in cube_report(group_by=['age_band'])},
+            {age_band(reader.profile.age) for reader in self.readers if reader.profile.issuebook_set.exists()},
+        )
+
+        self.client.force_authenticate(user=self.admin)
+        url = reverse('books:circulation_cube_report')
+        response = self.client.get(url, {'group_by': 'genre,year', 'age_band': age_band(reader.profile.age)})
+        self.assertEqual(response.status_code, 200)
+        cells = response.json()['cells']
+        self.assertEqual(set(cells[0]), {'genre', 'year', 'loans', 'days_out', 'overdue'})
+        self.assertEqual(
+            sum(cell['loans'] for cell in cells if cell['genre'] == self.books[30].genre),
+            IssueBook.objects.filter(book__book_instance__genre=self.books[30].genre, issued_by__age=reader.profile.age).count(),
+        )
+        self.assertEqual(self.client.get(url, {'group_by': 'year,month'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'group_by': 'publisher'}).status_code, 400)
+
+    def test_title_statistics(self):
+        today = datetime.date.today()
+        statistics = compute_title_statistics(days=30, today=today)
+        self.assertEqual(len(statistics), BookStructure.objects.count())
+        self.assertEqual([row['rank'] for row in statistics], sorted(row['rank'] for row in statistics))
+        book = self.books[3]
+        row = next(row for row in statistics if row['book_structure_id'] == book.id)
+        loans = list(LoanHistory.objects.filter(book__book_instance=book))
+        returned = [loan for loan in loans if loan.returned_on]
+        start = today - datetime.timedelta(days=29)
+        loan_days = sum(
+            max(0, ((loan.returned_on or today + datetime.timedelta(days=1)) - max(loan.issue_date, start)).days)
+            for loan in loans
+        )
+        copy_days = sum(
+            max(0, (today + datetime.timedelta(days=1) - max(copy.created_at.date(), start)).days)
+            for copy in BookCopy.objects.filter(book_instance=book)
+        )
+        self.assertEqual(row['total_loans'], len(loans))
+        self.assertAlmostEqual(row['utilization'], min(1, loan_days / copy_days), places=4)
+        if returned:
+            self.assertAlmostEqual(row['average_loan_days'], sum((loan.returned_on - loan.issue_date).days for loan in returned) / len(returned), places=2)
+        self.assertEqual(row['rank'], 1 + sum(other['total_loans'] > row['total_loans'] for other in statistics))
+
+        self.client.force_authenticate(user=self.admin)
+        url = reverse('books:title_circulation_statistics')
+        self.assertEqual(self.client.get(url, {'days': 30, 'limit': 5}).json()['titles'], statistics[:5])
+        with self.assertNumQueries(0):
+            title_statistics(days=30)
+        with self.captureOnCommitCallbacks(execute=True):
+            IssuanceService().issue(self.readers[6], book.id, today, today + datetime.timedelta(days=7))
+        response = self.client.get(url, {'days': 30, 'book_structure_id': book.id})
+        self.assertEqual(response.json()['titles'][0]['total_loans'], len(loans) + 1)
+
+        #book detail edits keep the cached statistics, copy additions replace them
+        with self.captureOnCommitCallbacks(execute=True):
+            book.subject = 'edited after the statistics were cached'
+            book.save()
+        with self.assertNumQueries(0):
+            title_statistics(days=30)
+        with self.captureOnCommitCallbacks(execute=True):
+            new_book = BookStructure.objects.create(
+                title='Plan Book new', author='Author 0', price=10, publication_date=today,
+                subject='added after the statistics were cached', genre='Genre 0', edition=1, publisher='Publisher 0',
+            )
+            add_copies(new_book.pk, 1)
+        response = self.client.get(url, {'days': 30, 'book_structure_id': new_book.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['titles'][0]['total_loans'], 0)
+
+    def test_title_statistics_skip_copies_of_titles_added_mid_read(self):
+        added = []
+
+        def add_title_before_copies_read(execute, sql, params, many, context):
+            if not added and sql.lstrip().startswith('SELECT') and 'books_bookcopy' in sql:
+                added.append(sql)
+                #a title and copy that commit between the books read and the copies read
+                late = BookStructure.objects.create(
+                    title='Plan Book late', author='Author 0', price=10, publication_date=datetime.date.today(),
+                    subject='added mid-read', genre='Genre 0', edition=1, publisher='Publisher 0',
+                )
+                BookCopy.objects.create(book_instance=late, status='Available To issue')
+            return execute(sql, params, many, context)
+
+        books = BookStructure.objects.count()
+        with connection.execute_wrapper(add_title_before_copies_read):
+            statistics = compute_title_statistics(days=30)
+        self.assertEqual(len(statistics), books)
+        self.assertEqual(
+            sum(row['total_loans'] for row in statistics),
+            LoanHistory.objects.exclude(book__book_instance__title='Plan Book late').count(),
+        )
+
+    def test_overdue_loans(self):
+        today = datetime.date.today()
+        overdue = set(IssueBook.objects.filter(returned_on__isnull=True, return_date__lt=today).values_list('pk', flat=True))
+        self.assertTrue(overdue)
+        self.assertEqual(OverdueLoan.objects.sweep(today), (len(overdue), 0))
+        self.assertEqual(OverdueLoan.objects.sweep(today), (0, 0))
+
+        returned = OverdueLoan.objects.select_related('loan').first().loan
+        IssueBook.objects.filter(pk=returned.pk).update(returned_on=today)
+        response = self.assertIndexedQueries(self.admin, 'get', reverse('books:overdue_loans'), {'page_size': 500})
+        self.assertEqual(response.status_code, 200)
+        listed = [loan['loan_id'] for loan in response.json()['overdue_loans']]
+        self.assertEqual(set(listed), overdue - {returned.pk})
+        self.assertTrue(all(loan['days_overdue'] > 0 for loan in response.json()['overdue_loans']))
+        self.assertEqual(OverdueLoan.objects.sweep(today), (0, 1))
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Catalog behaviour tests ══════════════════════════════════════════════════════
+class CatalogBehaviourTests(TestCase):
+    '''
+    What the catalog, copy and search helpers do, as opposed to how they query.
+    '''
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('catalog-admin', 'catalog-admin@example.com')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def make_book(self, title='Catalog Book', **fields):
+        values = dict(
+            author='Catalog Author',
+            price=10,
+            publication_date=datetime.date(1990, 1, 1),
+            subject='seeded for catalog tests',
+            genre='Catalog Genre',
+            edition=1,
+            publisher='Catalog Publisher',
+        )
+        values.update(fields)
+        return BookStructure.objects.create(title=title, **values)
+
+    def import_rows(self, rows):
+        lines = b''.join(json.dumps(row).encode() + b'\n' for row in rows)
+        return import_catalog(read_rows(io.BytesIO(lines), 'jsonl'))
+
+    def import_row(self, title='Catalog Book', **fields):
+        row = dict(
+            title=title,
+            author='Catalog Author',
+            price='10',
+            publication_date='1990-01-01',
+            subject='seeded for catalog tests',
+            genre='Catalog Genre',
+            edition='1',
+            publisher='Catalog Publisher',
+        )
+        row.update(fields)
+        return row
+
+    def test_full_text_search(self):
+        if search._backend() is None:
+            self.skipTest('no full-text index on this database')
+        for i in range(4):
+            self.make_book(f'Unrelated Title {i}')
+        in_subject = self.make_book('Quiet Harbour', subject='a voyage past the nebula')
+        in_title = self.make_book('Nebula Rising')
+        self.assertEqual([book_id for book_id, _ in search.search_books('nebula')], [in_title.pk, in_subject.pk])
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse('books:search_books'), {'q': 'Nebula'})
+        self.assertEqual([book['id'] for book in response.json()['results']], [in_title.pk, in_subject.pk])
+
+        in_title.title = 'Starlight Rising'
+        in_title.save()
+        self.assertEqual([book_id for book_id, _ in search.search_books('nebula')], [in_subject.pk])
+        self.assertEqual([book_id for book_id, _ in search.search_books('starlight')], [in_title.pk])
+        in_subject.delete()
+        self.assertEqual(search.search_books('nebula'), [])
+
+    def test_trigram_index_recall_and_threshold(self):
+        titles = ['Pride and Prejudice', 'Great Expectations', 'Moby Dick', 'The Great Gatsby', 'Expedition Notes', 'Dick Tracy']
+        books = {title: self.make_book(title, author=f'Writer {i}') for i, title in enumerate(titles)}
+        index = TrigramIndex()
+        self.assertEqual(index.search('Prejudise')[0]['id'], books['Pride and Prejudice'].pk)
+        self.assertEqual(index.search('grate expectatons')[0]['id'], books['Great Expectations'].pk)
+
+        documents = {book.pk: trigrams(book.title) | trigrams(book.author) for book in books.values()}
+        for query in ('Expectashuns', 'great dick', 'the gatsbey'):
+            query_grams = trigrams(query)
+            for threshold in (0.2, 0.4, 0.6, 0.9):
+                expected = {
+                    book_id for book_id, grams in documents.items()
+                    if len(query_grams & grams) / len(query_grams) >= threshold
+                }
+                results = index.search(query, limit=100, threshold=threshold)
+                self.assertEqual({row['id'] for row in results}, expected, (query, threshold))
+                self.assertTrue(all(row['similarity'] >= round(threshold, 4) for row in results))
+        self.assertEqual(index.search('Expectashuns', threshold=0.9), [])
+
+    def test_trigram_index_follows_saves_and_deletes(self):
+        trigram_index.load()
+        with self.captureOnCommitCallbacks(execute=True):
+            book = self.make_book('Wuthering Heights')
+            self.assertEqual(trigram_index.search('Wutherin Hieghts'), [])
+        self.addCleanup(trigram_index.remove, book.pk)
+        self.assertEqual(trigram_index.search('Wutherin Hieghts')[0]['id'], book.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            book.title = 'Jane Eyre'
+            book.save()
+        self.assertEqual(trigram_index.search('Jane Eire')[0]['id'], book.pk)
+        self.assertNotIn(book.pk, [row['id'] for row in trigram_index.search('Wuthering Heights')])
+
+        #a rolled back save never reaches the index
+        with self.assertRaises(DatabaseError), self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.make_book('Middlemarch')
+            raise DatabaseError('rolled back')
+        self.assertEqual(trigram_index.search('Middlemarch'), [])
+
+        #a write committed by another worker moves the catalog version and the index reloads
+        BookStructure.objects.filter(pk=book.pk).update(title='Villette')
+        bump_catalog_version()
+        self.assertEqual(trigram_index.search('Vilette')[0]['id'], book.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            book.delete()
+        self.assertEqual(trigram_index.search('Villette'), [])
+
+    def test_autocomplete(self):
+        catalog_autocomplete.load()
+        with self.captureOnCommitCallbacks(execute=True):
+            books = [
+                self.make_book('Harbour Lights', author='Harper Lee'),
+                self.make_book('The Hard Way', author='Ann Harlow'),
+                self.make_book('Harvest Moon', author='Ann Harlow'),
+                self.make_book('Ocean Deep'),
+            ]
+        for book in books:
+            self.addCleanup(catalog_autocomplete.remove, book.pk)
+
+        completions = catalog_autocomplete.complete('har')
+        self.assertEqual(completions['title'], ['Harbour Lights', 'The Hard Way', 'Harvest Moon'])
+        self.assertEqual(completions['author'], ['Ann Harlow', 'Harper Lee'])
+        self.assertEqual(completions['publisher'], [])
+        self.assertEqual(catalog_autocomplete.complete('HARD w', fields=('title',)), {'title': ['The Hard Way']})
+        self.assertEqual(catalog_autocomplete.complete('har', fields=('title',), limit=2), {'title': ['Harbour Lights', 'The Hard Way']})
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse('books:autocomplete_books'), {'q': 'Har', 'field': 'title', 'limit': 1})
+        self.assertEqual(response.json()['completions'], {'title': ['Harbour Lights']})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            books[0].title = 'Lantern Bay'
+            books[0].save()
+            self.assertEqual(catalog_autocomplete.complete('lant', fields=('title',))['title'], [])
+        self.assertEqual(catalog_autocomplete.complete('har', fields=('title',))['title'], ['The Hard Way', 'Harvest Moon'])
+        self.assertEqual(catalog_autocomplete.complete('lant', fields=('title',))['title'], ['Lantern Bay'])
+
+        #rolled back saves and imports never reach the index
+        with self.assertRaises(DatabaseError), self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.make_book('Hartwood Manor')
+            self.import_rows([self.import_row('Harrow Hill')])
+            raise DatabaseError('rolled back')
+        self.assertEqual(catalog_autocomplete.complete('har', fields=('title',))['title'], ['The Hard Way', 'Harvest Moon'])
+
+        #a write committed by another worker moves the catalog version and the index reloads
+        BookStructure.objects.filter(pk=books[3].pk).update(title='Harbour Deep')
+        bump_catalog_version()
+        self.assertEqual(
+            catalog_autocomplete.complete('har', fields=('title',))['title'], ['Harbour Deep', 'The Hard Way', 'Harvest Moon'],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            books[1].delete()
+            books[2].delete()
+            books[3].delete()
+        self.assertEqual(catalog_autocomplete.complete('har'), {'title': [], 'author': ['Harper Lee'], 'publisher': []})
+
+    def facet_count(self, facet, value):
+        return FacetCount.objects.filter(facet=facet, value=value).values_list('count', flat=True).first() or 0
+
+    def test_facet_counts_follow_catalog_and_circulation(self):
+        baseline = {value: self.facet_count('availability', value) for value in ('available', 'unavailable')}
+
+        def availability():
+            return {value: self.facet_count('availability', value) - baseline[value] for value in baseline}
+
+        book = self.make_book(genre='Facet Genre', price=30, publication_date=datetime.date(1984, 6, 1))
+        other = self.make_book('Facet Twin', genre='Facet Genre', price=5)
+        self.assertEqual(self.facet_count('genre', 'Facet Genre'), 2)
+        self.assertEqual((self.facet_count('price_band', '25-50'), self.facet_count('decade', '1980')), (1, 1))
+        self.assertEqual(availability(), {'available': 0, 'unavailable': 2})
+
+        copy = BookCopy.objects.create(book_instance=book, status='Available To issue')
+        self.assertEqual(availability(), {'available': 1, 'unavailable': 1})
+        reader = User.objects.create_user('catalog-facet-reader')
+        today = datetime.date.today()
+        self.client.force_authenticate(user=reader)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('books:issue_book', args=[book.pk]),
+                {'issue_date': str(today), 'return_date': str(today + datetime.timedelta(days=7))},
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(availability(), {'available': 0, 'unavailable': 2})
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('books:return_book'), {'book_copy_id': copy.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(availability(), {'available': 1, 'unavailable': 1})
+        self.assertCountEqual(
+            facet_counts({'genre': 'Facet Genre'})['availability'],
+            [{'value': 'available', 'count': 1}, {'value': 'unavailable', 'count': 1}],
+        )
+
+        book.genre = 'Facet Other'
+        book.save()
+        self.assertEqual((self.facet_count('genre', 'Facet Genre'), self.facet_count('genre', 'Facet Other')), (1, 1))
+        book.delete()
+        other.delete()
+        self.assertEqual((self.facet_count('genre', 'Facet Genre'), self.facet_count('genre', 'Facet Other')), (0, 0))
+        self.assertEqual(availability(), {'available': 0, 'unavailable': 0})
+        self.assertFalse(BookFacet.objects.filter(book_id__in=[book.pk, other.pk]).exists())
+
+    def test_import_validates_and_deduplicates(self):
+        existing = self.make_book('Imported Existing')
+        for _ in range(2):
+            BookCopy.objects.create(book_instance=existing, status='Available To issue')
+        report = self.import_rows([
+            self.import_row('Imported New', copies=2),
+            self.import_row('Imported New', copies=3),
+            self.import_row('Imported Existing', copies=4),
+            self.import_row('Imported Bad Price', price='cheap'),
+            {'title': 'Imported Missing Fields'},
+            self.import_row('Imported Empty', copies=0),
+        ])
+        self.assertEqual(
+            {key: report[key] for key in ('rows', 'created_books', 'added_copies', 'duplicates', 'error_count')},
+            {'rows': 6, 'created_books': 2, 'added_copies': 9, 'duplicates': 2, 'error_count': 2},
+        )
+        self.assertEqual([error['line'] for error in report['errors']], [4, 5])
+        self.assertIn('price', report['errors'][0]['errors'])
+        self.assertFalse(BookStructure.objects.filter(title__in=['Imported Bad Price', 'Imported Missing Fields']).exists())
+
+        new = BookStructure.objects.get(title='Imported New')
+        self.assertEqual(list(new.bookcopy_set.order_by('copy_number').values_list('copy_number', flat=True)), [1, 2, 3, 4, 5])
+        self.assertEqual(
+            list(existing.bookcopy_set.order_by('copy_number').values_list('copy_number', flat=True)), [1, 2, 3, 4, 5, 6],
+        )
+        self.assertEqual(BookStructure.objects.get(title='Imported Empty').total_copies, 0)
+
+        counts = BookStructure.objects.with_copy_counts().filter(title__startswith='Imported').values_list('title', 'available_copies', 'total_copies')
+        self.assertEqual(sorted(counts), [('Imported Empty', 0, 0), ('Imported Existing', 6, 6), ('Imported New', 5, 5)])
+        self.assertFalse(BookStructure.objects.drifted_copy_counters().exists())
+
+    def test_import_csv_reports_unreadable_rows(self):
+        lines = (
+            'title,author,price,publication_date,subject,genre,edition,publisher,copies\n'
+            'Imported Csv,Csv Author,12,2001-02-03,csv row,Csv Genre,1,Csv Press,2\n'
+            'Imported Csv Bad Date,Csv Author,12,someday,csv row,Csv Genre,1,Csv Press,\n'
+        ).encode()
+        report = import_catalog(read_rows(io.BytesIO(lines), 'csv'))
+        self.assertEqual((report['created_books'], report['added_copies'], report['error_count']), (1, 2, 1))
+        self.assertEqual(report['errors'][0]['line'], 3)
+        self.assertIn('publication_date', report['errors'][0]['errors'])
+
+    def test_copy_number_reservation(self):
+        book, other = self.make_book('Numbered One'), self.make_book('Numbered Two')
+        add_copies(book.pk, 3)
+        BookCopy.objects.create(book_instance=book, status='Available To issue')
+        add_copies(book.pk, 2)
+        self.import_rows([self.import_row('Numbered One', copies=4)])
+        numbers = list(book.bookcopy_set.order_by('pk').values_list('copy_number', flat=True))
+        self.assertEqual(numbers, list(range(1, 11)))
+
+        self.assertEqual(reserve_copy_numbers({book.pk: 5, other.pk: 2}), {book.pk: 11, other.pk: 1})
+        self.assertEqual(reserve_copy_numbers({other.pk: 1}), {other.pk: 3})
+
+        #books whose copies predate their sequence row continue after the highest number
+        BookCopySequence.objects.filter(book=other).delete()
+        BookCopy.objects.bulk_create([BookCopy(book_instance=other, copy_number=7, status='Lost')])
+        self.assertEqual(reserve_copy_numbers({other.pk: 2}), {other.pk: 8})
+
+    def test_add_copies_endpoint(self):
+        book = self.make_book()
+        self.client.force_authenticate(user=self.admin)
+        url = reverse('books:add_book_copies', args=[book.pk])
+        response = self.client.post(url, {'quantity': 3}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['copy_numbers'], [1, 2, 3])
+
+        reader, waiting = (User.objects.create_user(f'catalog-restock-{i}') for i in range(2))
+        today = datetime.date.today()
+        IssuanceService().issue(reader, book.pk, today, today + datetime.timedelta(days=7))
+        BookCopy.objects.filter(book_instance=book, status='Available To issue').update(status='Damaged')
+        BookStructure.objects.reconcile_copy_counters()
+        hold = HoldService().place(waiting, book.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'quantity': 2}, format='json')
+        self.assertEqual(response.json()['copy_numbers'], [4, 5])
+        hold.refresh_from_db()
+        self.assertEqual((hold.status, BookCopy.objects.get(pk=hold.copy_id).copy_number), ('Ready', 4))
+        book.refresh_from_db()
+        self.assertEqual((book.available_count, book.issued_count, book.total_copies), (1, 1, 5))
+        self.assertTrue(BookFacet.objects.get(book=book).is_available)
+        self.assertFalse(BookStructure.objects.drifted_copy_counters().exists())
+
+        self.assertEqual(self.client.post(url, {'quantity': 0}, format='json').status_code, 400)
+        missing = reverse('books:add_book_copies', args=[book.pk + 1000])
+        self.assertEqual(self.client.post(missing, {'quantity': 1}, format='json').status_code, 404)
+
+    def test_stale_book_save_keeps_counters(self):
+        book = self.make_book()
+        stale = BookStructure.objects.get(pk=book.pk)
+        add_copies(book.pk, 3)
+        stale.price = 2
+        stale.save()
+        book.refresh_from_db()
+        self.assertEqual((book.price, book.available_count, book.total_copies), (2, 3, 3))
+        stale.save(update_fields=['available_count', 'title'])
+        book.refresh_from_db()
+        self.assertEqual((book.available_count, book.total_copies), (3, 3))
+        self.assertFalse(BookStructure.objects.drifted_copy_counters().exists())
+
+    def test_reconcile_counts_loans_made_after_the_drift_scan(self):
+        book = self.make_book()
+        copy = add_copies(book.pk, 3)[0]
+        BookStructure.objects.filter(pk=book.pk).update(available_count=0)
+        statements = []
+
+        def issue_after_scan(execute, sql, params, many, context):
+            statements.append(sql)
+            if len(statements) == 2:
+                #an issue that commits between the drift scan and the counter write
+                BookCopy.objects.filter(pk=copy.pk).update(status='Issued')
+                BookStructure.objects.apply_copy_change(book.pk, 'Available To issue', 'Issued')
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(issue_after_scan):
+            self.assertEqual(BookStructure.objects.reconcile_copy_counters(), [book.pk])
+        book.refresh_from_db()
+        self.assertEqual((book.available_count, book.issued_count, book.total_copies), (2, 1, 3))
+        self.assertFalse(BookStructure.objects.drifted_copy_counters().exists())
+
+    def test_cancelled_hold_refreshes_availability(self):
+        book = self.make_book()
+        add_copies(book.pk, 1)
+        reader, waiting = (User.objects.create_user(f'catalog-hold-{i}') for i in range(2))
+        today = datetime.date.today()
+        copy_id = IssuanceService().issue(reader, book.pk, today, today + datetime.timedelta(days=7)).book_id
+        HoldService().place(waiting, book.pk)
+        ReturnService().return_copy(reader, copy_id)
+        self.assertFalse(BookFacet.objects.get(book=book).is_available)
+
+        version = get_copies_version(book.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            HoldService().cancel(waiting, book.pk)
+        self.assertTrue(BookFacet.objects.get(book=book).is_available)
+        self.assertGreater(get_copies_version(book.pk), version)
+
+    def test_deleted_held_copy_requeues_hold(self):
+        book = self.make_book()
+        add_copies(book.pk, 1)
+        reader, waiting = (User.objects.create_user(f'catalog-delete-hold-{i}') for i in range(2))
+        today = datetime.date.today()
+        copy_id = IssuanceService().issue(reader, book.pk, today, today + datetime.timedelta(days=7)).book_id
+        hold = HoldService().place(waiting, book.pk)
+        ReturnService().return_copy(reader, copy_id)
+        hold.refresh_from_db()
+        self.assertEqual((hold.status, hold.copy_id), ('Ready', copy_id))
+
+        BookCopy.objects.get(pk=copy_id).delete()
+        hold.refresh_from_db()
+        self.assertEqual((hold.status, hold.copy_id), ('Waiting', None))
+        add_copies(book.pk, 1)
+        hold.refresh_from_db()
+        self.assertEqual(hold.status, 'Ready')
+        loan = IssuanceService().issue(waiting, book.pk, today, today + datetime.timedelta(days=7))
+        self.assertEqual(loan.book_id, hold.copy_id)
+        self.assertFalse(BookStructure.objects.drifted_copy_counters().exists())
+
+    def test_holds_only_take_copies_still_on_the_shelf(self):
+        book = self.make_book()
+        add_copies(book.pk, 1)
+        reader, waiting = (User.objects.create_user(f'catalog-stale-copy-{i}') for i in range(2))
+        today = datetime.date.today()
+        IssuanceService().issue(reader, book.pk, today, today + datetime.timedelta(days=7))
+        hold = HoldService().place(waiting, book.pk)
+
+        #a copy offered as available after it changed status is not handed out
+        damaged = add_copies(book.pk, 1, status='Damaged')[0]
+        self.assertEqual(HoldService().assign_copies({damaged.pk: book.pk}), {})
+        hold.refresh_from_db()
+        self.assertEqual((hold.status, hold.copy_id), ('Waiting', None))
+        self.assertEqual(BookCopy.objects.get(pk=damaged.pk).status, 'Damaged')
+        self.assertFalse(BookStructure.objects.drifted_copy_counters().exists())
+
+        shelved = add_copies(book.pk, 1)[0]
+        hold.refresh_from_db()
+        self.assertEqual((hold.status, hold.copy_id), ('Ready', shelved.pk))
+        self.assertFalse(BookStructure.objects.drifted_copy_counters().exists())
+
+    def test_malformed_cursors_are_rejected(self):
+        def cursor(position):
+            return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+        for _ in range(3):
+            self.make_book()
+        self.client.force_authenticate(user=self.admin)
+        catalog = reverse('books:display_all_books')
+        history = reverse('books:book_history')
+        first = self.client.get(catalog, {'page_size': 2}).json()
+        self.assertEqual(self.client.get(first['next']).status_code, 200)
+        self.assertEqual(self.client.get(history, {'cursor': cursor(['2025-01-01', 5])}).status_code, 200)
+        for url, position in (
+            (catalog, [{'a': 1}]),
+            (catalog, ['x']),
+            (catalog, [None]),
+            (catalog, [1, 2]),
+            (catalog, {'id': 1}),
+            (history, [5, 5]),
+            (history, ['2025-13-45', 5]),
+            (history, ['2025-01-01', [5]]),
+        ):
+            response = self.client.get(url, {'cursor': cursor(position)})
+            self.assertEqual(response.status_code, 400, position)
+        self.assertEqual(self.client.get(catalog, {'cursor': 'not base64!'}).status_code, 400)
+
+    def test_history_keeps_archived_loans_of_deleted_copies(self):
+        book = self.make_book()
+        copy_id, kept_id = (copy.pk for copy in add_copies(book.pk, 2))
+        reader = User.objects.create_user('catalog-archive-reader')
+        today = datetime.date.today()
+        for copy in (copy_id, kept_id):
+            IssueBook.objects.create(
+                book_id=copy, issue_date=today, return_date=today, returned_on=today, issued_by=reader.profile,
+            )
+        IssueBookArchive.objects.archive_closed(today + datetime.timedelta(days=1))
+        BookCopy.objects.get(pk=copy_id).delete()
+
+        self.client.force_authenticate(user=reader)
+        response = self.client.get(reverse('user_orders'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(response.json()['issued_books'], key=lambda loan: loan['book_structure_id'] is None),
+            [
+                {'title': book.title, 'book_structure_id': book.pk, 'issue_date': str(today), 'return_date': str(today)},
+                {'title': None, 'book_structure_id': None, 'issue_date': str(today), 'return_date': str(today)},
+            ],
+        )
+
+        self.client.force_authenticate(user=self.admin)
+        for url, params in ((reverse('books:book_history'), {}), (reverse('books:track_date'), {'date': str(today)})):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            results = response.json()['results']
+            rows = results['data'] if isinstance(results, dict) else results
+            self.assertEqual(
+                sorted(row['issued_copy'] is None for row in rows if row['issued_by'] == reader.profile.pk),
+                [False, True],
+            )
+
+    def test_rollups_keep_the_cell_a_loan_was_issued_in(self):
+        book = self.make_book(genre='Catalog Mystery')
+        add_copies(book.pk, 2)
+        readers = [User.objects.create_user(f'catalog-rollup-reader-{i}') for i in range(2)]
+        for reader in readers:
+            reader.profile.age = 16
+            reader.profile.save()
+        today = datetime.date.today()
+        issued = today - datetime.timedelta(days=10)
+        first = IssuanceService().issue(readers[0], book.pk, issued, issued + datetime.timedelta(days=7))
+        second = IssuanceService().issue_many(readers[1], [book.pk], issued, issued + datetime.timedelta(days=7))[0]
+
+        #genre and age band move between the issue and the return
+        BookStructure.objects.filter(pk=book.pk).update(genre='Catalog Thriller')
+        for reader in readers:
+            reader.profile.age = 30
+            reader.profile.save()
+        ReturnService().return_copy(readers[0], first.book_id)
+        ReturnService().return_many([second['book_copy_id']])
+        cell = {'genre': 'Catalog Mystery', 'age_band': '13-17', 'loans': 2, 'days_out': 20, 'overdue': 2}
+        self.assertEqual(cube_report(group_by=['genre', 'age_band']), [cell])
+
+        #a rebuild counts archived loans of deleted copies like the incremental path did
+        IssueBookArchive.objects.archive_closed(today + datetime.timedelta(days=1))
+        BookCopy.objects.get(pk=first.book_id).delete()
+        reports = [monthly_report(book_id=book.pk), *(monthly_report(customer_id=reader.profile.pk) for reader in readers)]
+        self.assertEqual(rebuild_rollups(), (1, 2, 1))
+        self.assertEqual(cube_report(group_by=['genre', 'age_band']), [cell])
+        self.assertEqual(
+            [monthly_report(book_id=book.pk), *(monthly_report(customer_id=reader.profile.pk) for reader in readers)],
+            reports,
+        )
+        self.assertEqual(reports[0][0]['loans'], 2)
+
+    def test_issuing_runs_a_fixed_number_of_statements(self):
+        if not connection.features.supports_update_conflicts_with_target:
+            self.skipTest('the rollups are updated row by row without INSERT ... ON CONFLICT')
+        books = [self.make_book(f'Catalog Budget {i}', genre=f'Catalog Genre {i}') for i in range(4)]
+        for book in books:
+            add_copies(book.pk, 2)
+        reader, other = (User.objects.create_user(f'catalog-budget-reader-{i}') for i in range(2))
+        today = datetime.date.today()
+        #the docstring budgets, plus the savepoint pair of the test transaction
+        with self.assertNumQueries(7 + 2):
+            IssuanceService().issue(reader, books[0].pk, today, today + datetime.timedelta(days=7))
+        with self.assertNumQueries(10 + 2):
+            IssuanceService().issue_many(other, [book.pk for book in books], today, today + datetime.timedelta(days=7))
+        self.assertEqual(cube_report()[0]['loans'], 5)
+
+    def test_version_stamps_only_move_forward(self):
+        stamps = [get_catalog_version()]
+        for _ in range(3):
+            bump_catalog_version()
+            stamps.append(get_catalog_version())
+        self.assertEqual(stamps, sorted(set(stamps)))
+        cache.set(CATALOG_VERSION_KEY, time.time_ns() + 10 ** 12, timeout=None)
+        ahead = get_catalog_version()
+        bump_catalog_version()
+        self.assertEqual(get_catalog_version(), ahead + 1)
+        cache.delete(CATALOG_VERSION_KEY)
+        bump_catalog_version()
+        self.assertIsNotNone(cache.get(CATALOG_VERSION_KEY))
+
+    def test_deploy_check_requires_shared_cache(self):
+        with self.settings(DEBUG=False):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['books.E001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1'}}
+        with self.settings(DEBUG=False, CACHES=shared):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_book_detail_etag_follows_database_state(self):
+        book = self.make_book()
+        copy = add_copies(book.pk, 2)[0]
+        self.client.force_authenticate(user=self.admin)
+        url = reverse('books:book_details', args=[book.pk])
+        first = self.client.get(url)
+        etag = first['ETag']
+        cache.clear()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        BookCopy.objects.filter(pk=copy.pk).update(status='Lost')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn({'copy_number': copy.copy_number, 'status': 'Lost', 'id': copy.pk}, response.json()['all_copies'])
+
+    def test_import_restock_serves_holds(self):
+        book = self.make_book()
+        add_copies(book.pk, 1)
+        reader, waiting = (User.objects.create_user(f'catalog-import-hold-{i}') for i in range(2))
+        today = datetime.date.today()
+        IssuanceService().issue(reader, book.pk, today, today + datetime.timedelta(days=7))
+        hold = HoldService().place(waiting, book.pk)
+
+        report = self.import_rows([self.import_row(copies=2)])
+        self.assertEqual((report['created_books'], report['added_copies']), (0, 2))
+        hold.refresh_from_db()
+        self.assertEqual(hold.status, 'Ready')
+        self.assertEqual(BookCopy.objects.get(pk=hold.copy_id).status, 'On Hold')
+        book.refresh_from_db()
+        self.assertEqual((book.available_count, book.total_copies), (1, 3))
+        self.assertFalse(BookStructure.objects.drifted_copy_counters().exists())
+# ════════════════════════════════════════════════════════════════════════════════
+
+
+# ══════════════════════════ Issuance stress test ══════════════════════════════════════════════════════
+class IssuanceStressTests(TransactionTestCase):
+    '''
+    Many threads issue the same popular title at once, each through its own database
+    connection. Every successful loan must get a distinct copy, exactly as many loans as
+    there are copies must succeed, and the book's counters must match its copies.
+    Holds placed while a copy is being returned must not be skipped by the return.
+    '''
+    #listing the apps makes the teardown flush cascade, which PostgreSQL needs to empty
+    #the raw search table of migration 0014 (it references books_bookstructure)
+    available_apps = [
+        'django.contrib.auth',
+        'django.contrib.contenttypes',
+        'books',
+        'user_app',
+    ]
+    THREADS = 16
+    COPIES = 10
+    LOCK_RETRIES = 500
+
+    def setUp(self):
+        self.book = BookStructure.objects.create(
+            title='First Day Of Term',
+            author='Rush',
+            price=20,
+            publication_date=datetime.date(2020, 1, 1),
+            subject='popular title for the issuance stress test',
+            genre='Textbook',
+            edition=1,
+            publisher='Campus',
+        )
+        for _ in range(self.COPIES):
+            BookCopy.objects.create(book_instance=self.book, status='Available To issue')
+        self.readers = [User.objects.create_user(f'stress-reader-{i}') for i in range(self.THREADS)]
+
+    def _issue(self, reader, barrier, results):
+        today = datetime.date.today()
+        try:
+            barrier.wait()
+            for _ in range(self.LOCK_RETRIES):
+                try:
+                    loan = IssuanceService().issue(reader, self.book.id, today, today + datetime.timedelta(days=7))
+                    results.append(('issued', loan.book_id))
+                    return
+                except OperationalError:
+                    #SQLite's shared in-memory test database reports a busy writer as locked
+                    #right away instead of waiting for it: back off and retry like a client would
+                    time.sleep(random.uniform(0.001, 0.01))
+            results.append(('locked', None))
+        except NoCopyAvailable:
+            results.append(('unavailable', None))
+        except Exception as e:
+            results.append(('error', repr(e)))
+        finally:
+            connections.close_all()
+
+    def test_parallel_issues_get_distinct_copies(self):
+        barrier = threading.Barrier(self.THREADS)
+        results = []
+        threads = [
+            threading.Thread(target=self._issue, args=(reader, barrier, results))
+            for reader in self.readers
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        issued = [copy_id for outcome, copy_id in results if outcome == 'issued']
+        self.assertEqual([r for r in results if r[0] in ('error', 'locked')], [])
+        self.assertEqual(len(issued), self.COPIES)
+        self.assertEqual(len(set(issued)), self.COPIES)
+        self.assertEqual(results.count(('unavailable', None)), self.THREADS - self.COPIES)
+
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_count, 0)
+        self.assertEqual(self.book.issued_count, self.COPIES)
+        self.assertEqual(IssueBook.objects.filter(book__book_instance=self.book).count(), self.COPIES)
+        self.assertFalse(BookStructure.objects.drifted_copy_counters().exists())
+
+    def test_hold_placed_during_a_return_is_served(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('needs row locks held across connections')
+        today = datetime.date.today()
+        loans = [
+            IssuanceService().issue(reader, self.book.id, today, today + datetime.timedelta(days=7))
+            for reader in self.readers[:self.COPIES]
+        ]
+        checked, release = threading.Event(), threading.Event()
+        outcome = {}
+
+        def pause_after_check(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            if 'available_count' in sql and not checked.is_set():
+                checked.set()
+                release.wait(5)
+            return result
+
+        def place():
+            try:
+                with connection.execute_wrapper(pause_after_check):
+                    outcome['hold'] = HoldService().place(self.readers[self.COPIES], self.book.id)
+            except Exception as e:
+                outcome['hold'] = e
+            finally:
+                connections.close_all()
+
+        def give_back():
+            checked.wait(5)
+            try:
+                ReturnService().return_copy(self.readers[0], loans[0].book_id)
+            except Exception as e:
+                outcome['return'] = e
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=place), threading.Thread(target=give_back)]
+        for thread in threads:
+            thread.start()
+        #the return runs while the hold sits between its availability check and its insert
+        time.sleep(0.5)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertNotIn('return', outcome)
+        hold = BookHold.objects.get(pk=outcome['hold'].pk)
+        self.assertEqual((hold.status, hold.copy_id), ('Ready', loans[0].book_id))
+        self.assertEqual(BookCopy.objects.get(pk=loans[0].book_id).status, 'On Hold')
+        self.assertFalse(BookStructure.objects.drifted_copy_counters().exists())
+# ════════════════════════════════════════════════════════════════════════════════
@@ -1,16 +1,30 @@
 from django.urls import path
 from .views import (
     create_books,
+    import_books,
+    add_book_copies,
     display_all_books,
+    browse_books,
+    search_catalog,
+    fuzzy_book_lookup,
+    autocomplete_books,
     get_book_details,
     update_book,
     delete_book,
     issue_book,
+    checkout_books,
+    place_hold,
+    cancel_hold,
     return_book,
+    return_books_batch,
     show_admin_issued_books,
     admin_issue_book_search,
     track_book_history,
     track_using_date,
+    overdue_loans,
+    monthly_circulation_report,
+    title_circulation_statistics,
+    circulation_cube_report,
 )
 
 app_name = 'books'
@@ -19,14 +33,24 @@ urlpatterns = [
 
     # 📚 Book Management
     path('api/create/', create_books, name='create_books'),
+    path('api/copies/<int:book_structure_id>/', add_book_copies, name='add_book_copies'),
+    path('api/import/', import_books, name='import_books'),
     path('api/display/', display_all_books, name='display_all_books'),
+    path('api/browse/', browse_books, name='browse_books'),
+    path('api/search/', search_catalog, name='search_books'),
+    path('api/fuzzy/', fuzzy_book_lookup, name='fuzzy_books'),
+    path('api/autocomplete/', autocomplete_books, name='autocomplete_books'),
     path('api/details/<int:book_structure_id>/', get_book_details, name='book_details'),
     path('api/update/<int:book_structure_id>/', update_book, name='update_book'),
     path('api/delete/<int:book_structure_id>/', delete_book, name='delete_book'),
 
     # 📦 Issue & Return Operations
     path('api/issue/<int:book_structure_id>/', issue_book, name='issue_book'),
+    path('api/checkout/', checkout_books, name='checkout_books'),
+    path('api/hold/<int:book_structure_id>/', place_hold, name='place_hold'),
+    path('api/hold/<int:book_structure_id>/cancel/', cancel_hold, name='cancel_hold'),
     path('api/return/', return_book, name='return_book'),
+    path('api/return/batch/', return_books_batch, name='return_books_batch'),
 
     # 👤 User Operations
     path('api/admin_issued_books/', show_admin_issued_books, name='user_issued_books'),
@@ -37,4 +61,8 @@ urlpatterns = [
     # 📈 Tracking & History
     path('api/book_history/', track_book_history, name='book_history'),
     path('api/track_date/', track_using_date, name='track_date'),
+    path('api/overdue/', overdue_loans, name='overdue_loans'),
+    path('api/reports/monthly/', monthly_circulation_report, name='monthly_circulation_report'),
+    path('api/reports/cube/', circulation_cube_report, name='circulation_cube_report'),
+    path('api/analytics/titles/', title_circulation_statistics, name='title_circulation_statistics'),
 ]
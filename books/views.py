@@ -3,21 +3,35 @@ import datetime
 import logging
 from django.shortcuts import get_object_or_404
 from django.http import Http404
+from django.db import transaction
 
 # 🌐 DRF imports
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
 
 # 📘 Swagger / OpenAPI (drf-yasg)
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 # 🗂️ Local imports
-from .models import BookStructure, BookCopy , IssueBook
+from .models import BookStructure, BookCopy , IssueBook, OverdueLoan, LoanHistory
 from .serializer import *
-from .signals import duplicate_book_signal, issue_book_signal, return_book_signal
+from .signals import duplicate_book_signal, return_book_signal
+from .streaming import stream_catalog, CATALOG_STREAM_FORMATS
+from .pagination import CatalogPagination, IssueHistoryPagination, OverduePagination, InvalidCursor
+from .search import search_books
+from .fuzzy import fuzzy_search
+from .autocomplete import catalog_autocomplete, AUTOCOMPLETE_FIELDS
+from .facets import facet_counts
+from .importer import read_rows, import_catalog
+from .inventory import add_copies
+from .circulation import IssuanceService, IssuanceError, ReturnService
+from .holds import HoldService, HoldError
+from .rollups import monthly_report, cube_report, CUBE_DIMENSIONS, AGE_BAND_CHOICES
+from .analytics import title_statistics
+from .cache import cache_catalog_response, conditional_catalog_response, catalog_list_state, book_detail_state
 from sub_admins.permissions import *
 
 
@@ -48,22 +62,32 @@ def create_books(request):
     This endpoint accepts a POST request with book details in the request body.
     If a book with the same title, author, and edition already exists, a duplicate book signal is triggered instead of creating a new entry.
 
+    An optional `quantity` adds that many copies in one batch: to the existing book for
+    duplicates (one copy when omitted), or to the newly created book (none when omitted).
+
     No query parameters are required. Input is expected as JSON in the request body.
     Returns a success message if the book is created or a duplicate is detected.
     """
     try:
         serializer = BookStructureSerializer(data=request.data)
+        quantity_serializer = CopyQuantitySerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=400)
+        if not quantity_serializer.is_valid():
+            return Response(quantity_serializer.errors, status=400)
+        quantity = quantity_serializer.validated_data.get('quantity')
         existing_book = BookStructure.objects.filter(
             title=serializer.validated_data['title'],
             author=serializer.validated_data['author'],
             edition=serializer.validated_data['edition'],
         ).first()
         if existing_book:
-            duplicate_book_signal.send(sender=existing_book.__class__, book=existing_book)
+            duplicate_book_signal.send(sender=existing_book.__class__, book=existing_book, quantity=quantity)
             return Response({'message' : 'duplicate book detected and added'} , status=201)
-        serializer.save()
+        with transaction.atomic():
+            book = serializer.save()
+            if quantity:
+                add_copies(book.pk, quantity)
         return Response({'message' : 'book created successfully'} , status=201)
     except Exception as e:
         logger.exception('unhandled exception in create_book_view')
@@ -75,11 +99,168 @@ def create_books(request):
         )
 #----------------------------------------------
 
+#-------------Add Copies---------------------------------
+@swagger_auto_schema(
+    method='post',
+    request_body=CopyQuantitySerializer,
+    responses={
+        201: openapi.Response('Copies added successfully'),
+        400: openapi.Response('Invalid quantity'),
+        404: openapi.Response('Book Not Found'),
+        500 : openapi.Response('Internal Server Error')
+    },
+    operation_description="API to add several copies of an existing book at once",
+    tags=["📚 Book Management"]
+)
+@api_view(['POST'])
+@permission_classes([IsAdminOrSubAdminUpdateBook])
+def add_book_copies(request, book_structure_id):
+    """
+    Adds `quantity` (default 1) new copies, 'Available To issue', to an existing book.
+
+    The block of copy numbers is reserved with one UPDATE of the book's BookCopySequence
+    row (`RETURNING` the new value where supported) and the copies are inserted with one
+    `bulk_create`, so the cost does not grow with the quantity.
+
+    Parameters:
+    - `book_structure_id`: ID of the BookStructure.
+
+    Returns:
+    - 201 Created with the copy numbers that were assigned.
+    - 400 Bad Request if the quantity is invalid.
+    - 404 Not Found if the book does not exist.
+    - 500 Internal Server Error for unexpected failures.
+    """
+    try:
+        quantity_serializer = CopyQuantitySerializer(data=request.data)
+        if not quantity_serializer.is_valid():
+            return Response(quantity_serializer.errors, status=400)
+        book = get_object_or_404(BookStructure.objects.only('id'), id=book_structure_id)
+        copies = add_copies(book.id, quantity_serializer.validated_data.get('quantity', 1))
+        return Response(
+            {
+                'message' : f'{len(copies)} copies added successfully',
+                'copy_numbers' : [copy.copy_number for copy in copies],
+            },
+            status=201
+        )
+    except Http404:
+        return Response({'message': 'No book found'}, status=404)
+    except Exception as e:
+        logger.exception('unhandled exception in add_book_copies view')
+        return Response(
+            {
+                'message' : 'Error while adding book copies',
+            },
+            status=500
+        )
+#----------------------------------------------
+
+#-------------Bulk Import---------------------------------
+#content types / file extensions used when `import_format` is not given
+IMPORT_CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'jsonl',
+    'application/jsonl': 'jsonl',
+    'application/x-jsonlines': 'jsonl',
+}
+IMPORT_EXTENSIONS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+
+@swagger_auto_schema(
+    method='post',
+    request_body=None,
+    manual_parameters=[
+        openapi.Parameter(
+            'import_format',
+            openapi.IN_QUERY,
+            description='"csv" or "jsonl"; guessed from the content type or file name when omitted',
+            type=openapi.TYPE_STRING,
+            enum=list(IMPORT_FORMATS),
+            required=False,
+        ),
+    ],
+    responses={
+        200: openapi.Response('Import report with per-row errors'),
+        400: openapi.Response('Unknown format or empty upload'),
+        500 : openapi.Response('Internal Server Error')
+    },
+    operation_description="Bulk catalog import from a CSV or JSON Lines upload",
+    tags=["📚 Book Management"]
+)
+@api_view(['POST'])
+@permission_classes([IsAdminOrSubAdminUpdateBook])
+def import_books(request):
+    """
+    Imports many books at once from a CSV file (with a header line) or JSON Lines.
+
+    The upload is either the raw request body (`Content-Type: text/csv` or
+    `application/x-ndjson`) or a multipart form with a `file` field. It is read line by
+    line and imported in chunks: each chunk is validated, checked for duplicates
+    (same title, author and edition) with a single query and written with `bulk_create`.
+    Rows matching an existing book add copies to it, like `create_books` does.
+    Each row may carry a `copies` column (default 1).
+
+    Returns:
+    - 200 OK with the import report (`rows`, `created_books`, `added_copies`, `duplicates`,
+      `error_count` and per-line `errors`); invalid rows do not stop the import.
+    - 400 Bad Request if the format is unknown or the upload is empty.
+    - 500 Internal Server Error for unexpected failures.
+    """
+    try:
+        query_serializer = BookImportQuerySerializer(data=request.query_params)
+        if not query_serializer.is_valid():
+            return Response(query_serializer.errors, status=400)
+
+        if request.content_type.startswith('multipart/form-data'):
+            stream = request.FILES.get('file')
+            if stream is None:
+                return Response({'message': 'No file uploaded'}, status=400)
+            name = stream.name.lower()
+            guessed = next((fmt for ext, fmt in IMPORT_EXTENSIONS.items() if name.endswith(ext)), None)
+        else:
+            stream = request.stream
+            guessed = IMPORT_CONTENT_TYPES.get(request.content_type.split(';')[0].strip())
+
+        fmt = query_serializer.validated_data.get('import_format') or guessed
+        if fmt is None:
+            return Response({'message': f'Unknown import format, use one of {", ".join(IMPORT_FORMATS)}'}, status=400)
+        if stream is None:
+            return Response({'message': 'Empty upload'}, status=400)
+
+        report = import_catalog(read_rows(stream, fmt))
+        if not report['rows']:
+            return Response({'message': 'Empty upload'}, status=400)
+        return Response(report, status=200)
+    except Exception as e:
+        logger.exception('unhandled exception in import_books view')
+        return Response(
+            {
+                'message' : 'Error while importing books',
+            },
+            status=500
+        )
+#----------------------------------------------
+
 #-----------Display books----------------------
 @swagger_auto_schema(
     method='get',
+    manual_parameters=[
+        openapi.Parameter(
+            'stream',
+            openapi.IN_QUERY,
+            description='Stream the whole catalog instead of a single response: "ndjson" or "json"',
+            type=openapi.TYPE_STRING,
+            enum=list(CATALOG_STREAM_FORMATS),
+            required=False,
+        ),
+        openapi.Parameter('cursor', openapi.IN_QUERY, description='Opaque cursor from the previous page', type=openapi.TYPE_STRING, required=False),
+        openapi.Parameter('page_size', openapi.IN_QUERY, description='Books per page (max 500)', type=openapi.TYPE_INTEGER, required=False),
+        openapi.Parameter('with_count', openapi.IN_QUERY, description='Include an estimated total count', type=openapi.TYPE_BOOLEAN, required=False),
+    ],
     responses={
         200:openapi.Response('All books Displayed'),
+        400: openapi.Response('Unknown stream format'),
         404: openapi.Response('No Book Found'),
         500: openapi.Response('Internal Server Error')
     },
@@ -88,29 +269,283 @@ def create_books(request):
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_catalog_response(catalog_list_state)
+@cache_catalog_response
 def display_all_books(request):
     '''
     Retrieves and returns a list of all books stored in the library system.
 
     This endpoint requires no parameters and is accessible to authenticated users.
+    Copy counts are annotated onto each book (available and issued from the stored
+    counters, lost and damaged counted in the same query), so a page costs one query
+    however deep it is; `with_count` adds an estimated count, never a full COUNT(*).
+    Pages are cached per catalog version; any book, copy or issue write invalidates them.
+    Responses carry ETag / Last-Modified validators and conditional requests
+    (`If-None-Match`, `If-Modified-Since`) are answered with 304 Not Modified.
+
+    Results are keyset paginated on `id` (50 per page by default). Follow the `next`
+    link to fetch the following page; deep pages cost the same as the first one.
+
+    Query Parameters:
+    - `stream` (optional): `ndjson` or `json`. Streams the catalog in chunks
+      (used for the nightly OPAC export) so worker memory stays flat.
+    - `cursor` (optional): Opaque cursor taken from the `next` link.
+    - `page_size` (optional): Books per page, capped at 500.
+    - `with_count` (optional): `true` to include an `estimated_count`.
+
     Returns a 200 response with serialized book data or 404 if no books are found.
     '''
     try:
-        books = BookStructure.objects.all()
-        if not books.exists():
+        books = BookStructure.objects.with_copy_counts().order_by('id')
+        stream_format = request.query_params.get('stream')
+        if stream_format:
+            if stream_format not in CATALOG_STREAM_FORMATS:
+                return Response({'message' : 'stream must be one of: ' + ', '.join(CATALOG_STREAM_FORMATS)}, status=400)
+            return stream_catalog(books, stream_format)
+        paginator = CatalogPagination()
+        page = paginator.paginate_queryset(books, request)
+        if not page and not request.query_params.get(paginator.cursor_query_param):
             return Response({'message' : 'No books found'}, status=404)
-        serializer = BookStructureSerializer(books , many=True)
+        serializer = BookStructureListSerializer(page , many=True)
+        return paginator.get_paginated_response(serializer.data)
+    except InvalidCursor:
+        return Response({'message' : 'Invalid cursor'}, status=400)
+    except Exception as e:
+        logger.exception('unhandled exception in display_all_books view')
         return Response(
             {
-                'all_books' : serializer.data
+                'message' : 'Error while retrieving all books',
             },
-            status=200
+            status=500
         )
+#----------------------------------------------
+
+#-----------Browse books by facet----------------------
+@swagger_auto_schema(
+    method='get',
+    query_serializer=BrowseFilterSerializer,
+    responses={
+        200:openapi.Response('Filtered books with facet counts'),
+        400: openapi.Response('Invalid filter'),
+        500: openapi.Response('Internal Server Error')
+    },
+    operation_description="API to browse the catalog by genre, author, publisher, decade, price band and availability",
+    tags=["📚 Book Management"]
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional_catalog_response(catalog_list_state)
+@cache_catalog_response
+def browse_books(request):
+    '''
+    Faceted catalog browsing.
+
+    Returns the books matching every given filter (keyset paginated like `display_all_books`)
+    together with `facets`: the most common values and their book counts for genre, author,
+    publisher, decade, price band and availability.
+
+    Unfiltered facet counts are read from the incrementally maintained FacetCount table;
+    filtered counts are grouped over the matching BookFacet rows only.
+
+    Query Parameters:
+    - `genre`, `author`, `publisher` (optional): Exact values.
+    - `decade` (optional): Publication decade, e.g. 1990.
+    - `price_band` (optional): `under-10`, `10-25`, `25-50`, `50-100` or `100-plus`.
+    - `available` (optional): `true` for books with a copy available to issue.
+    - `cursor`, `page_size` (optional): Pagination.
+
+    Returns:
+    - 200 OK: `all_books`, `next` and `facets`.
+    - 400 Bad Request: If a filter is invalid.
+    - 500 Internal Server Error: For unexpected failures.
+    '''
+    try:
+        filter_serializer = BrowseFilterSerializer(data=request.query_params)
+        if not filter_serializer.is_valid():
+            return Response(filter_serializer.errors, status=400)
+        filters = filter_serializer.facet_filters()
+
+        books = BookStructure.objects.with_copy_counts().filter(
+            **{f'facet__{lookup}': value for lookup, value in filters.items()}
+        )
+        paginator = CatalogPagination()
+        page = paginator.paginate_queryset(books, request)
+        serializer = BookStructureListSerializer(page , many=True)
+        response = paginator.get_paginated_response(serializer.data)
+        response.data['facets'] = facet_counts(filters)
+        return response
+    except InvalidCursor:
+        return Response({'message' : 'Invalid cursor'}, status=400)
     except Exception as e:
-        logger.exception('unhandled exception in display_all_books view')
+        logger.exception('unhandled exception in browse_books view')
         return Response(
             {
-                'message' : 'Error while retrieving all books',
+                'message' : 'Error while browsing books',
+            },
+            status=500
+        )
+#----------------------------------------------
+
+#--------------------Search Books--------------------------
+@swagger_auto_schema(
+    method='get',
+    query_serializer=BookSearchInputSerializer,
+    responses={
+        200: openapi.Response('Ranked search results'),
+        400: openapi.Response('Missing or invalid search text'),
+        500: openapi.Response('Internal Server Error')
+    },
+    operation_description="API to search books by title, author, subject and genre",
+    tags=["📚 Book Management"]
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search_catalog(request):
+    '''
+    Full-text search over the catalog, ranked by relevance.
+
+    Matches are weighted title > author > genre > subject. The search runs against an
+    inverted index (PostgreSQL `tsvector` + GIN, or SQLite FTS5 locally) kept in sync by
+    the BookStructure save/delete hooks, so it never scans the books table.
+
+    Query Parameters:
+    - `q` (required): Search text.
+    - `limit` (optional): Maximum number of results (1-100, default 20).
+
+    Returns:
+    - 200 OK: `results`, best match first, each with its copy counts and `rank`.
+    - 400 Bad Request: If `q` is missing or empty.
+    - 500 Internal Server Error: For unexpected failures.
+    '''
+    try:
+        search_serializer = BookSearchInputSerializer(data=request.query_params)
+        if not search_serializer.is_valid():
+            return Response(search_serializer.errors, status=400)
+
+        ranked = search_books(
+            search_serializer.validated_data['q'],
+            search_serializer.validated_data['limit'],
+        )
+        books = BookStructure.objects.with_copy_counts().in_bulk([book_id for book_id, _ in ranked])
+
+        results = []
+        for book_id, rank in ranked:
+            book = books.get(book_id)
+            if book is None:
+                continue
+            book_data = BookStructureListSerializer(book).data
+            book_data['rank'] = rank
+            results.append(book_data)
+        return Response({'results' : results}, status=200)
+    except Exception as e:
+        logger.exception('unhandled exception in search_catalog view')
+        return Response(
+            {
+                'message' : 'Error while searching books',
+            },
+            status=500
+        )
+#----------------------------------------------
+
+#--------------------Fuzzy Title / Author Lookup--------------------------
+@swagger_auto_schema(
+    method='get',
+    query_serializer=BookSearchInputSerializer,
+    responses={
+        200: openapi.Response('Similarity ranked candidates'),
+        400: openapi.Response('Missing or invalid search text'),
+        500: openapi.Response('Internal Server Error')
+    },
+    operation_description="API for typo-tolerant title and author lookup",
+    tags=["📚 Book Management"]
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def fuzzy_book_lookup(request):
+    '''
+    Typo-tolerant lookup over book titles and authors.
+
+    Candidates are found through a trigram index (pg_trgm GIN indexes on PostgreSQL,
+    an in-memory trigram posting-list index elsewhere) and ranked by similarity, so
+    misspelled queries such as "fitzgerlad" still find "F. Scott Fitzgerald".
+
+    Query Parameters:
+    - `q` (required): Text to match against titles and authors.
+    - `limit` (optional): Maximum number of candidates (1-100, default 20).
+
+    Returns:
+    - 200 OK: `results` with `id`, `title`, `author` and `similarity` (0-1), best first.
+    - 400 Bad Request: If `q` is missing or empty.
+    - 500 Internal Server Error: For unexpected failures.
+    '''
+    try:
+        lookup_serializer = BookSearchInputSerializer(data=request.query_params)
+        if not lookup_serializer.is_valid():
+            return Response(lookup_serializer.errors, status=400)
+        results = fuzzy_search(
+            lookup_serializer.validated_data['q'],
+            lookup_serializer.validated_data['limit'],
+        )
+        return Response({'results' : results}, status=200)
+    except Exception as e:
+        logger.exception('unhandled exception in fuzzy_book_lookup view')
+        return Response(
+            {
+                'message' : 'Error while looking up books',
+            },
+            status=500
+        )
+#----------------------------------------------
+
+#--------------------Autocomplete--------------------------
+@swagger_auto_schema(
+    method='get',
+    query_serializer=AutocompleteInputSerializer,
+    responses={
+        200: openapi.Response('Completions per field'),
+        400: openapi.Response('Invalid input'),
+        500: openapi.Response('Internal Server Error')
+    },
+    operation_description="API for search box autocomplete on titles, authors and publishers",
+    tags=["📚 Book Management"]
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def autocomplete_books(request):
+    '''
+    Returns prefix completions for the search box.
+
+    Completions come from an in-memory sorted prefix index of titles, authors and
+    publishers that is kept up to date by the BookStructure save/delete hooks, so a
+    keystroke never reaches the database. Any word of a value can be completed
+    ("gats" -> "The Great Gatsby").
+
+    Query Parameters:
+    - `q` (required): Text typed so far.
+    - `field` (optional): `title`, `author`, `publisher` or `all` (default).
+    - `limit` (optional): Completions per field (1-25, default 10).
+
+    Returns:
+    - 200 OK: `completions`, a list of values per requested field.
+    - 400 Bad Request: If the input is invalid.
+    - 500 Internal Server Error: For unexpected failures.
+    '''
+    try:
+        autocomplete_serializer = AutocompleteInputSerializer(data=request.query_params)
+        if not autocomplete_serializer.is_valid():
+            return Response(autocomplete_serializer.errors, status=400)
+        field = autocomplete_serializer.validated_data['field']
+        completions = catalog_autocomplete.complete(
+            autocomplete_serializer.validated_data['q'],
+            fields=AUTOCOMPLETE_FIELDS if field == 'all' else (field,),
+            limit=autocomplete_serializer.validated_data['limit'],
+        )
+        return Response({'completions' : completions}, status=200)
+    except Exception as e:
+        logger.exception('unhandled exception in autocomplete_books view')
+        return Response(
+            {
+                'message' : 'Error while fetching completions',
             },
             status=500
         )
@@ -129,6 +564,7 @@ def display_all_books(request):
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_catalog_response(book_detail_state)
 def get_book_details(request , book_structure_id):
     """
     Retrieves detailed information about a specific book, including its metadata and all physical copies.
@@ -139,20 +575,21 @@ def get_book_details(request , book_structure_id):
     - A list of all physical copies with their copy number, status, and ID.
 
     Authentication is required. Access may be limited based on user roles (e.g., editing/updating rights for admins/sub-admins).
+    The ETag comes from the book's row and its copies' statuses as stored in the database,
+    so every worker agrees on it; a matching `If-None-Match` gets a 304 without serializing.
+    The response body is always built from the database, never from the response cache.
 
     Returns:
     - 200 OK with serialized book details if the book exists.
+    - 304 Not Modified if the client's cached copy is still current.
     - 404 Not Found if the book ID is invalid or not found.
     """
     #get book
     try:
         book = get_object_or_404(BookStructure , id=book_structure_id)
 
-        #count copies
-        book_copy_count = BookCopy.objects.filter(
-            book_instance=book,
-            status='Available To issue'
-        ).count()
+        #available copies are a denormalized counter on the book
+        book_copy_count = book.available_count
 
         #get all books
         all_copies = BookCopy.objects.filter(book_instance=book)
@@ -306,6 +743,10 @@ def issue_book(request, book_structure_id):
     """
     Issues the first available copy of the book (by BookStructure ID) to the authenticated user.
 
+    The check, the copy claim and the loan insert run in one transaction in
+    `IssuanceService`, so concurrent requests for the same title always receive
+    different copies.
+
     Parameters:
     - `book_structure_id`: ID of the BookStructure.
 
@@ -316,43 +757,26 @@ def issue_book(request, book_structure_id):
     - 500 Internal Server Error: Unexpected errors.
     """
     try:
-        customer = CustomerCreate.objects.get(user=request.user)
-        book_structure = get_object_or_404(BookStructure, id=book_structure_id)
-        already_issued = IssueBook.objects.filter(
-            issued_by=customer,
-            book__book_instance__id=book_structure.id,
-            returned_on__isnull=True
-        ).exists()
-        if already_issued:
-            return Response({'message': 'This book is already issued'}, status=400)
-
-
-        copy_book = BookCopy.objects.filter(
-            book_instance=book_structure,
-            status='Available To issue'
-        ).order_by('copy_number').first()
-        if not copy_book:
-            return Response({'message': 'No available copy to issue'}, status=400)
-
-
         issued_book_serializer = IssueBookSerializer(data=request.data)
         if not issued_book_serializer.is_valid():
             return Response(issued_book_serializer.errors, status=400)
-        book_issued = issued_book_serializer.save(
-            issued_by=customer,
-            book=copy_book,
-        )
-        copy_book.status = 'Issued'
-        copy_book.save()
 
-        # Signal
-        issue_book_signal.send(sender=issued_book_serializer.__class__, book_copy_id=copy_book.id)
+        # issue_book_signal is sent by the service once the loan is committed
+        IssuanceService().issue(
+            request.user,
+            book_structure_id,
+            issue_date=issued_book_serializer.validated_data['issue_date'],
+            return_date=issued_book_serializer.validated_data['return_date'],
+        )
         return Response({'message': 'Book issued successfully'}, status=200)
 
+    except IssuanceError as e:
+        return Response({'message': str(e)}, status=400)
+
     except CustomerCreate.DoesNotExist:
         return Response({'message': 'Customer does not exist'}, status=400)
 
-    except Http404:
+    except BookStructure.DoesNotExist:
         return Response({'message': 'Book not found'}, status=404)
 
     except Exception:
@@ -361,6 +785,158 @@ def issue_book(request, book_structure_id):
 
 #-----------------------------------------------------------------
 
+#------------------Checkout------------------------
+@swagger_auto_schema(
+    method='post',
+    request_body=CheckoutSerializer,
+    responses={
+        200: openapi.Response('Checkout processed, with one result per book'),
+        400: openapi.Response('Invalid checkout or customer does not exist'),
+        500: openapi.Response('Internal Server Error'),
+    },
+    operation_description='API to issue several books in one request',
+    tags=["📦 Issue & Return"]
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def checkout_books(request):
+    """
+    Issues one copy of each listed book (by BookStructure ID) to the authenticated user.
+
+    All copies are claimed in one transaction with set-based statements in
+    `IssuanceService.issue_many`. A book that can not be issued does not stop the
+    others; each one gets its own result.
+
+    Request body:
+    - `book_structure_ids`: list of BookStructure IDs (at most MAX_CHECKOUT_ITEMS).
+    - `issue_date`, `return_date`: applied to every loan.
+
+    Returns:
+    - 200 OK: `results`, one per distinct ID in request order, with `status`
+      'issued' (and `book_copy_id`), 'already_issued', 'unavailable' or 'not_found'.
+    - 400 Bad Request: Invalid body or customer does not exist.
+    - 500 Internal Server Error: Unexpected errors.
+    """
+    try:
+        checkout_serializer = CheckoutSerializer(data=request.data)
+        if not checkout_serializer.is_valid():
+            return Response(checkout_serializer.errors, status=400)
+
+        # issue_book_signal is sent per loan by the service once the checkout is committed
+        results = IssuanceService().issue_many(
+            request.user,
+            checkout_serializer.validated_data['book_structure_ids'],
+            issue_date=checkout_serializer.validated_data['issue_date'],
+            return_date=checkout_serializer.validated_data['return_date'],
+        )
+        issued = sum(result['status'] == 'issued' for result in results)
+        return Response(
+            {
+                'message': f'{issued} of {len(results)} books issued',
+                'results': results,
+            },
+            status=200
+        )
+
+    except CustomerCreate.DoesNotExist:
+        return Response({'message': 'Customer does not exist'}, status=400)
+
+    except Exception:
+        logger.exception('Unhandled exception in checkout_books view')
+        return Response({'message': 'Error while checking out books'}, status=500)
+
+#-----------------------------------------------------------------
+
+#------------------Hold Queue------------------------
+@swagger_auto_schema(
+    method='post',
+    responses={
+        201: openapi.Response('Hold placed, with the position in the queue'),
+        400: openapi.Response('Hold not placed'),
+        404: openapi.Response('Book not found'),
+        500: openapi.Response('Internal Server Error'),
+    },
+    operation_description='API to join the hold queue of a book with no copy available',
+    tags=["📦 Issue & Return"]
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def place_hold(request, book_structure_id):
+    """
+    Queues the authenticated user for the book (by BookStructure ID) when no copy is
+    available to issue, instead of polling the book details.
+
+    The next returned copy is set aside for the oldest hold in the same transaction as
+    the return and the patron is emailed; issuing the book then hands it over.
+
+    Returns:
+    - 201 Created: `hold_id` and `position` in the queue.
+    - 400 Bad Request: A copy is available, the book is already issued to the user,
+      the user already has a hold on it, or the customer does not exist.
+    - 404 Not Found: BookStructure does not exist.
+    - 500 Internal Server Error: Unexpected errors.
+    """
+    try:
+        service = HoldService()
+        hold = service.place(request.user, book_structure_id)
+        return Response(
+            {
+                'message': 'Hold placed successfully',
+                'hold_id': hold.pk,
+                'position': service.position(hold),
+            },
+            status=201
+        )
+
+    except HoldError as e:
+        return Response({'message': str(e)}, status=400)
+
+    except CustomerCreate.DoesNotExist:
+        return Response({'message': 'Customer does not exist'}, status=400)
+
+    except BookStructure.DoesNotExist:
+        return Response({'message': 'Book not found'}, status=404)
+
+    except Exception:
+        logger.exception('Unhandled exception in place_hold view')
+        return Response({'message': 'Error while placing hold'}, status=500)
+
+
+@swagger_auto_schema(
+    method='delete',
+    responses={
+        200: openapi.Response('Hold cancelled'),
+        400: openapi.Response('No active hold on this book'),
+        500: openapi.Response('Internal Server Error'),
+    },
+    operation_description='API to leave the hold queue of a book',
+    tags=["📦 Issue & Return"]
+)
+@api_view(['DELETE'])
+@permission_classes([IsAuthenticated])
+def cancel_hold(request, book_structure_id):
+    """
+    Cancels the authenticated user's waiting or ready hold on the book. A copy set aside
+    for the hold goes to the next patron in the queue, or back on the shelf.
+
+    Returns:
+    - 200 OK: Hold cancelled.
+    - 400 Bad Request: The user has no active hold on the book.
+    - 500 Internal Server Error: Unexpected errors.
+    """
+    try:
+        HoldService().cancel(request.user, book_structure_id)
+        return Response({'message': 'Hold cancelled successfully'}, status=200)
+
+    except HoldError as e:
+        return Response({'message': str(e)}, status=400)
+
+    except Exception:
+        logger.exception('Unhandled exception in cancel_hold view')
+        return Response({'message': 'Error while cancelling hold'}, status=500)
+
+#-----------------------------------------------------------------
+
 #--------------------Return Book ----------------------
 #run tests before updating
 @swagger_auto_schema(
@@ -408,6 +984,8 @@ def return_book(request):
             "book": data['book_title'],
             "returned_on": data['returned_on'],
         }, status=200)
+    except ValidationError as e:
+        return Response(e.detail, status=400)
     except Exception as e:
         logger.exception('unhandled exception in return book view')
         return Response(
@@ -419,6 +997,59 @@ def return_book(request):
 
 #----------------------------------------------------------------------
 
+#--------------------Batch Return ----------------------
+@swagger_auto_schema(
+    method='post',
+    request_body=BatchReturnSerializer,
+    responses={
+        200 : openapi.Response('Batch processed, with the copies returned and those without an active loan'),
+        400 : openapi.Response('Invalid batch'),
+        500 : openapi.Response('Internal Server Error'),
+    },
+    operation_description='API to check in many scanned book copies at once',
+    tags=["📦 Issue & Return"]
+)
+@api_view(['POST'])
+@permission_classes([IsAdminOrSubAdminUpdateBook])
+def return_books_batch(request):
+    '''
+    Checks in a batch of scanned book copies (book-drop, desk scanner), whoever borrowed them.
+
+    All open loans of the copies are closed with one UPDATE and the copies are put back
+    on the shelf with another, in one transaction (`ReturnService.return_many`).
+
+    Request body:
+    - `book_copy_ids`: list of BookCopy IDs (at most MAX_RETURN_ITEMS).
+
+    Returns:
+    - 200 OK: `returned` copy IDs, `no_active_loan` (copies that were not on loan) and
+      `not_found` (unknown IDs).
+    - 400 Bad Request: Invalid body.
+    - 500 Internal Server Error: For unexpected failures.
+    '''
+    try:
+        serializer = BatchReturnSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        data = ReturnService().return_many(serializer.validated_data['book_copy_ids'])
+        return Response({
+            "message": f"{len(data['returned'])} books returned",
+            "returned_on": data['returned_on'],
+            "returned": data['returned'],
+            "no_active_loan": data['no_active_loan'],
+            "not_found": data['not_found'],
+        }, status=200)
+    except Exception:
+        logger.exception('unhandled exception in batch return view')
+        return Response(
+            {
+                'message' : 'Error while returning books',
+            },
+            status=500
+        )
+
+#----------------------------------------------------------------------
+
 #------------------------Show user issued books------------------------
 @swagger_auto_schema(
     method='get',
@@ -495,13 +1126,14 @@ def admin_issue_book_search(request):
 
     This endpoint allows admin or sub-admin users to filter issued books using the following criteria:
 
-    - `Title` (optional): Partial or full book title match (case-insensitive).
+    - `title` (optional): Partial or full book title match (case-insensitive).
     - `number_of_days_issued` (optional): Filters books issued exactly `N` days ago.
-    - `filter_over_8_days` (optional): Filters books issued more than 8 days ago.
+    - `filter_over_8_days` (optional): Filters the overdue loans, the same open loans past
+      their `return_date` that `api/overdue/` lists (the flag keeps its old name).
 
     Logic:
     - Performs case-insensitive search by book title using `icontains`.
-    - If both title and days are given, applies both filters.
+    - Applies every filter given.
     - If no filters match, returns all issued books.
     - Uses `select_related` to optimize database queries by prefetching `book` and `book_instance`.
 
@@ -518,7 +1150,7 @@ def admin_issue_book_search(request):
         if not search_serializer.is_valid():
             return Response(search_serializer.errors, status=400)
 
-        title = search_serializer.validated_data.get('Title')
+        title = search_serializer.validated_data.get('title')
         target_days = search_serializer.validated_data.get('number_of_days_issued')
         filter_over_8_days = search_serializer.validated_data.get('filter_over_8_days')
         today = datetime.date.today()
@@ -530,11 +1162,10 @@ def admin_issue_book_search(request):
             )
         if target_days is not None:
             date_n_days_ago = today - datetime.timedelta(days=target_days)
-            issued_books = issued_books.filter(Issue_date__date=date_n_days_ago)
-
-        elif filter_over_8_days:
-            date_8_days_ago = today - datetime.timedelta(days=8)
-            issued_books = issued_books.filter(Issue_date__lt=date_8_days_ago)
+            issued_books = issued_books.filter(issue_date=date_n_days_ago)
+        if filter_over_8_days:
+            #the overdue set flagged by `sweep_overdue_loans`, as in `overdue_loans`
+            issued_books = issued_books.filter(overdue__isnull=False, returned_on__isnull=True)
 
         serializer = ViewIssueBookSerializer(issued_books, many=True)
         return Response(
@@ -564,6 +1195,8 @@ def admin_issue_book_search(request):
         type=openapi.TYPE_INTEGER,
         required=False,
         ),
+        openapi.Parameter('cursor', openapi.IN_QUERY, description='Opaque cursor from the previous page', type=openapi.TYPE_STRING, required=False),
+        openapi.Parameter('with_count', openapi.IN_QUERY, description='Include an estimated total count', type=openapi.TYPE_BOOLEAN, required=False),
     ],
     responses={
         200 : openapi.Response('Show Book Hisotry (filtered and non filtered)'),
@@ -583,10 +1216,14 @@ def track_book_history(request):
 
     This view supports optional filtering based on a specific `book_structure_id`. If provided, it returns the history of all copies (BookCopy) associated with that particular BookStructure. If no filter is applied, it returns the complete issue history across all books.
 
-    The results are paginated (10 records per page) and serialized using `BookHistorySerializer`.
+    The results are keyset paginated on (`issue_date`, `id`), newest first (10 records per page),
+    and serialized using `BookHistorySerializer`. No COUNT(*) runs unless `with_count=true`.
+    Active and archived loans are read together through the `LoanHistory` view.
 
     Query Parameters:
     - book_structure_id (optional): Integer — ID of the BookStructure to filter history by.
+    - cursor (optional): Opaque cursor taken from the `next` link.
+    - with_count (optional): `true` to include an `estimated_count`.
 
     Returns:
     - 200 OK: Paginated list of issue/return records.
@@ -600,17 +1237,18 @@ def track_book_history(request):
             return Response(book_id_serialized.errors, status=400)
 
         book_structure_id = book_id_serialized.validated_data.get('book_structure_id')
-        paginator = PageNumberPagination()
-        paginator.page_size = 10
+        paginator = IssueHistoryPagination()
 
+        #closed loans may already be archived: read the whole history
+        querry_set = LoanHistory.objects.select_related('book__book_instance')
         if book_structure_id:
-            querry_set = IssueBook.objects.filter(book__book_instance__id=book_structure_id)
-        else:
-            querry_set = IssueBook.objects.all()
+            querry_set = querry_set.filter(book__book_instance__id=book_structure_id)
 
         paginator_querry_set=paginator.paginate_queryset(querry_set, request)
         serializer = BookHistorySerializer(paginator_querry_set, many=True)
         return paginator.get_paginated_response(serializer.data)
+    except InvalidCursor:
+        return Response({'message' : 'Invalid cursor'}, status=400)
     except Exception as e:
         logger.exception('unhandled exception in track_book_history view')
         return Response(
@@ -622,6 +1260,257 @@ def track_book_history(request):
 #---------------------------------------------------------------------
 
 
+#-------------------------------------Overdue Loans ------------------
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('cursor', openapi.IN_QUERY, description='Opaque cursor from the previous page', type=openapi.TYPE_STRING, required=False),
+        openapi.Parameter('page_size', openapi.IN_QUERY, description='Loans per page (max 500)', type=openapi.TYPE_INTEGER, required=False),
+        openapi.Parameter('with_count', openapi.IN_QUERY, description='Include an estimated total count', type=openapi.TYPE_BOOLEAN, required=False),
+    ],
+    responses={
+        200 : openapi.Response('Show all overdue loans'),
+        400 : openapi.Response('Invalid cursor'),
+        500: openapi.Response('Internal Server Error'),
+    },
+    operation_description='API to list open loans past their return date',
+    tags=['📈 Tracking']
+)
+@api_view(['GET'])
+@permission_classes([IsAdminOrSubAdminReadBook])
+def overdue_loans(request):
+    """
+    Lists open loans past their `return_date`, most overdue first.
+
+    Reads the overdue set flagged by the nightly `sweep_overdue_loans` command instead of
+    scanning the issue history; loans returned since the sweep are left out. Results are
+    keyset paginated on (`return_date`, `loan_id`).
+
+    Query Parameters:
+    - `cursor` (optional): Opaque cursor taken from the `next` link.
+    - `page_size` (optional): Loans per page, 50 by default.
+    - `with_count` (optional): `true` to include an `estimated_count`.
+
+    Returns:
+    - 200 OK: Paginated overdue loans with `days_overdue`.
+    - 400 Bad Request: If the cursor is invalid.
+    - 500 Internal Server Error: For unexpected exceptions.
+
+    Permissions:
+    - Requires admin or sub-admin role with ReadBook permission.
+    """
+    try:
+        paginator = OverduePagination()
+        querry_set = OverdueLoan.objects.filter(loan__returned_on__isnull=True).select_related('loan__book__book_instance')
+        paginated = paginator.paginate_queryset(querry_set, request)
+        serializer = OverdueLoanSerializer(paginated, many=True, context={'today': datetime.date.today()})
+        return paginator.get_paginated_response(serializer.data)
+
+    except InvalidCursor:
+        return Response({'message' : 'Invalid cursor'}, status=400)
+    except Exception as e:
+        logger.exception('unhandled exception in overdue_loans view')
+        return Response(
+            {
+                'message': 'Error while listing overdue loans',
+            },
+            status=500
+        )
+#---------------------------------------------------------------------------------
+
+#-------------------------------------Monthly Circulation Report ------------------
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('start', openapi.IN_QUERY, description='First month (any date in it)', type=openapi.TYPE_STRING, required=False),
+        openapi.Parameter('end', openapi.IN_QUERY, description='Last month (any date in it)', type=openapi.TYPE_STRING, required=False),
+        openapi.Parameter('book_structure_id', openapi.IN_QUERY, description='Only this book', type=openapi.TYPE_INTEGER, required=False),
+        openapi.Parameter('customer_id', openapi.IN_QUERY, description='Only this customer', type=openapi.TYPE_INTEGER, required=False),
+    ],
+    responses={
+        200 : openapi.Response('Loans, days out and late returns per month'),
+        400 : openapi.Response('Invalid filters'),
+        500: openapi.Response('Internal Server Error'),
+    },
+    operation_description='API to report circulation per month',
+    tags=['📈 Tracking']
+)
+@api_view(['GET'])
+@permission_classes([IsAdminOrSubAdminReadBook])
+def monthly_circulation_report(request):
+    """
+    Reports loans, days out and late returns per month of issue, for the whole library or
+    for one book or customer.
+
+    Reads the monthly rollup tables, kept up to date on every issue and return, instead
+    of scanning the loan history.
+
+    Query Parameters:
+    - `start`, `end` (optional): Dates; the months containing them bound the report.
+    - `book_structure_id` (optional): Report one book.
+    - `customer_id` (optional): Report one customer.
+
+    Returns:
+    - 200 OK: `months`, oldest first.
+    - 400 Bad Request: If the filters are invalid.
+    - 500 Internal Server Error: For unexpected exceptions.
+
+    Permissions:
+    - Requires admin or sub-admin role with ReadBook permission.
+    """
+    try:
+        report_serializer = MonthlyReportInputSerializer(data=request.query_params)
+        if not report_serializer.is_valid():
+            return Response(report_serializer.errors, status=400)
+        filters = report_serializer.validated_data
+        months = monthly_report(
+            start=filters.get('start'),
+            end=filters.get('end'),
+            book_id=filters.get('book_structure_id'),
+            customer_id=filters.get('customer_id'),
+        )
+        return Response({'months': months}, status=200)
+
+    except Exception as e:
+        logger.exception('unhandled exception in monthly_circulation_report view')
+        return Response(
+            {
+                'message': 'Error while building the report',
+            },
+            status=500
+        )
+#---------------------------------------------------------------------------------
+
+#-------------------------------------Circulation Cube Report ------------------
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('group_by', openapi.IN_QUERY, description=f"Comma separated dimensions to keep: {', '.join(CUBE_DIMENSIONS)}", type=openapi.TYPE_STRING, required=False),
+        openapi.Parameter('genre', openapi.IN_QUERY, description='Only this genre', type=openapi.TYPE_STRING, required=False),
+        openapi.Parameter('age_band', openapi.IN_QUERY, description='Only this patron age band', type=openapi.TYPE_STRING, enum=AGE_BAND_CHOICES, required=False),
+        openapi.Parameter('start', openapi.IN_QUERY, description='First month (any date in it)', type=openapi.TYPE_STRING, required=False),
+        openapi.Parameter('end', openapi.IN_QUERY, description='Last month (any date in it)', type=openapi.TYPE_STRING, required=False),
+    ],
+    responses={
+        200 : openapi.Response('Loans, days out and late returns per cell'),
+        400 : openapi.Response('Invalid dimensions or filters'),
+        500: openapi.Response('Internal Server Error'),
+    },
+    operation_description='API to slice circulation by genre, month and patron age band',
+    tags=['📈 Tracking']
+)
+@api_view(['GET'])
+@permission_classes([IsAdminOrSubAdminReadBook])
+def circulation_cube_report(request):
+    """
+    Pivots circulation over genre, month of issue and patron age band.
+
+    Reads the precomputed circulation cube, kept up to date on every issue and return.
+    Dimensions left out of `group_by` are rolled up (summed over); adding them drills down.
+
+    Query Parameters:
+    - `group_by` (optional): Comma separated dimensions (`genre`, `age_band`, `year`, `month`);
+      empty for the library total.
+    - `genre`, `age_band` (optional): Only these cells.
+    - `start`, `end` (optional): Dates; the months containing them bound the report.
+
+    Returns:
+    - 200 OK: `group_by` and `cells`, each with its dimensions, `loans`, `days_out` and `overdue`.
+    - 400 Bad Request: If the dimensions or filters are invalid.
+    - 500 Internal Server Error: For unexpected exceptions.
+
+    Permissions:
+    - Requires admin or sub-admin role with ReadBook permission.
+    """
+    try:
+        cube_serializer = CirculationCubeInputSerializer(data=request.query_params)
+        if not cube_serializer.is_valid():
+            return Response(cube_serializer.errors, status=400)
+        filters = cube_serializer.validated_data
+        cells = cube_report(
+            group_by=filters['group_by'],
+            start=filters.get('start'),
+            end=filters.get('end'),
+            genre=filters.get('genre'),
+            age_band=filters.get('age_band'),
+        )
+        return Response({'group_by': filters['group_by'], 'cells': cells}, status=200)
+
+    except Exception as e:
+        logger.exception('unhandled exception in circulation_cube_report view')
+        return Response(
+            {
+                'message': 'Error while building the report',
+            },
+            status=500
+        )
+#---------------------------------------------------------------------------------
+
+#-------------------------------------Title Circulation Statistics ------------------
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('days', openapi.IN_QUERY, description='Days back from today that utilization is measured over (default 365)', type=openapi.TYPE_INTEGER, required=False),
+        openapi.Parameter('limit', openapi.IN_QUERY, description='Only the top ranked titles', type=openapi.TYPE_INTEGER, required=False),
+        openapi.Parameter('book_structure_id', openapi.IN_QUERY, description='Only this book', type=openapi.TYPE_INTEGER, required=False),
+    ],
+    responses={
+        200 : openapi.Response('Loans, utilization, loan duration, queue depth and rank per title'),
+        400 : openapi.Response('Invalid filters'),
+        404 : openapi.Response('Book not found'),
+        500: openapi.Response('Internal Server Error'),
+    },
+    operation_description='API to get circulation statistics per title',
+    tags=['📈 Tracking']
+)
+@api_view(['GET'])
+@permission_classes([IsAdminOrSubAdminReadBook])
+def title_circulation_statistics(request):
+    """
+    Lists circulation statistics for every book title, most loaned first.
+
+    The statistics of all titles are computed together in one vectorized pass over the
+    loan history and cached until the next issue, return or hold queue change.
+
+    Query Parameters:
+    - `days` (optional): Days back from today that utilization is measured over (default 365).
+    - `limit` (optional): Only the top `limit` titles.
+    - `book_structure_id` (optional): Only this book.
+
+    Returns:
+    - 200 OK: `titles`, each with `book_structure_id`, `title`, `total_loans`, `utilization`,
+      `average_loan_days`, `queue_depth` and `rank`.
+    - 400 Bad Request: If the filters are invalid.
+    - 404 Not Found: If `book_structure_id` does not exist.
+    - 500 Internal Server Error: For unexpected exceptions.
+
+    Permissions:
+    - Requires admin or sub-admin role with ReadBook permission.
+    """
+    try:
+        statistics_serializer = TitleStatisticsInputSerializer(data=request.query_params)
+        if not statistics_serializer.is_valid():
+            return Response(statistics_serializer.errors, status=400)
+        filters = statistics_serializer.validated_data
+        titles = title_statistics(days=filters['days'])
+        if filters.get('book_structure_id'):
+            titles = [row for row in titles if row['book_structure_id'] == filters['book_structure_id']]
+            if not titles:
+                return Response({'message' : 'Book not found'}, status=404)
+        if filters.get('limit'):
+            titles = titles[:filters['limit']]
+        return Response({'titles': titles}, status=200)
+
+    except Exception as e:
+        logger.exception('unhandled exception in title_circulation_statistics view')
+        return Response(
+            {
+                'message': 'Error while computing the statistics',
+            },
+            status=500
+        )
+#---------------------------------------------------------------------------------
+
 #-------------------------------------Get user issued Books using a specific date ------------------
 @swagger_auto_schema(
     method='get',
@@ -633,6 +1522,8 @@ def track_book_history(request):
             type=openapi.TYPE_STRING,
             required=False,
         ),
+        openapi.Parameter('cursor', openapi.IN_QUERY, description='Opaque cursor from the previous page', type=openapi.TYPE_STRING, required=False),
+        openapi.Parameter('with_count', openapi.IN_QUERY, description='Include an estimated total count', type=openapi.TYPE_BOOLEAN, required=False),
     ],
     responses={
         200 : openapi.Response('Show all Books Issued on a particuar date'),
@@ -646,16 +1537,19 @@ def track_book_history(request):
 @permission_classes([IsAdminOrSubAdminReadBook])
 def track_using_date(request):
     """
-    Tracks issued books based on a specific date or books issued more than 8 days ago.
+    Tracks issued books based on a specific date, or the overdue loans.
 
     Functionality:
     - Accepts an optional `date` as a query parameter in `YYYY-MM-DD` format.
     - If a date is provided, it fetches all books issued on that specific date.
-    - If no date is provided, it fetches all books that were issued more than 8 days ago from today.
-    - Results are paginated with 10 records per page.
+    - If no date is provided, it fetches the overdue loans: the open loans past their
+      `return_date` flagged by `sweep_overdue_loans`, the same set `api/overdue/` lists.
+    - Results are keyset paginated on (`issue_date`, `id`), newest first, 10 records per page.
 
     Query Parameters:
     - `date` (optional): A date string (e.g., "2025-06-01") to filter issued books.
+    - `cursor` (optional): Opaque cursor taken from the `next` link.
+    - `with_count` (optional): `true` to include an `estimated_count`.
 
     Returns:
     - 200 OK: Paginated list of issued books with a message.
@@ -670,18 +1564,19 @@ def track_using_date(request):
         if not date_seralizer.is_valid():
             return Response(date_seralizer.errors, status=400)
         date = date_seralizer.validated_data.get('date')
-        paginator = PageNumberPagination()
-        paginator.page_size = 10
+        paginator = IssueHistoryPagination()
+        querry_set = LoanHistory.objects.select_related('book__book_instance')
         if date:
-            querry_set = IssueBook.objects.filter(
+            querry_set = querry_set.filter(
                 issue_date=date,
             )
             message = "Issued Book for specific date"
         else:
-            today = datetime.date.today()
-            eight_days_ago = today - datetime.timedelta(days=8)
-            querry_set = IssueBook.objects.filter(issue_date__lte=eight_days_ago)
-            message = "Issued Book after filter (greater than 8 days ago)"
+            querry_set = querry_set.filter(
+                returned_on__isnull=True,
+                id__in=OverdueLoan.objects.values('loan_id'),
+            )
+            message = "Issued Book after filter (overdue)"
 
         paginated = paginator.paginate_queryset(querry_set, request)
         serializer = BookHistorySerializer(paginated, many=True)
@@ -690,6 +1585,8 @@ def track_using_date(request):
             'data': serializer.data
         })
 
+    except InvalidCursor:
+        return Response({'message' : 'Invalid cursor'}, status=400)
     except Exception as e:
         logger.exception('unhandled exception in track_using_date view')
         return Response(
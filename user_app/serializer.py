@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from books.models import IssueBook
+from books.models import LoanHistory
 from .models import CustomerCreate
 
 #· · ────── ꒰ঌ· Customer Serializer·໒꒱ ────── · ·
@@ -79,9 +79,10 @@ class PasswordChnageSerializer(serializers.Serializer):
 
 #· · ────── ꒰ঌ· IssueBook  Serializer·໒꒱ ────── · ·
 class IssueBookSerializer(serializers.ModelSerializer):
-    title = serializers.CharField(source='book.book_instance.Title', read_only=True)
-    book_structure_id = serializers.IntegerField(source='book.book_instance.id', read_only=True)
+    #null when an archived loan's copy was deleted since
+    title = serializers.CharField(source='book.book_instance.title', read_only=True, allow_null=True)
+    book_structure_id = serializers.IntegerField(source='book.book_instance.id', read_only=True, allow_null=True)
     class Meta:
-        model = IssueBook
+        model = LoanHistory
         fields = ['title', 'book_structure_id', 'issue_date', 'return_date']
 #· · ────── ꒰ঌ·✦·໒꒱ ────── · ·
\ No newline at end of file
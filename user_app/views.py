@@ -149,7 +149,7 @@ def user_orders(request  , *args , **kwargs):
     """
     Retrieve books issued to the currently authenticated user.
 
-    This endpoint fetches all book issues (IssueBook records) associated with the logged-in user.
+    This endpoint fetches all book issues (LoanHistory records, active and archived) associated with the logged-in user.
     It also optionally returns the `book_copy_id` of the first issued book, if available.
 
     Permissions:
@@ -161,11 +161,10 @@ def user_orders(request  , *args , **kwargs):
     """
 
     customer = get_object_or_404(CustomerCreate, user=request.user)
-    issued_book = IssueBook.objects.filter(issued_by=customer).all()
-    try:
-        book_copy_id = issued_book.first().book.book_instance.id
-    except AttributeError:
-        book_copy_id = None
+    #active and archived loans; the LEFT JOIN leaves `book` None where the copy was deleted
+    issued_book = list(LoanHistory.objects.filter(issued_by=customer).select_related('book__book_instance'))
+    first_loan = issued_book[0] if issued_book else None
+    book_copy_id = first_loan.book.book_instance_id if first_loan and first_loan.book else None
 
     issue_book_seralizer = IssueBookSerializer(issued_book , many=True)
     return Response(